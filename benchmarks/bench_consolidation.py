@@ -0,0 +1,188 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compare the consolidation strategies with STV: time taken, how often they
+pick the same top action, and how much their top few actions overlap
+
+    PYTHONPATH=src:benchmarks python benchmarks/bench_consolidation.py
+    PYTHONPATH=src:benchmarks python benchmarks/bench_consolidation.py \
+        -c 200 -p 8 -n 20
+
+Recorded round results can be used instead of synthetic ones, from a JSON
+array export of the log collection (mongoexport --jsonArray): the
+plugin_result entries logged for a stack before each consolidation entry
+make up one round
+
+    PYTHONPATH=src:benchmarks python benchmarks/bench_consolidation.py \
+        -f log.json
+"""
+import json
+import optparse
+import time
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.strategies as strategies
+
+import bench_stv
+
+
+def action_from_dict(details):
+    """Return an adaptation action from its logged to_dict() form"""
+    action = adaptationaction.AdaptationAction(details['type'])
+    action.target = details.get('target')
+    action.destination = details.get('destination')
+    action.scale_value = details.get('scale_value')
+    action.score = details.get('score', 0)
+    return action
+
+
+def load_recorded_rounds(filename):
+    """Return a list of round results from an exported log collection"""
+    with open(filename) as log_file:
+        entries = json.load(log_file)
+    entries.sort(key=lambda entry: entry.get('log_timestamp'))
+
+    rounds = []
+    pending = {}
+    for entry in entries:
+        stack_id = entry.get('log_stackid')
+        details = entry.get('log_details', {})
+        if entry.get('log_type') == 'plugin_result':
+            pending.setdefault(stack_id, {})[details['name']] = {
+                'weight': details['weight'],
+                'results': [
+                    action_from_dict(action)
+                    for action in details.get('output', [])
+                ],
+            }
+        elif entry.get('log_type') == 'consolidation':
+            round_results = pending.pop(stack_id, None)
+            if round_results:
+                rounds.append(round_results)
+    return rounds
+
+
+def action_key(action):
+    """Return what identifies an action, leaving out the votes it got"""
+    return (
+        action.adaptation_type, action.target, action.destination,
+        action.scale_value
+    )
+
+
+def copy_round(round_results):
+    """Return a copy of round results that a tally can change"""
+    return {
+        name: {
+            'weight': plugin['weight'],
+            'results': [
+                action_from_dict(action.to_dict())
+                for action in plugin['results']
+            ],
+        }
+        for name, plugin in round_results.iteritems()
+    }
+
+
+def compare(rounds, top):
+    """
+    Return {strategy name: (seconds, top-1 agreement, top-n overlap)},
+    agreement and overlap being with STV and averaged over the rounds
+    """
+    rankings = {}
+    timings = {}
+    for name, strategy in strategies.STRATEGIES.iteritems():
+        rankings[name] = []
+        timings[name] = 0
+        for round_results in rounds:
+            round_results = copy_round(round_results)
+            start = time.time()
+            (output, _) = strategy.tally(round_results, [])
+            timings[name] += time.time() - start
+            rankings[name].append([action_key(action) for action in output])
+
+    results = {}
+    for name in strategies.STRATEGIES:
+        same_first = 0
+        overlap = 0.0
+        for (ranking, stv_ranking) in zip(rankings[name], rankings['stv']):
+            if ranking[:1] == stv_ranking[:1]:
+                same_first += 1
+            if stv_ranking:
+                overlap += (
+                    len(set(ranking[:top]) & set(stv_ranking[:top])) /
+                    float(len(stv_ranking[:top]))
+                )
+        results[name] = (
+            timings[name],
+            same_first / float(max(len(rounds), 1)),
+            overlap / max(len(rounds), 1),
+        )
+    return results
+
+
+def main():
+    """Compare the strategies on synthetic or recorded rounds"""
+    parser = optparse.OptionParser()
+    parser.add_option('-c', '--candidates', type='int', default=50)
+    parser.add_option('-p', '--plugins', type='int', default=6)
+    parser.add_option(
+        '-n', '--proposals', type='int', default=10,
+        help='actions proposed per plugin'
+    )
+    parser.add_option(
+        '-r', '--rounds', type='int', default=100,
+        help='synthetic rounds to compare over'
+    )
+    parser.add_option(
+        '-t', '--top', type='int', default=3,
+        help='how many top actions to compare for overlap'
+    )
+    parser.add_option(
+        '-f', '--file',
+        help='exported log collection to take recorded rounds from'
+    )
+    (options, _) = parser.parse_args()
+
+    if options.file:
+        rounds = load_recorded_rounds(options.file)
+        print "{} recorded rounds from {}".format(len(rounds), options.file)
+    else:
+        rounds = [
+            bench_stv.make_round_results(
+                options.candidates, options.plugins, options.proposals,
+                seed=seed
+            )
+            for seed in xrange(options.rounds)
+        ]
+        print "{} synthetic rounds: {} candidates, {} plugins, {} " \
+            "proposals".format(
+                len(rounds), options.candidates, options.plugins,
+                options.proposals
+            )
+
+    print "{:>10} {:>10} {:>10} {:>10}".format(
+        'strategy', 'seconds', 'top-1', 'top-{}'.format(options.top)
+    )
+    results = compare(rounds, options.top)
+    for name in sorted(results):
+        (seconds, same_first, overlap) = results[name]
+        print "{:>10} {:>10.3f} {:>10.2f} {:>10.2f}".format(
+            name, seconds, same_first, overlap
+        )
+
+
+if __name__ == '__main__':
+    main()
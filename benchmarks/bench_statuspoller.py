@@ -0,0 +1,173 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Count the nova API calls made while waiting on concurrent migrations:
+one polling loop per enactment (Enactor.poll_migrate_complete) against
+the shared status poller. Each migration completes at a random time, and
+both approaches check every `interval` seconds
+
+    PYTHONPATH=src python benchmarks/bench_statuspoller.py
+    PYTHONPATH=src python benchmarks/bench_statuspoller.py -e 1 -e 10 -e 100
+"""
+import optparse
+import random
+import threading
+import time
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.enactor as enactor
+import adaptationengine_framework.statuspoller as statuspoller
+
+
+class FakeNova:
+    """A nova client that counts its calls; servers move after a while"""
+
+    def __init__(self, servers, longest, seed=0):
+        """Each server moves to host2 up to `longest` seconds from now"""
+        rnd = random.Random(seed)
+        now = time.time()
+        self._moves_at = dict(
+            (server, now + rnd.uniform(0, longest)) for server in servers
+        )
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hypervisors = mock.Mock()
+        self.hypervisors.search.side_effect = self._search
+        self.servers = mock.Mock()
+        self.servers.list.side_effect = self._list
+        self.servers.get.side_effect = self._get
+
+    def _count(self):
+        """Count an API call"""
+        with self._lock:
+            self.calls += 1
+
+    def _moved(self):
+        """Return the servers on host2 by now"""
+        now = time.time()
+        return [
+            server
+            for server, moves_at in self._moves_at.iteritems()
+            if moves_at <= now
+        ]
+
+    def _search(self, hostname, servers=False):
+        """hypervisors.search, as polled once per enactment"""
+        self._count()
+        hypervisor = mock.Mock()
+        hypervisor.servers = [{'uuid': server} for server in self._moved()]
+        return [hypervisor]
+
+    def _get(self, server):
+        """servers.get, called once a polling loop finds its server"""
+        self._count()
+
+    def _list(self, detailed=True, search_opts=None):
+        """servers.list, as polled once per tick for every enactment"""
+        self._count()
+        moved = set(self._moved())
+        return [
+            mock.Mock(
+                id=server,
+                to_dict=lambda host=('host2' if server in moved else 'host1'):
+                {'OS-EXT-SRV-ATTR:hypervisor_hostname': host}
+            )
+            for server in self._moves_at
+        ]
+
+
+def migrate_action(server):
+    """Return a migration of a server to host2"""
+    return adaptationaction.AdaptationAction(
+        adaptationaction.AdaptationType.MigrateAction,
+        target=server,
+        destination='host2',
+    )
+
+
+def run_polling_loops(enactments, longest, interval):
+    """Return API calls made with one polling loop per enactment"""
+    servers = ['vm{}'.format(i) for i in xrange(enactments)]
+    nova = FakeNova(servers, longest)
+    threads = [
+        threading.Thread(
+            target=enactor.Enactor.poll_migrate_complete,
+            args=(nova, migrate_action(server)),
+            kwargs={
+                'retry_wait': interval,
+                'retries': int(longest / interval) * 2 + 1
+            }
+        )
+        for server in servers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return nova.calls
+
+
+def run_shared_poller(enactments, longest, interval):
+    """Return API calls made with every enactment on the shared poller"""
+    servers = ['vm{}'.format(i) for i in xrange(enactments)]
+    nova = FakeNova(servers, longest)
+    poller = statuspoller.StatusPoller(
+        lambda: nova, None, min_interval=interval, max_interval=interval
+    )
+    watches = [
+        poller.watch_server(server, statuspoller.on_hypervisor('host2'))
+        for server in servers
+    ]
+    for watch in watches:
+        watch.wait(60)
+    poller.stop()
+    return nova.calls
+
+
+def main():
+    """Print API calls for each number of concurrent enactments"""
+    parser = optparse.OptionParser()
+    parser.add_option(
+        '-e', '--enactments', type='int', action='append',
+        help='concurrent enactments, can be given more than once'
+    )
+    parser.add_option(
+        '-l', '--longest', type='float', default=1.0,
+        help='most seconds a migration takes'
+    )
+    parser.add_option(
+        '-i', '--interval', type='float', default=0.05,
+        help='seconds between checks'
+    )
+    (options, _) = parser.parse_args()
+
+    enactor.LOGGER.disabled = True
+    statuspoller.LOGGER.disabled = True
+
+    print "{:>12} {:>14} {:>14}".format(
+        'enactments', 'polling loops', 'shared poller'
+    )
+    for enactments in options.enactments or [1, 10, 50]:
+        print "{:>12} {:>14} {:>14}".format(
+            enactments,
+            run_polling_loops(enactments, options.longest, options.interval),
+            run_shared_poller(enactments, options.longest, options.interval),
+        )
+
+
+if __name__ == '__main__':
+    main()
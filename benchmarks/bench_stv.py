@@ -0,0 +1,124 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Time the STV tally on synthetic round results
+
+    PYTHONPATH=src python benchmarks/bench_stv.py
+    PYTHONPATH=src python benchmarks/bench_stv.py -c 5000 -p 48
+    PYTHONPATH=src python benchmarks/bench_stv.py -e objects -e matrix
+"""
+import optparse
+import random
+import time
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.stv as stv
+import adaptationengine_framework.stvmatrix as stvmatrix
+
+
+ENGINES = {
+    'objects': stv.SingleTransferrableVote.tally,
+    'matrix': stvmatrix.MatrixSingleTransferrableVote.tally,
+}
+
+
+def make_round_results(candidates, plugins, proposals, seed=0):
+    """
+    Return synthetic round results: every plugin proposes `proposals`
+    migrations drawn from a pool of `candidates` (vm, hypervisor) pairs,
+    so plugins overlap the way they do when migrations are expanded
+    """
+    rnd = random.Random(seed)
+    hypervisors = max(int(candidates ** 0.5), 1)
+    pool = [
+        ('vm{}'.format(i / hypervisors), 'host{}'.format(i % hypervisors))
+        for i in xrange(candidates)
+    ]
+
+    round_results = {}
+    for plugin_number in xrange(plugins):
+        results = []
+        for (target, destination) in rnd.sample(
+                pool, min(proposals, candidates)
+        ):
+            action = adaptationaction.AdaptationAction('MigrateAction')
+            action.target = target
+            action.destination = destination
+            action.score = rnd.random()
+            results.append(action)
+        round_results['plugin{}'.format(plugin_number)] = {
+            'weight': rnd.randint(1, 3),
+            'results': results,
+        }
+    return round_results
+
+
+def bench(tally, candidates, plugins, proposals, repeat):
+    """Return the best of `repeat` tally times, in seconds"""
+    best = None
+    for run in xrange(repeat):
+        round_results = make_round_results(
+            candidates, plugins, proposals, seed=run
+        )
+        start = time.time()
+        tally(round_results, [])
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    """Tally a range of sizes, or the one given on the command line"""
+    parser = optparse.OptionParser()
+    parser.add_option('-c', '--candidates', type='int')
+    parser.add_option('-p', '--plugins', type='int')
+    parser.add_option(
+        '-n', '--proposals', type='int',
+        help='actions proposed per plugin (default: all candidates)'
+    )
+    parser.add_option('-r', '--repeat', type='int', default=3)
+    parser.add_option(
+        '-e', '--engine', action='append', choices=sorted(ENGINES),
+        help='tally engine to time, can be repeated (default: objects)'
+    )
+    (options, _) = parser.parse_args()
+    engines = options.engine or ['objects']
+
+    if options.candidates and options.plugins:
+        sizes = [(options.candidates, options.plugins)]
+    else:
+        sizes = [
+            (100, 4), (500, 12), (1000, 12), (1000, 24), (2000, 24),
+            (5000, 48),
+        ]
+
+    print "{:>8} {:>10} {:>8} {:>10} {:>10}".format(
+        'engine', 'candidates', 'plugins', 'proposals', 'seconds'
+    )
+    for (candidates, plugins) in sizes:
+        proposals = options.proposals or candidates
+        for engine in engines:
+            seconds = bench(
+                ENGINES[engine],
+                candidates, plugins, proposals, options.repeat
+            )
+            print "{:>8} {:>10} {:>8} {:>10} {:>10.3f}".format(
+                engine, candidates, plugins, proposals, seconds
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compare the binary wire format with JSON, and with the pickles a plugin's
+results go through in the Manager dict: message size and the time taken
+to encode and decode
+
+    PYTHONPATH=src:benchmarks python benchmarks/bench_wireformat.py
+    PYTHONPATH=src:benchmarks python benchmarks/bench_wireformat.py \
+        -c 2000 -n 500 -i 200
+"""
+import cPickle
+import json
+import optparse
+import time
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.event as event
+import adaptationengine_framework.wireformat as wireformat
+
+import bench_consolidation
+import bench_stv
+
+
+EVENT_MESSAGE = json.dumps({
+    'id': {
+        'user_id': 'a3c1e9b27f4d4a6e8e0b9d1f2c3a4b5c',
+        'tenant': '5d2b8f0e6a7c4e1d9b3a2f4e6c8d0a1b',
+        'stack_id': 'e1f2a3b4-c5d6-4e7f-8a9b-0c1d2e3f4a5b',
+        'source': 'monitoring',
+        'instance': '9f8e7d6c5b4a39281706f5e4d3c2b1a0',
+        'context': 'sla violation',
+        'machines': [
+            '0a1b2c3d-4e5f-4a6b-8c7d-9e0f1a2b3c4d',
+            '1b2c3d4e-5f6a-4b7c-9d8e-0f1a2b3c4d5e',
+        ],
+        'severity': 'critical',
+        'data_center': 'dc1',
+    },
+    'timestamp': 1458000000.0,
+    'event': {'name': 'cpu_high', 'value': 0.97},
+    'data': [{'metric': 'cpu_util', 'value': 97.1}],
+})
+
+
+def actions_to_json(actions):
+    """Encode actions as their to_dict() JSON"""
+    return json.dumps([action.to_dict() for action in actions])
+
+
+def actions_from_json(message):
+    """Decode actions from their to_dict() JSON"""
+    return [
+        bench_consolidation.action_from_dict(details)
+        for details in json.loads(message)
+    ]
+
+
+def actions_to_pickle(actions):
+    """Encode actions as the Manager dict does"""
+    return cPickle.dumps(actions, cPickle.HIGHEST_PROTOCOL)
+
+
+def time_codec(encode, decode, value, iterations):
+    """Return (size, seconds per encode, seconds per decode)"""
+    start = time.time()
+    for _ in xrange(iterations):
+        message = encode(value)
+    encode_seconds = (time.time() - start) / iterations
+
+    start = time.time()
+    for _ in xrange(iterations):
+        decode(message)
+    decode_seconds = (time.time() - start) / iterations
+
+    return (len(message), encode_seconds, decode_seconds)
+
+
+def main():
+    """
+    Time and size each format for an action list and an adaptation
+    request event
+    """
+    parser = optparse.OptionParser()
+    parser.add_option('-c', '--candidates', type='int', default=500)
+    parser.add_option(
+        '-n', '--proposals', type='int', default=100,
+        help='actions in the encoded list'
+    )
+    parser.add_option('-i', '--iterations', type='int', default=500)
+    (options, _) = parser.parse_args()
+
+    actions = bench_stv.make_round_results(
+        options.candidates, 1, options.proposals
+    )['plugin0']['results']
+    cw_event = event.Event(EVENT_MESSAGE)
+
+    codecs = [
+        (
+            '{} actions'.format(len(actions)), actions,
+            [
+                ('json', actions_to_json, actions_from_json),
+                ('pickle', actions_to_pickle, cPickle.loads),
+                (
+                    'binary', wireformat.encode_actions,
+                    wireformat.decode_actions
+                ),
+            ]
+        ),
+        (
+            'event', cw_event,
+            [
+                (
+                    'json',
+                    adaptationaction.AdaptationAction.generate_adaptation_request,
+                    event.Event
+                ),
+                (
+                    'binary', wireformat.encode_adaptation_request,
+                    wireformat.decode_event
+                ),
+            ]
+        ),
+    ]
+
+    print "{:>12} {:>8} {:>10} {:>12} {:>12}".format(
+        'message', 'format', 'bytes', 'encode us', 'decode us'
+    )
+    for (label, value, formats) in codecs:
+        for (name, encode, decode) in formats:
+            (size, encode_seconds, decode_seconds) = time_codec(
+                encode, decode, value, options.iterations
+            )
+            print "{:>12} {:>8} {:>10} {:>12.1f} {:>12.1f}".format(
+                label, name, size, encode_seconds * 1e6, decode_seconds * 1e6
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -34,6 +34,7 @@ setuptools.setup(
         'pika',
         'pymongo',
         'jpype1',
+        'numpy',
         'requests',
         'python-keystoneclient==1.7.2',
         'python-novaclient==2.30.1',
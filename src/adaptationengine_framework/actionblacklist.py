@@ -0,0 +1,119 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class ActionBlacklist:
+    """
+    Actions vetoed by a plugin (scored -1), remembered per stack
+
+    Actions are keyed by AdaptationAction.key(), so lookups don't depend
+    on the score or votes they were given. Each entry expires `ttl`
+    seconds after it was last vetoed. Safe to share between threads
+    """
+
+    def __init__(self, ttl=3600):
+        """Set how many seconds a vetoed action stays blacklisted"""
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # stack id -> {action key: (action, expires at)}
+        self._stacks = {}
+
+    def _entries(self, stack_id, now):
+        """
+        Return a stack's unexpired entries, dropping expired ones. Must be
+        called with the lock held
+        """
+        entries = self._stacks.get(stack_id)
+        if entries is None:
+            return {}
+
+        expired = [
+            key for key, (_, expires_at) in entries.iteritems()
+            if expires_at <= now
+        ]
+        for key in expired:
+            del entries[key]
+        if not entries:
+            del self._stacks[stack_id]
+        return entries
+
+    def add(self, stack_id, actions, now=None):
+        """Blacklist actions for a stack, or extend them if already there"""
+        if not self._ttl or not actions:
+            return
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            entries = self._stacks.setdefault(stack_id, {})
+            for action in actions:
+                entries[action.key()] = (action, now + self._ttl)
+            LOGGER.info(
+                "Stack [{}] has {} blacklisted actions".format(
+                    stack_id, len(entries)
+                )
+            )
+
+    def get(self, stack_id, now=None):
+        """Return the actions blacklisted for a stack"""
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            return [
+                action
+                for (action, _) in self._entries(stack_id, now).itervalues()
+            ]
+
+    def prune(self, stack_id, actions, now=None):
+        """
+        Return (allowed, vetoed): the actions not blacklisted for a stack
+        and the ones that are
+        """
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            entries = self._entries(stack_id, now)
+            if not entries:
+                return (list(actions), [])
+
+            allowed = []
+            vetoed = []
+            for action in actions:
+                if action.key() in entries:
+                    vetoed.append(action)
+                else:
+                    allowed.append(action)
+            return (allowed, vetoed)
+
+    def stats(self):
+        """Return how many actions are blacklisted for each stack"""
+        now = time.time()
+        with self._lock:
+            return {
+                'ttl': self._ttl,
+                'stacks': {
+                    stack_id: len(self._entries(stack_id, now))
+                    for stack_id in self._stacks.keys()
+                },
+            }
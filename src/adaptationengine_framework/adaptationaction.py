@@ -13,7 +13,9 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import copy
 import json
+import operator
 import time
 import uuid
 
@@ -30,6 +32,13 @@ class AdaptationType:
     StopAction = 7
     LowPowerAction = 8
 
+    NAMES = (
+        'MigrateAction', 'VerticalScaleAction',
+        'HorizontalScaleAction', 'DeveloperAction',
+        'CombinedAction', 'NoAction', 'StartAction',
+        'StopAction', 'LowPowerAction'
+    )
+
     @staticmethod
     def get_string(type_int):
         """
@@ -37,74 +46,151 @@ class AdaptationType:
         based on a supplied integer
         """
         try:
-            action_types = [
-                'MigrateAction', 'VerticalScaleAction',
-                'HorizontalScaleAction', 'DeveloperAction',
-                'CombinedAction', 'NoAction', 'StartAction',
-                'StopAction', 'LowPowerAction'
-            ]
-            return action_types[type_int]
+            return AdaptationType.NAMES[type_int]
 
         except Exception:
             raise LookupError('invalid adaptation type [{}]'.format(type_int))
 
+    @staticmethod
+    def get_type(adaptation_type):
+        """
+        Return the integer adaptation type for a supplied int or a
+        case-insensitive type name
+        """
+        if type(adaptation_type) is int:
+            if 0 <= adaptation_type < len(AdaptationType.NAMES):
+                return adaptation_type
+        else:
+            type_int = _TYPES_BY_NAME.get(str(adaptation_type).lower())
+            if type_int is not None:
+                return type_int
+
+        raise LookupError(
+            'invalid adaptation type [{}]'.format(adaptation_type)
+        )
+
+
+_TYPES_BY_NAME = {
+    name.lower(): type_int
+    for type_int, name in enumerate(AdaptationType.NAMES)
+}
+
+
+def _core_property(name):
+    """
+    Return a property for part of what an action does: reads go straight
+    to its slot, writes also forget the action's key
+    """
+    slot = '_' + name
 
-class AdaptationAction:
-    """An object representation of an adaptation action"""
+    def set_core(self, value):
+        """Set the attribute and forget the key"""
+        setattr(self, slot, value)
+        self._key = None
 
-    def __init__(self, adaptation_type):
+    return property(operator.attrgetter(slot), set_core)
+
+
+class AdaptationAction(object):
+    """
+    An object representation of an adaptation action
+
+    The type, target, destination, scale value, sub-actions and target app
+    are what the action does; its key, hash and equality come from them
+    alone and are computed once, until one of them is set again (the
+    sub-actions, being a mutable list, are read afresh each time there
+    are any). score, votes and candidate are what a plugin or tally made
+    of the action, and can be changed freely. Use replace() for a changed
+    copy
+    """
+
+    __slots__ = (
+        '_adaptation_type', '_target', '_destination', '_scale_value',
+        '_actions', '_target_app', 'score', 'votes', 'candidate', '_key',
+        '_hash'
+    )
+
+    adaptation_type = _core_property('adaptation_type')
+    target = _core_property('target')
+    destination = _core_property('destination')
+    scale_value = _core_property('scale_value')
+    actions = _core_property('actions')
+    target_app = _core_property('target_app')
+
+    def __init__(
+            self,
+            adaptation_type,
+            target="",
+            destination="",
+            scale_value="",
+            actions=None,
+            target_app="",  # i.e. stack_id for redirecting to another stack
+            score=0,
+            votes=0,
+            candidate=''
+    ):
         """
         Create an adaptation action object based on a supplied int or string
         """
-        action_types = [
-            'migrateaction', 'verticalscaleaction',
-            'horizontalscaleaction', 'developeraction',
-            'combinedaction', 'noaction', 'startaction',
-            'stopaction', 'lowpoweraction'
-        ]
-        try:
-            if type(adaptation_type) is int:
-                if adaptation_type < len(action_types) and adaptation_type >= 0:
-                    self.adaptation_type = adaptation_type
-                else:
-                    raise Exception
-            else:
-                normalised_type = str(adaptation_type).lower()
-                self.adaptation_type = action_types.index(normalised_type)
-        except Exception:
-            raise LookupError(
-                'invalid adaptation type [{}]'.format(adaptation_type)
-            )
+        self._adaptation_type = AdaptationType.get_type(adaptation_type)
+        self._target = target
+        self._destination = destination
+        self._scale_value = scale_value
+        self._actions = actions if actions is not None else []
+        self._target_app = target_app
+        self.score = score
+        self.votes = votes
+        self.candidate = candidate
+        self._key = None
+        self._hash = None
+
+    def __getstate__(self):
+        """Return the attributes to pickle or copy, cached key included"""
+        return tuple(
+            [getattr(self, name) for name in AdaptationAction.__slots__]
+        )
 
-        self.target = ""
-        self.destination = ""
-        self.scale_value = ""
-        self.actions = []
-        self.score = 0
-        self.votes = 0
-        self.candidate = ''
+    def __setstate__(self, state):
+        """Restore pickled or copied attributes"""
+        for name, value in zip(AdaptationAction.__slots__, state):
+            setattr(self, name, value)
+
+    def key(self):
+        """
+        Return a hashable key for what the action does, leaving out the
+        score, votes and candidate a plugin or tally gave it
+        """
+        if self._key is None or self._actions:
+            key = (
+                self._adaptation_type,
+                self._target,
+                self._destination,
+                self._scale_value,
+                self._target_app,
+                tuple(self._actions),
+            )
+            self._hash = hash(key)
+            self._key = key
+        return self._key
 
-        self.target_app = ""  # i.e. stack_id for redirecting to another stack
+    def replace(self, **fields):
+        """Return a copy of the action with some attributes changed"""
+        action = copy.copy(self)
+        for name, value in fields.iteritems():
+            setattr(action, name, value)
+        return action
 
     def __eq__(self, other):
         """Check two adaptation actions for equality"""
         try:
-            if (
-                    self.adaptation_type == other.adaptation_type and
-                    self.target == other.target and
-                    self.destination == other.destination and
-                    self.scale_value == other.scale_value and
-                    self.actions == other.actions and
-					self.votes == other.votes and
-	                self.candidate == other.candidate and
-                    self.target_app == other.target_app
-            ):
-                return True
-            else:
-                return False
+            return self.key() == other.key()
         except AttributeError:
             return False
 
+    def __ne__(self, other):
+        """Check two adaptation actions for inequality"""
+        return not self == other
+
     def __repr__(self):
         """Return a string representing the adaptation action"""
         output = (
@@ -123,17 +209,9 @@ class AdaptationAction:
         return output
 
     def __hash__(self):
-        return hash(
-            (
-                self.adaptation_type,
-                self.target,
-                self.destination,
-                self.scale_value,
-                self.votes,
-                self.candidate,
-                self.target_app
-            )
-        )
+        if self._key is None or self._actions:
+            self.key()
+        return self._hash
 
     def to_dict(self):
         """return a json-compatible dictionary representation of the action"""
@@ -148,6 +226,27 @@ class AdaptationAction:
         }
         return output
 
+    def attributes(self):
+        """
+        Return a json-compatible dictionary of every attribute of the
+        action, with sub-actions as dictionaries of their own
+        """
+        return {
+            "adaptation_type": self.adaptation_type,
+            "target": self.target,
+            "destination": self.destination,
+            "scale_value": self.scale_value,
+            "actions": [
+                action.attributes()
+                if isinstance(action, AdaptationAction) else action
+                for action in self.actions
+            ],
+            "target_app": self.target_app,
+            "score": self.score,
+            "votes": self.votes,
+            "candidate": self.candidate,
+        }
+
     @staticmethod
     def generate_adaptation_request(
         adaptation_event,
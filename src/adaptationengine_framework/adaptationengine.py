@@ -21,16 +21,28 @@ import signal
 import sys
 import time
 
+import adaptationengine_framework.actionblacklist as actionblacklist
 import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.circuitbreaker as circuitbreaker
+import adaptationengine_framework.completiontracker as completiontracker
+import adaptationengine_framework.configuration as cfg
+import adaptationengine_framework.consolidationmemo as consolidationmemo
 import adaptationengine_framework.database as database
 import adaptationengine_framework.distributor as distributor
+import adaptationengine_framework.embargotimers as embargotimers
+import adaptationengine_framework.enactmentscheduler as enactmentscheduler
 import adaptationengine_framework.enactor as enactor
 import adaptationengine_framework.event as event
 import adaptationengine_framework.heatresourcehandler as heatresourcehandler
 import adaptationengine_framework.mqhandler as mqhandler
+import adaptationengine_framework.openstack as openstack
 import adaptationengine_framework.output as output
 import adaptationengine_framework.pluginmanager as pluginmanager
+import adaptationengine_framework.pluginscheduler as pluginscheduler
+import adaptationengine_framework.plugintimeouts as plugintimeouts
 import adaptationengine_framework.rest as rest
+import adaptationengine_framework.statuspoller as statuspoller
+import adaptationengine_framework.wireformat as wireformat
 import adaptationengine_framework.utils as utils
 
 
@@ -48,25 +60,159 @@ class AdaptationEngine:
         """
         Create plugin and message queue managers
         """
+        self._start_time = time.time()
+        self._first_event_received = False
+
         _manager = multiprocessing.Manager()
         self._locked_stacks = _manager.list()
 
+        phase_start = time.time()
         self._plugin_manager = pluginmanager.PluginManager()
+        self._log_startup_phase('plugin manager', phase_start)
         output.OUTPUT.info("Plugin manager started")
 
+        self._plugin_timeouts = None
+        if cfg.plugin__adaptive_timeout:
+            self._plugin_timeouts = plugintimeouts.PluginTimeouts(
+                default_timeout=cfg.plugin__timeout or 30,
+                percentile=cfg.plugin__timeout_percentile,
+                headroom=cfg.plugin__timeout_headroom,
+                floor=cfg.plugin__timeout_floor,
+                ceiling=cfg.plugin__timeout_ceiling,
+                window=cfg.plugin__timeout_window,
+                min_samples=cfg.plugin__timeout_min_samples,
+            )
+
+        self._plugin_scheduler = pluginscheduler.PluginScheduler(
+            workers=cfg.plugin__workers,
+            default_limit=cfg.plugin__default_concurrency,
+            limits=cfg.plugin__concurrency,
+            timeouts=self._plugin_timeouts
+        )
+        output.OUTPUT.info("Plugin scheduler started")
+
+        self._circuit_breakers = None
+        if cfg.plugin__circuit_breaker:
+            self._circuit_breakers = circuitbreaker.PluginCircuitBreakers(
+                failure_rate=cfg.plugin__breaker_failure_rate,
+                window=cfg.plugin__breaker_window,
+                min_calls=cfg.plugin__breaker_min_calls,
+                open_seconds=cfg.plugin__breaker_open_seconds,
+            )
+
+        self._action_blacklist = actionblacklist.ActionBlacklist(
+            ttl=cfg.consolidation__blacklist_ttl
+        )
+
+        self._consolidation_memo = None
+        if cfg.consolidation__memo_size:
+            self._consolidation_memo = consolidationmemo.ConsolidationMemo(
+                size=cfg.consolidation__memo_size
+            )
+
+        self._status_poller = None
+        self._completion_tracker = None
+        if cfg.enactment__poller:
+            self._status_poller = statuspoller.StatusPoller(
+                get_nova_client=openstack.REGISTRY.nova,
+                get_heat_client=openstack.REGISTRY.heat,
+                min_interval=cfg.enactment__poll_min_interval,
+                max_interval=cfg.enactment__poll_max_interval,
+                timeout=cfg.enactment__poll_timeout,
+                silence=(
+                    cfg.enactment__notifications_silence
+                    if cfg.enactment__notifications else 0
+                ),
+                get_heat_client_for_stack=openstack.REGISTRY.heat_for_stack,
+                on_error=openstack.REGISTRY.unauthorized,
+            )
+            if cfg.enactment__notifications:
+                self._completion_tracker = (
+                    completiontracker.CompletionTracker(
+                        self._status_poller,
+                        host=cfg.enactment__notifications_host,
+                        port=cfg.enactment__notifications_port,
+                        username=cfg.enactment__notifications_username,
+                        password=cfg.enactment__notifications_password,
+                        exchange=cfg.enactment__notifications_exchange,
+                        key=cfg.enactment__notifications_key,
+                        server_locations=openstack.LOCATIONS,
+                    )
+                )
+
+        self._enactment_scheduler = None
+        if cfg.enactment__scheduler:
+            self._enactment_scheduler = (
+                enactmentscheduler.EnactmentScheduler(
+                    locate_server=openstack.LOCATIONS.hypervisor_of,
+                    max_concurrent=cfg.enactment__max_concurrent,
+                    per_hypervisor=cfg.enactment__per_hypervisor,
+                    per_tenant=cfg.enactment__per_tenant,
+                )
+            )
+            output.OUTPUT.info("Enactment scheduler started")
+
+        self._embargo_timers = embargotimers.EmbargoTimers()
+
         self._mq_handler = mqhandler.MQHandler(msg_callback=self._on_message)
         output.OUTPUT.info("Message Queue handler started")
 
+        # owners of stacks found before, and of any found from now on
+        openstack.REGISTRY.track_stack_tenants(
+            database.Database.load_stack_tenants(),
+            on_learned=database.Database.save_stack_tenants,
+            on_forgotten=database.Database.delete_stack_tenant
+        )
+
+        phase_start = time.time()
         self._heat_resources = heatresourcehandler.HeatResourceHandler(
             mq_handler=self._mq_handler,
         )
+        self._log_startup_phase('heat resource recovery', phase_start)
         output.OUTPUT.info("Heat resource handler started")
 
+        stats_functions = {
+            'plugin_scheduler': self._plugin_scheduler.stats,
+            'action_blacklist': self._action_blacklist.stats,
+            'openstack_clients': openstack.REGISTRY.stats,
+            'openstack_inventory': openstack.INVENTORY.stats,
+            'server_locations': openstack.LOCATIONS.stats,
+            'embargoes': self._embargo_timers.stats,
+        }
+        if self._plugin_timeouts is not None:
+            stats_functions['plugin_timeouts'] = self._plugin_timeouts.stats
+        if self._circuit_breakers is not None:
+            stats_functions['plugin_breakers'] = self._circuit_breakers.stats
+        if self._consolidation_memo is not None:
+            stats_functions['consolidation_memo'] = (
+                self._consolidation_memo.stats
+            )
+        if self._status_poller is not None:
+            stats_functions['enactment_poller'] = self._status_poller.stats
+        if self._completion_tracker is not None:
+            stats_functions['enactment_notifications'] = (
+                self._completion_tracker.stats
+            )
+        if self._enactment_scheduler is not None:
+            stats_functions['enactment_scheduler'] = (
+                self._enactment_scheduler.stats
+            )
+
         self._webbo = rest.Webbo(
-            self._heat_resources.get_agreement_map
+            self._heat_resources.get_agreement_map,
+            stats_functions
         )
         output.OUTPUT.info("Web server created")
 
+    @staticmethod
+    def _log_startup_phase(phase_name, phase_start):
+        """Log how long a named startup phase took"""
+        LOGGER.info(
+            "Startup phase [{}] took {:.3f} seconds".format(
+                phase_name, time.time() - phase_start
+            )
+        )
+
     def setup(self):
         """Setup required message queue connections"""
         self._mq_handler.setup()
@@ -90,16 +236,34 @@ class AdaptationEngine:
         Determine the type of message and act accordingly. It should either
         be a message from a Heat Resource or an Event message.
         """
+        if not self._first_event_received:
+            self._first_event_received = True
+            LOGGER.info(
+                "First message received {:.3f} seconds after startup".format(
+                    time.time() - self._start_time
+                )
+            )
+
         try:
-            LOGGER.info("message was [{}]".format(str(message)))
-            msg_json = json.loads(message)
-            if len(msg_json) == 1 and 'heat' in msg_json:
-                # presumably a message from heat
-                self._heat_resources.message(message)
-
-            elif len(msg_json) >= 4 and 'id' in msg_json:
-                # assuredly an event
-                cw_event = event.Event(message)
+            cw_event = None
+            if wireformat.is_binary(message):
+                # an event in the binary wire format
+                cw_event = wireformat.decode_event(message)
+                LOGGER.info("binary event was [{}]".format(cw_event.name))
+            else:
+                LOGGER.info("message was [{}]".format(str(message)))
+                msg_json = json.loads(message)
+                if len(msg_json) == 1 and 'heat' in msg_json:
+                    # presumably a message from heat
+                    self._heat_resources.message(message)
+
+                elif len(msg_json) >= 4 and 'id' in msg_json:
+                    # assuredly an event
+                    cw_event = event.Event(message)
+                else:
+                    raise ValueError('Message invalid')
+
+            if cw_event is not None:
                 if cw_event.stack_id not in self._locked_stacks:
                     self._locked_stacks.append(cw_event.stack_id)
                     try:
@@ -118,8 +282,6 @@ class AdaptationEngine:
                     stack_id=cw_event.stack_id,
                     event=cw_event
                 )
-            else:
-                raise ValueError('Message invalid')
         except ValueError, err:
             # too large / not json / incorrect message format
             LOGGER.error('{}'.format(err))
@@ -132,7 +294,8 @@ class AdaptationEngine:
                 )
             )
             LOGGER.exception(err)
-            self._unlock_stack(cw_event.stack_id)
+            if cw_event is not None:
+                self._unlock_stack(cw_event.stack_id)
 
     def _process_event(self, cw_event):
         """
@@ -164,13 +327,7 @@ class AdaptationEngine:
                         "to set target from"
                     )
                 LOGGER.info("Enacting adaptation")
-                enactor.Enactor.enact(
-                    event=cw_event,
-                    heat_resource=heat_resource,
-                    stack_id=cw_event.stack_id,
-                    adaptation_action=pass_action,
-                )
-                self._unlock_stack(cw_event.stack_id)
+                self._enact(cw_event, heat_resource, pass_action)
             else:
                 dist = distributor.Distributor(
                     cw_event,
@@ -179,6 +336,10 @@ class AdaptationEngine:
                     agreement_map=self._heat_resources.get_agreement_map(),
                     callback=self._on_distributor_results,
                     plugin_manager=self._plugin_manager,
+                    plugin_scheduler=self._plugin_scheduler,
+                    circuit_breakers=self._circuit_breakers,
+                    action_blacklist=self._action_blacklist,
+                    consolidation_memo=self._consolidation_memo,
                 )
                 dist.start()
         else:
@@ -229,25 +390,65 @@ class AdaptationEngine:
                     adaptationaction.AdaptationType.DeveloperAction
                 )
 
+            self._enact(
+                cwevent, heat_resource, chosen_adaptation, logged_results
+            )
+
+        except Exception, err:
+            LOGGER.error(
+                "There was an exception handling distributor "
+                "results: [{}]".format(err)
+            )
+            self._unlock_stack(cwevent.stack_id)
+
+    def _enact(
+            self,
+            cw_event,
+            heat_resource,
+            adaptation_action,
+            logged_results=None
+    ):
+        """
+        Enact an adaptation action and then unlock its stack, queueing it
+        on the enactment scheduler if there is one. If the stack is
+        embargoed it's unlocked when the embargo is over instead
+        """
+        if logged_results is None:
+            logged_results = {}
+        stack_id = cw_event.stack_id
+        embargoed = []
+
+        def embargo(seconds):
+            embargoed.append(seconds)
+            self._embargo_timers.embargo(
+                stack_id, seconds, lambda: self._unlock_stack(stack_id)
+            )
+
+        def run():
             try:
                 enactor.Enactor.enact(
-                    event=cwevent,
+                    event=cw_event,
                     heat_resource=heat_resource,
-                    stack_id=cwevent.stack_id,
-                    adaptation_action=chosen_adaptation,
-                    logged_results=logged_results
+                    stack_id=stack_id,
+                    adaptation_action=adaptation_action,
+                    logged_results=logged_results,
+                    status_poller=self._status_poller,
+                    embargo=embargo
                 )
             except Exception, err:
                 LOGGER.error("Error enacting adaptation [{}]".format(err))
+                openstack.REGISTRY.unauthorized(err)
+            finally:
+                if not embargoed:
+                    self._unlock_stack(stack_id)
 
-        except Exception, err:
-            LOGGER.error(
-                "There was an exception handling distributor "
-                "results: [{}]".format(err)
+        if self._enactment_scheduler is None:
+            run()
+        else:
+            self._enactment_scheduler.submit(
+                run, adaptation_action, tenant=cw_event.tenant_id
             )
 
-        self._unlock_stack(cwevent.stack_id)
-
     def _unlock_stack(self, stackid):
         """
         Remove stackid from the list of locked stacks,
@@ -265,13 +466,26 @@ class AdaptationEngine:
     def run(self):
         """Connect the message queue handlers"""
         self._mq_handler.run()
+        openstack.INVENTORY.start(cfg.openstack__inventory_refresh)
+        if self._completion_tracker is not None:
+            self._completion_tracker.start()
         self._webbo.start()
+        self._log_startup_phase('total', self._start_time)
 
     def stop(self):
         """Disconnect the message queue handlers"""
         try:
             self._mq_handler.stop()
             self._webbo.stop()
+            self._plugin_scheduler.stop()
+            self._embargo_timers.stop()
+            openstack.INVENTORY.stop()
+            if self._enactment_scheduler is not None:
+                self._enactment_scheduler.stop()
+            if self._completion_tracker is not None:
+                self._completion_tracker.stop()
+            if self._status_poller is not None:
+                self._status_poller.stop()
         except Exception, err:
             print err
 
@@ -0,0 +1,353 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+import threading
+
+import numpy
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class CandidateFeatures:
+    """
+    A feature matrix describing every migration candidate for a decision
+
+    Row i of the matrix describes the candidate (MigrateAction, targets[i],
+    destinations[i]). The columns are named in COLUMNS, so plugins can score
+    every candidate with one vectorised expression and pick the best rows
+    """
+
+    COLUMNS = (
+        'hypervisor_load',
+        'free_ram_mb',
+        'free_vcpus',
+        'flavor_ram_mb',
+        'flavor_vcpus',
+    )
+
+    def __init__(self, targets, destinations, matrix):
+        """Store the candidate rows and their features"""
+        self.targets = targets
+        self.destinations = destinations
+        self.matrix = matrix
+
+    def __len__(self):
+        """Return the number of candidates"""
+        return len(self.targets)
+
+    def column(self, name):
+        """Return the named feature column as a numpy array"""
+        return self.matrix[:, CandidateFeatures.COLUMNS.index(name)]
+
+    def action(self, row):
+        """Return the MigrateAction described by a row"""
+        return adaptationaction.AdaptationAction(
+            adaptationaction.AdaptationType.MigrateAction,
+            target=self.targets[row],
+            destination=self.destinations[row]
+        )
+
+    def best(self, scores, count=1):
+        """
+        Return MigrateActions for the count highest-scoring rows, best
+        first, with each action's score set from scores
+        """
+        scores = numpy.asarray(scores, dtype=float)
+        order = numpy.argsort(-scores, kind='mergesort')[:count]
+        actions = []
+        for row in order:
+            action = self.action(row)
+            action.score = float(scores[row])
+            actions.append(action)
+        return actions
+
+    def exclude(self, keys):
+        """Return the candidates whose action keys aren't in keys"""
+        if not keys:
+            return self
+
+        keep = [
+            row for row in xrange(len(self))
+            if self.action(row).key() not in keys
+        ]
+        return CandidateFeatures(
+            [self.targets[row] for row in keep],
+            [self.destinations[row] for row in keep],
+            self.matrix[keep]
+        )
+
+    @staticmethod
+    def empty():
+        """Return a feature set with no candidates"""
+        return CandidateFeatures(
+            [], [], numpy.zeros((0, len(CandidateFeatures.COLUMNS)))
+        )
+
+    @staticmethod
+    def _get_targets(event, initial_actions):
+        """
+        Return the VM ids to consider moving: any targets already set on
+        the allowed actions, otherwise the machines named in the event
+        """
+        targets = [
+            action.target for action in initial_actions
+            if action.target and (
+                action.adaptation_type ==
+                adaptationaction.AdaptationType.MigrateAction
+            )
+        ]
+        if not targets:
+            for machine in event.machines or []:
+                try:
+                    targets.append(machine.get('id'))
+                except AttributeError:
+                    pass
+
+        # keep order, drop duplicates
+        seen = set()
+        return [t for t in targets if t and not (t in seen or seen.add(t))]
+
+    @staticmethod
+    def build(event, initial_actions, nova_client):
+        """
+        Build the candidate feature matrix for an event using one hypervisor
+        listing, one server listing and one flavor listing
+        """
+        if not [
+                action for action in initial_actions
+                if action.adaptation_type ==
+                adaptationaction.AdaptationType.MigrateAction
+        ]:
+            return CandidateFeatures.empty()
+
+        targets = CandidateFeatures._get_targets(event, initial_actions)
+        if not targets:
+            LOGGER.warn("No migration targets found for candidate features")
+            return CandidateFeatures.empty()
+
+        hypervisors = nova_client.hypervisors.list()
+        servers = {
+            server.id: server for server in nova_client.servers.list(
+                search_opts={'all_tenants': True}
+            )
+        }
+        flavors = {flavor.id: flavor for flavor in nova_client.flavors.list()}
+
+        # per hypervisor features
+        host_names = [h.hypervisor_hostname for h in hypervisors]
+        host_index = {name: i for i, name in enumerate(host_names)}
+        vcpus = numpy.array(
+            [float(h.vcpus) for h in hypervisors], dtype=float
+        )
+        vcpus_used = numpy.array(
+            [float(h.vcpus_used) for h in hypervisors], dtype=float
+        )
+        free_ram = numpy.array(
+            [float(h.free_ram_mb) for h in hypervisors], dtype=float
+        )
+        load = vcpus_used / numpy.maximum(vcpus, 1.0)
+        free_vcpus = vcpus - vcpus_used
+
+        # per target features
+        target_host = numpy.empty(len(targets), dtype=int)
+        flavor_ram = numpy.zeros(len(targets), dtype=float)
+        flavor_vcpus = numpy.zeros(len(targets), dtype=float)
+        for i, target in enumerate(targets):
+            server = servers.get(target)
+            current_host = getattr(
+                server, 'OS-EXT-SRV-ATTR:hypervisor_hostname', None
+            )
+            target_host[i] = host_index.get(current_host, -1)
+            try:
+                flavor = flavors.get(server.flavor.get('id'))
+                flavor_ram[i] = float(flavor.ram)
+                flavor_vcpus[i] = float(flavor.vcpus)
+            except AttributeError:
+                LOGGER.warn("Could not find flavor of vm {}".format(target))
+
+        # every target against every hypervisor it isn't already on
+        target_rows = numpy.repeat(numpy.arange(len(targets)), len(host_names))
+        host_rows = numpy.tile(numpy.arange(len(host_names)), len(targets))
+        valid = target_host[target_rows] != host_rows
+        target_rows = target_rows[valid]
+        host_rows = host_rows[valid]
+
+        matrix = numpy.column_stack((
+            load[host_rows],
+            free_ram[host_rows],
+            free_vcpus[host_rows],
+            flavor_ram[target_rows],
+            flavor_vcpus[target_rows],
+        ))
+
+        return CandidateFeatures(
+            [targets[i] for i in target_rows],
+            [host_names[i] for i in host_rows],
+            matrix
+        )
+
+
+class HostFeatures:
+    """
+    A feature matrix describing every hypervisor as a migration
+    destination, one row per hostname, with columns named in COLUMNS
+    """
+
+    COLUMNS = (
+        'free_ram_mb',
+        'free_vcpus',
+        'vcpus',
+        'vcpus_used',
+        'running_vms',
+    )
+
+    def __init__(self, hostnames, matrix):
+        """Store the hostnames and their features"""
+        self.hostnames = hostnames
+        self.matrix = matrix
+
+    def __len__(self):
+        """Return the number of hypervisors"""
+        return len(self.hostnames)
+
+    def column(self, name):
+        """Return the named feature column as a numpy array"""
+        return self.matrix[:, HostFeatures.COLUMNS.index(name)]
+
+    @staticmethod
+    def build(hypervisors):
+        """Build the features from a listing of hypervisors"""
+        if not hypervisors:
+            return HostFeatures(
+                [], numpy.zeros((0, len(HostFeatures.COLUMNS)))
+            )
+
+        matrix = numpy.array(
+            [
+                [
+                    float(h.free_ram_mb),
+                    float(h.vcpus) - float(h.vcpus_used),
+                    float(h.vcpus),
+                    float(h.vcpus_used),
+                    float(getattr(h, 'running_vms', 0) or 0),
+                ]
+                for h in hypervisors
+            ],
+            dtype=float
+        )
+        return HostFeatures(
+            [h.hypervisor_hostname for h in hypervisors], matrix
+        )
+
+
+def spare_capacity(hosts, flavor_ram_mb, flavor_vcpus):
+    """
+    Score destinations by the RAM and vCPUs they'd have left after the
+    move, each as a share of the most any host has, less their current
+    vCPU load
+    """
+    free_ram = hosts.column('free_ram_mb')
+    free_vcpus = hosts.column('free_vcpus')
+    load = hosts.column('vcpus_used') / numpy.maximum(
+        hosts.column('vcpus'), 1.0
+    )
+    return (
+        (free_ram - flavor_ram_mb) / max(free_ram.max(), 1.0) +
+        (free_vcpus - flavor_vcpus) / max(hosts.column('vcpus').max(), 1.0) -
+        load
+    )
+
+
+def select_destinations(
+        hypervisors,
+        current_host=None,
+        flavor=None,
+        count=1,
+        score=spare_capacity
+):
+    """
+    Return [(hostname, score)] for the count best hypervisors to migrate
+    a server of a flavor to, best first. score(hosts, flavor_ram_mb,
+    flavor_vcpus) rates every row of a HostFeatures at once. The host
+    the server is on, and hosts without the RAM for it, are left out
+    """
+    hosts = HostFeatures.build(hypervisors)
+    if not len(hosts):
+        return []
+
+    flavor_ram = float(getattr(flavor, 'ram', 0) or 0)
+    flavor_vcpus = float(getattr(flavor, 'vcpus', 0) or 0)
+
+    scores = numpy.asarray(
+        score(hosts, flavor_ram, flavor_vcpus), dtype=float
+    )
+    eligible = (
+        (hosts.column('free_ram_mb') >= flavor_ram) &
+        (numpy.array(hosts.hostnames, dtype=object) != current_host)
+    )
+    scores = numpy.where(eligible, scores, -numpy.inf)
+
+    order = numpy.argsort(-scores, kind='mergesort')[:count]
+    return [
+        (hosts.hostnames[row], float(scores[row]))
+        for row in order if eligible[row]
+    ]
+
+
+class CandidateProvider:
+    """
+    Build a decision's candidate features on first request and hand the
+    same object to every plugin that asks afterwards
+    """
+
+    def __init__(
+            self, event, initial_actions, get_nova_client, vetoed=None
+    ):
+        """
+        Store what's needed to build the features later, and the keys of
+        any actions to leave out
+        """
+        self._event = event
+        self._initial_actions = initial_actions
+        self._get_nova_client = get_nova_client
+        self._vetoed = vetoed
+        self._lock = threading.Lock()
+        self._features = None
+
+    def get(self):
+        """Return the candidate features, building them if needed"""
+        with self._lock:
+            if self._features is None:
+                try:
+                    self._features = CandidateFeatures.build(
+                        self._event,
+                        self._initial_actions,
+                        self._get_nova_client()
+                    ).exclude(self._vetoed)
+                    LOGGER.info(
+                        "Built {} migration candidates".format(
+                            len(self._features)
+                        )
+                    )
+                except Exception, err:
+                    LOGGER.error("Could not build candidate features")
+                    LOGGER.exception(err)
+                    self._features = CandidateFeatures.empty()
+
+            return self._features
@@ -0,0 +1,199 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class Outcome:
+    """How a plugin invocation ended"""
+    SUCCESS = 'success'
+    ERROR = 'error'
+    TIMEOUT = 'timeout'
+
+
+class CircuitBreaker:
+    """
+    Track one plugin's recent outcomes and stop calling it while it's broken
+
+    closed: the plugin is called as normal. If at least `min_calls` of the
+    last `window` calls exist and the fraction that errored or timed out
+    reaches `failure_rate`, the breaker opens.
+
+    open: the plugin is skipped. After `open_seconds` the breaker goes
+    half-open.
+
+    half_open: one trial call is let through. Success closes the breaker,
+    failure opens it again. If the trial never reports back within
+    `open_seconds` another one is allowed
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate, window, min_calls, open_seconds):
+        """Set the thresholds and start closed"""
+        self._failure_rate = failure_rate
+        self._min_calls = min_calls
+        self._open_seconds = open_seconds
+        self._outcomes = collections.deque(maxlen=window)
+
+        self.state = CircuitBreaker.CLOSED
+        self.opened_at = None
+        self.last_failure = None
+        self._trial_started = None
+
+    def allow(self, now=None):
+        """Return True if the plugin should be called"""
+        now = now or time.time()
+        if self.state == CircuitBreaker.CLOSED:
+            return True
+
+        if self.state == CircuitBreaker.OPEN:
+            if now - self.opened_at < self._open_seconds:
+                return False
+            self.state = CircuitBreaker.HALF_OPEN
+            self._trial_started = None
+
+        # half open: one trial at a time
+        if (
+                self._trial_started is None or
+                now - self._trial_started >= self._open_seconds
+        ):
+            self._trial_started = now
+            return True
+
+        return False
+
+    def record(self, outcome, now=None):
+        """Record how a call ended, changing state if needed"""
+        now = now or time.time()
+        failed = outcome != Outcome.SUCCESS
+        if failed:
+            self.last_failure = outcome
+
+        if self.state == CircuitBreaker.HALF_OPEN:
+            self._trial_started = None
+            self._outcomes.clear()
+            if failed:
+                self._open(now)
+            else:
+                self.state = CircuitBreaker.CLOSED
+            return
+
+        self._outcomes.append(failed)
+        if (
+                self.state == CircuitBreaker.CLOSED and
+                len(self._outcomes) >= self._min_calls and
+                self.failure_rate() >= self._failure_rate
+        ):
+            self._open(now)
+
+    def failure_rate(self):
+        """Return the fraction of remembered calls that failed"""
+        if not self._outcomes:
+            return 0.0
+        return float(sum(self._outcomes)) / len(self._outcomes)
+
+    def _open(self, now):
+        """Start skipping the plugin"""
+        self.state = CircuitBreaker.OPEN
+        self.opened_at = now
+
+
+class PluginCircuitBreakers:
+    """A circuit breaker for every plugin, safe to share between threads"""
+
+    def __init__(
+            self, failure_rate=0.5, window=20, min_calls=5, open_seconds=60
+    ):
+        """Set the thresholds every plugin's breaker will use"""
+        self._failure_rate = failure_rate
+        self._window = window
+        self._min_calls = min_calls
+        self._open_seconds = open_seconds
+        self._lock = threading.Lock()
+        self._breakers = {}
+
+    def _get(self, plugin_name):
+        """Return a plugin's breaker. Must be called with the lock held"""
+        breaker = self._breakers.get(plugin_name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                self._failure_rate,
+                self._window,
+                self._min_calls,
+                self._open_seconds
+            )
+            self._breakers[plugin_name] = breaker
+        return breaker
+
+    def allow(self, plugin_name):
+        """
+        Return (allowed, reason): whether to call the plugin and, if not,
+        why it is being skipped
+        """
+        with self._lock:
+            breaker = self._get(plugin_name)
+            if breaker.allow():
+                return (True, None)
+            return (
+                False,
+                "circuit breaker open after repeated {} results, "
+                "retrying in {:.0f} seconds".format(
+                    breaker.last_failure,
+                    max(
+                        breaker.opened_at + self._open_seconds - time.time(),
+                        0
+                    )
+                )
+            )
+
+    def record(self, plugin_name, outcome):
+        """Record how a plugin invocation ended"""
+        with self._lock:
+            breaker = self._get(plugin_name)
+            previous_state = breaker.state
+            breaker.record(outcome)
+            if breaker.state != previous_state:
+                LOGGER.warn(
+                    "[{}] circuit breaker {} -> {} ({})".format(
+                        plugin_name, previous_state, breaker.state, outcome
+                    )
+                )
+
+    def state(self, plugin_name):
+        """Return the state of a plugin's breaker"""
+        with self._lock:
+            return self._get(plugin_name).state
+
+    def stats(self):
+        """Return every plugin's breaker state and failure rate"""
+        with self._lock:
+            return {
+                name: {
+                    'state': breaker.state,
+                    'failure_rate': breaker.failure_rate(),
+                    'last_failure': breaker.last_failure,
+                    'opened_at': breaker.opened_at,
+                }
+                for name, breaker in self._breakers.iteritems()
+            }
@@ -0,0 +1,182 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import json
+import logging
+import threading
+
+import adaptationengine_framework.rabbitmq as rabbitmq
+import adaptationengine_framework.statuspoller as statuspoller
+
+
+LOGGER = logging.getLogger('syslog')
+
+# notification suffixes that mean an operation has finished, one way or
+# the other
+FINISHED = ('.end', '.error')
+
+
+def unwrap(body):
+    """
+    Return an OpenStack notification as a dict, from either a plain or an
+    oslo.messaging 2.0 envelope
+    """
+    message = json.loads(body)
+    if 'oslo.message' in message:
+        message = json.loads(message['oslo.message'])
+    return message
+
+
+def parse_notification(body):
+    """
+    Return (kind, resource id) for an OpenStack notification that an
+    operation on a server or stack has finished, or None for any other
+    message
+    """
+    return finished_operation(unwrap(body))
+
+
+def finished_operation(message):
+    """Return (kind, resource id) from an unwrapped notification, or None"""
+    event_type = message.get('event_type', '')
+    if not event_type.endswith(FINISHED):
+        return None
+    payload = message.get('payload') or {}
+
+    if event_type.startswith('compute.instance.'):
+        resource_id = payload.get('instance_id')
+        kind = statuspoller.SERVER
+    elif event_type.startswith('orchestration.stack.'):
+        # stack_identity looks like .../stacks/<name>/<id>
+        resource_id = payload.get('stack_id') or (
+            payload.get('stack_identity') or ''
+        ).rstrip('/').split('/')[-1]
+        kind = statuspoller.STACK
+    else:
+        return None
+
+    if not resource_id:
+        return None
+    return (kind, resource_id)
+
+
+def server_location(message):
+    """
+    Return (server id, hypervisor hostname) from an unwrapped compute
+    notification, with None for the hypervisor if the server was deleted,
+    or None if it says nothing about where a server is
+    """
+    event_type = message.get('event_type', '')
+    if not event_type.startswith('compute.instance.'):
+        return None
+    payload = message.get('payload') or {}
+    server_id = payload.get('instance_id')
+    if not server_id:
+        return None
+    if event_type == 'compute.instance.delete.end':
+        return (server_id, None)
+    if not event_type.endswith('.end') or not payload.get('node'):
+        return None
+    return (server_id, payload['node'])
+
+
+class CompletionTracker:
+    """
+    Finish enactment waits from OpenStack notifications
+
+    Consumes compute.instance.* and orchestration.stack.* notifications
+    and nudges the status poller whenever an operation on a watched
+    server or stack finishes, so it's checked straight away rather than
+    at the next poll. The poller should be given a silence timeout, so
+    it only polls what hasn't been heard about for that long. Where
+    compute notifications say which hypervisor a server is on, it's
+    recorded in server_locations if given
+    """
+
+    def __init__(
+            self,
+            status_poller,
+            host,
+            port,
+            username,
+            password,
+            exchange,
+            key,
+            server_locations=None
+    ):
+        """Set up the notification consumer"""
+        self._status_poller = status_poller
+        self._server_locations = server_locations
+        self._lock = threading.Lock()
+        self._received = 0
+        self._matched = 0
+
+        self._consumer = rabbitmq.RabbitConsumer(
+            host=host,
+            port=port,
+            username=username,
+            password=password,
+            exchange=exchange,
+            key=key,
+            msg_callback=self.message,
+        )
+
+    def start(self):
+        """Start consuming notifications"""
+        self._consumer.start()
+
+    def stop(self):
+        """Stop consuming notifications"""
+        self._consumer.stop()
+
+    def message(self, body):
+        """Nudge the poller if a notification is about a watched resource"""
+        try:
+            message = unwrap(body)
+            finished = finished_operation(message)
+            location = server_location(message)
+        except (ValueError, TypeError, AttributeError), err:
+            LOGGER.debug("Ignoring notification [{}]".format(err))
+            finished = None
+            location = None
+
+        if location is not None and self._server_locations is not None:
+            if location[1] is None:
+                self._server_locations.forget(location[0])
+            else:
+                self._server_locations.moved(*location)
+
+        matched = finished is not None and self._status_poller.nudge(
+            *finished
+        )
+        if matched:
+            LOGGER.info(
+                "Notified that {} [{}] finished an operation".format(
+                    *finished
+                )
+            )
+
+        with self._lock:
+            self._received += 1
+            if matched:
+                self._matched += 1
+
+    def stats(self):
+        """Return how many notifications were received and used"""
+        with self._lock:
+            return {
+                'received': self._received,
+                'matched': self._matched,
+            }
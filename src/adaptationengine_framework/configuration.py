@@ -22,6 +22,7 @@ database__database_name = None
 database__collection_config = None
 database__collection_log = None
 database__collection_stack = None
+database__collection_stack_tenant = None
 
 mq__host = None
 mq__port = None
@@ -30,6 +31,7 @@ mq__inbound = None
 mq__outbound = None
 mq__username = None
 mq__password = None
+mq__wire_format = None
 
 plugin__timeout = None
 plugin_java = None
@@ -38,6 +40,48 @@ plugin_cpp = None
 plugin__grouping = None
 plugin__default_weighting = None
 plugin__weightings = None
+plugin__jvm_startup = None
+plugin__batch_window = None
+plugin__workers = None
+plugin__default_concurrency = None
+plugin__concurrency = None
+plugin__adaptive_timeout = None
+plugin__timeout_percentile = None
+plugin__timeout_headroom = None
+plugin__timeout_floor = None
+plugin__timeout_ceiling = None
+plugin__timeout_window = None
+plugin__timeout_min_samples = None
+plugin__routing = None
+plugin__circuit_breaker = None
+plugin__breaker_failure_rate = None
+plugin__breaker_window = None
+plugin__breaker_min_calls = None
+plugin__breaker_open_seconds = None
+plugin__wire_format = None
+
+consolidation__stv_engine = None
+consolidation__strategy = None
+consolidation__event_strategies = None
+consolidation__blacklist_ttl = None
+consolidation__memo_size = None
+
+enactment__poller = None
+enactment__poll_min_interval = None
+enactment__poll_max_interval = None
+enactment__poll_timeout = None
+enactment__notifications = None
+enactment__notifications_host = None
+enactment__notifications_port = None
+enactment__notifications_username = None
+enactment__notifications_password = None
+enactment__notifications_exchange = None
+enactment__notifications_key = None
+enactment__notifications_silence = None
+enactment__scheduler = None
+enactment__max_concurrent = None
+enactment__per_hypervisor = None
+enactment__per_tenant = None
 
 heat_resource_mq__host = None
 heat_resource_mq__port = None
@@ -50,6 +94,7 @@ openstack__auth_url = None
 openstack__username = None
 openstack__password = None
 openstack__tenant = None
+openstack__inventory_refresh = None
 
 openstack_event__host = None
 openstack_event__port = None
@@ -0,0 +1,120 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import copy
+import hashlib
+import logging
+import threading
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+def action_key(action):
+    """
+    Return an action's key with each sub-action replaced by its own key,
+    all the way down, so the repr of the result is a faithful key
+    """
+    key = action.key()
+    return key[:-1] + (tuple([
+        action_key(sub_action) if hasattr(sub_action, 'key') else sub_action
+        for sub_action in key[-1]
+    ]),)
+
+
+class ConsolidationMemo:
+    """
+    A bounded LRU of consolidation results, keyed by everything that can
+    change a tally's output. Safe to share between threads
+    """
+
+    def __init__(self, size=128):
+        """Set how many consolidations to remember"""
+        self._size = size
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(strategy_name, round_results, blacklist):
+        """
+        Return a hash of the strategy, each plugin's name, weight and
+        ranked (action key, score) pairs, and the blacklisted action keys
+        """
+        canonical = (
+            strategy_name,
+            tuple(sorted([
+                (
+                    name,
+                    data.get('weight'),
+                    tuple([
+                        (action_key(action), action.score)
+                        for action in data.get('results', [])
+                    ])
+                )
+                for name, data in round_results.items()
+            ])),
+            tuple(sorted(set([action_key(action) for action in blacklist]))),
+        )
+        return hashlib.sha1(repr(canonical)).hexdigest()
+
+    @staticmethod
+    def _copy(actions):
+        """Return copies of actions, so callers can change their scores"""
+        return [copy.copy(action) for action in actions]
+
+    def get(self, key):
+        """
+        Return (output, vetoed, consolidation id) for a key, or None if it
+        isn't remembered
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            # most recently used goes to the end
+            self._entries[key] = entry
+            self._hits += 1
+
+        (output, vetoed, consolidation_id) = entry
+        return (self._copy(output), self._copy(vetoed), consolidation_id)
+
+    def put(self, key, output, vetoed, consolidation_id):
+        """
+        Remember a consolidation's output, the actions it added to the
+        blacklist, and the id of its consolidation record
+        """
+        entry = (self._copy(output), self._copy(vetoed), consolidation_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return the memo's size and hit rate"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self._size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': float(self._hits) / lookups if lookups else 0.0,
+            }
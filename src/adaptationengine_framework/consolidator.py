@@ -13,12 +13,12 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import copy
 import logging
+import uuid
 
 import adaptationengine_framework.adaptationaction as adaptationaction
 import adaptationengine_framework.database as database
-import adaptationengine_framework.stv as stv
+import adaptationengine_framework.strategies as strategies
 
 LOGGER = logging.getLogger('syslog')
 
@@ -28,14 +28,34 @@ class Consolidator:
     Combine arrays of adaptation actions returned by plugins into a single list
     """
 
+    @staticmethod
+    def _whitelist(round_results, whitelisted_types):
+        """
+        Return new round results holding only the actions of whitelisted
+        types. The plugin lists are rebuilt rather than copied and pruned,
+        the tally working on its own lists; a Manager dict already hands
+        out copies of its values, so the actions aren't copied again
+        """
+        whitelisted_results = {}
+        for name, data in round_results.items():
+            plugin_results = dict(data)
+            plugin_results['results'] = [
+                action for action in data.get('results', [])
+                if action.adaptation_type in whitelisted_types
+            ]
+            whitelisted_results[name] = plugin_results
+        return whitelisted_results
+
     @staticmethod
     def consolidate(
-            event, first_initial_actions, round_results, blacklisted_actions
+            event, first_initial_actions, round_results, blacklisted_actions,
+            memo=None
     ):
         """
         Use a voting system to combine and reorder the plugin round-results
         into one list. Return that combined list, along with any actions
-        blacklisted by plugins
+        blacklisted by plugins. If a memo is given, identical inputs reuse
+        an earlier consolidation instead of tallying again
         """
         LOGGER.info(
             'Consolidator init: event name [{0}]'.format(event.name)
@@ -47,20 +67,39 @@ class Consolidator:
         LOGGER.info('Consolidator start')
 
         LOGGER.info('Removing non-whitelisted actions')
-        whitelisted_types = (
-            [action.adaptation_type for action in first_initial_actions]
+        whitelisted_types = frozenset(
+            [action.adaptation_type for action in first_initial_actions] +
+            [adaptationaction.AdaptationType.LowPowerAction]
         )
-        whitelisted_types.append(
-            adaptationaction.AdaptationType.LowPowerAction
+        whitelisted_results = Consolidator._whitelist(
+            round_results, whitelisted_types
         )
-        whitelisted_results = copy.deepcopy(round_results)
-        for name, data in round_results.items():
-            for action in data.get('results', []):
-                if action.adaptation_type not in whitelisted_types:
-                    whitelisted_results[name]['results'].remove(action)
 
-        LOGGER.info('Starting voting')
-        (output, blacklisted_actions) = stv.SingleTransferrableVote.tally(
+        strategy = strategies.get_strategy(event.name)
+
+        memo_key = None
+        if memo is not None:
+            memo_key = memo.key(
+                strategy.name, whitelisted_results, blacklisted_actions
+            )
+            cached = memo.get(memo_key)
+            if cached is not None:
+                (output, vetoed, consolidation_id) = cached
+                LOGGER.info(
+                    'Reusing consolidation [{}]: {}'.format(
+                        consolidation_id, output
+                    )
+                )
+                blacklisted_actions.extend(vetoed)
+                database.Database.log_consolidation_reused(
+                    stack_id=event.stack_id,
+                    consolidation_id=consolidation_id
+                )
+                return (output, blacklisted_actions)
+
+        LOGGER.info('Starting voting: {}'.format(strategy.name))
+        previous_blacklist_length = len(blacklisted_actions)
+        (output, blacklisted_actions) = strategy.tally(
             whitelisted_results,
             blacklisted_actions
         )
@@ -68,10 +107,20 @@ class Consolidator:
 
         LOGGER.info('Consolidator results: {}'.format(output))
 
+        consolidation_id = uuid.uuid4().hex
         if output is not []:
             database.Database.log_consolidation(
                 stack_id=event.stack_id,
-                consolidated_results=output
+                consolidated_results=output,
+                consolidation_id=consolidation_id
+            )
+
+        if memo is not None:
+            memo.put(
+                memo_key,
+                output,
+                blacklisted_actions[previous_blacklist_length:],
+                consolidation_id
             )
 
         # return consolidated results and new blacklist
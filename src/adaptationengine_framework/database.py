@@ -13,7 +13,6 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import copy
 import datetime
 import logging
 import time
@@ -151,15 +150,38 @@ class Database:
         Database._log('plugin_result', stack_id, log_details)
 
     @staticmethod
-    def log_consolidation(stack_id, consolidated_results):
+    def log_plugin_skipped(stack_id, plugin_name, reason):
+        """log a preformatted json entry for a plugin that wasn't run"""
+        log_details = {
+            "name": plugin_name,
+            "reason": reason
+        }
+        Database._log('plugin_skipped', stack_id, log_details)
+
+    @staticmethod
+    def log_consolidation(
+            stack_id, consolidated_results, consolidation_id=None
+    ):
         """log a preformatted json entry for a consolidation operation"""
         output_results = [action.to_dict() for action in consolidated_results]
         log_details = {
             # More Voting granularity?!?!
-            "output": output_results
+            "output": output_results,
+            "consolidation_id": consolidation_id
         }
         Database._log('consolidation', stack_id, log_details)
 
+    @staticmethod
+    def log_consolidation_reused(stack_id, consolidation_id):
+        """
+        log a preformatted json entry for a consolidation answered from
+        the memo, pointing at the consolidation entry it repeats
+        """
+        log_details = {
+            "consolidation_id": consolidation_id
+        }
+        Database._log('consolidation_reused', stack_id, log_details)
+
     @staticmethod
     def log_adaptation_started(stack_id, event_name, adaptation, consolidated_results=[]):
         """log a preformatted json entry for an adaptation being enacted"""
@@ -424,6 +446,72 @@ class Database:
         mongo_client.close()
         return stack_pos
 
+    @staticmethod
+    def load_stack_tenants():
+        """return the stored {stack id: tenant name} index"""
+        stack_tenants = {}
+        try:
+            mongo_client = pymongo.MongoClient(
+                cfg.database__host,
+                int(cfg.database__port),
+                serverSelectionTimeoutMS=5000
+            )
+            mongo_db = mongo_client[cfg.database__database_name]
+            mongo_collection = mongo_db[cfg.database__collection_stack_tenant]
+            for entry in mongo_collection.find():
+                stack_tenants[entry['_id']] = entry['tenant']
+            mongo_client.close()
+        except Exception, err:
+            LOGGER.error(
+                "Loading stack tenants from database failed: [{}]".format(err)
+            )
+        return stack_tenants
+
+    @staticmethod
+    def save_stack_tenants(stack_tenants):
+        """store the owning tenant of each stack in {stack id: tenant name}"""
+        if not stack_tenants:
+            return
+        try:
+            mongo_client = pymongo.MongoClient(
+                cfg.database__host,
+                int(cfg.database__port),
+                serverSelectionTimeoutMS=5000
+            )
+            mongo_db = mongo_client[cfg.database__database_name]
+            mongo_collection = mongo_db[cfg.database__collection_stack_tenant]
+            mongo_collection.bulk_write([
+                pymongo.ReplaceOne(
+                    {'_id': stack_id},
+                    {'_id': stack_id, 'tenant': tenant},
+                    upsert=True
+                )
+                for stack_id, tenant in stack_tenants.iteritems()
+            ])
+            mongo_client.close()
+        except Exception, err:
+            LOGGER.error(
+                "Saving stack tenants to database failed: [{}]".format(err)
+            )
+
+    @staticmethod
+    def delete_stack_tenant(stack_id):
+        """remove a stack from the stored stack tenant index"""
+        try:
+            mongo_client = pymongo.MongoClient(
+                cfg.database__host,
+                int(cfg.database__port),
+                serverSelectionTimeoutMS=5000
+            )
+            mongo_db = mongo_client[cfg.database__database_name]
+            mongo_collection = mongo_db[cfg.database__collection_stack_tenant]
+            mongo_collection.delete_one({'_id': stack_id})
+            mongo_client.close()
+        except Exception, err:
+            LOGGER.error(
+                "Deleting stack tenant from database failed: [{}]".format(err)
+            )
+
     @staticmethod
     def update_stack_list(vm_list, delay=0, create=False, stack_id=None):
         """
@@ -438,7 +526,6 @@ class Database:
             mongo_db = mongo_client[cfg.database__database_name]
             mongo_collection = mongo_db[cfg.database__collection_stack]
             time.sleep(delay)
-            vm_hype_mapping = openstack.OpenStackInterface().get_vm_hypervisor_mapping()
 
             #TODO: Refactor: repetition
             stacks = {}
@@ -448,11 +535,7 @@ class Database:
                 if db_stack:
                     stacks = db_stack.get("stacks", {})
                     stacks[stack_id] = []
-                    keystone_client = openstack.OpenStackClients.get_keystone_client()
-                    heat_client = openstack.OpenStackClients.get_heat_client_for_stack(
-                        keystone_client,
-                        stack_id
-                    )
+                    heat_client = openstack.REGISTRY.heat_for_stack(stack_id)
                     vm_list = []
                     for resource in heat_client.resources.list(stack_id):
                         if resource.resource_type == 'OS::Nova::Server':
@@ -462,7 +545,9 @@ class Database:
                         stacks[stack_id].append(
                             {
                                 'vm_id': vmid,
-                                'hypervisor_id': vm_hype_mapping.get(vmid, None)
+                                'hypervisor_id': (
+                                    openstack.LOCATIONS.hypervisor_of(vmid)
+                                )
                             })
             else:
                 #complete update based on passed list of vms
@@ -472,7 +557,9 @@ class Database:
                         stacks[stack_id].append(
                             {
                                 'vm_id': vmid,
-                                'hypervisor_id': vm_hype_mapping.get(vmid, None)
+                                'hypervisor_id': (
+                                    openstack.LOCATIONS.hypervisor_of(vmid)
+                                )
                             })
             post_stacks = {"stacks": stacks}
             mongo_db.drop_collection(cfg.database__collection_stack)
@@ -486,7 +573,14 @@ class Database:
 
         thread = threading.Thread(
             target=update_stack_db_threaded,
-            args=(copy.deepcopy(vm_list), delay, create, stack_id)
+            args=(
+                {
+                    stack: list(vms) for stack, vms in vm_list.iteritems()
+                },
+                delay,
+                create,
+                stack_id
+            )
         )
         thread.start()
         return
@@ -13,15 +13,20 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import copy
 import logging
 import multiprocessing
 import threading
+import time
+import uuid
 
+import adaptationengine_framework.candidates as candidates
+import adaptationengine_framework.circuitbreaker as circuitbreaker
 import adaptationengine_framework.configuration as cfg
 import adaptationengine_framework.consolidator as consolidator
 import adaptationengine_framework.database as database
 import adaptationengine_framework.openstack as openstack
+import adaptationengine_framework.plugins as plugins_api
+import adaptationengine_framework.wireformat as wireformat
 
 
 LOGGER = logging.getLogger('syslog')
@@ -41,6 +46,10 @@ class Distributor(threading.Thread):
             agreement_map,
             callback,
             plugin_manager,
+            plugin_scheduler,
+            circuit_breakers=None,
+            action_blacklist=None,
+            consolidation_memo=None,
     ):
         """Create the thread, openstack interface, and some additional setup"""
         LOGGER.info(
@@ -50,8 +59,12 @@ class Distributor(threading.Thread):
         self._cw_event = event
         self._manager = multiprocessing.Manager()
         self._plugin_manager = plugin_manager
+        self._plugin_scheduler = plugin_scheduler
+        self._circuit_breakers = circuit_breakers
+        self._decision_id = uuid.uuid4().hex
         self._round_results = self._manager.dict()
-        self._blacklisted_actions = []
+        self._action_blacklist = action_blacklist
+        self._consolidation_memo = consolidation_memo
         self._heat_resource = heat_resource
         self._logged_results = {}
         self._agreement_map = agreement_map
@@ -63,18 +76,58 @@ class Distributor(threading.Thread):
             '_initial_actions: [{0}]'.format(str(self._initial_actions))
         )
 
-        self._openstack = openstack.OpenStackInterface()
+        # actions plugins vetoed for this stack in earlier decisions are
+        # taken out before any plugin sees them
+        self._blacklisted_actions = []
+        self._input_actions = self._initial_actions
+        if self._action_blacklist is not None:
+            self._blacklisted_actions = self._action_blacklist.get(
+                self._cw_event.stack_id
+            )
+            (self._input_actions, vetoed) = self._action_blacklist.prune(
+                self._cw_event.stack_id, self._initial_actions
+            )
+            if vetoed:
+                LOGGER.info(
+                    "Removed blacklisted initial actions: {}".format(vetoed)
+                )
+
+        # built once for the whole decision, on first request by a plugin
+        self._candidates = candidates.CandidateProvider(
+            self._cw_event,
+            self._initial_actions,
+            openstack.REGISTRY.nova,
+            vetoed=frozenset(
+                [action.key() for action in self._blacklisted_actions]
+            )
+        )
 
         self._plugin_rounds = cfg.plugin__grouping or []
 
         threading.Thread.__init__(self)
 
+    def _get_timeout(self, plugin_name):
+        """
+        Return how long to give a plugin: its adaptive timeout if the
+        scheduler has one, otherwise the configured global timeout
+        """
+        timeout = self._plugin_scheduler.get_timeout(plugin_name)
+        if timeout is None:
+            timeout = cfg.plugin__timeout or 30
+        return timeout
+
     def remove_blacklisted(self):
         """
-        make a new plugin rounds 2d list that excludes plugins blacklisted
-        for this event name
+        make a new plugin rounds 2d list that excludes plugins that don't
+        handle this event or any action left after vetoes, plugins
+        blacklisted for this event name, and plugins whose circuit
+        breaker is open. No rounds at all if every action was vetoed
         """
-        blacklist = self._heat_resource.get('blacklist')
+        if self._initial_actions and not self._input_actions:
+            LOGGER.info("Every initial action was vetoed, no plugins to run")
+            return []
+
+        blacklist = self._heat_resource.get('blacklist') or []
 
         LOGGER.info(
             "Blacklist for [{}] event is [{}]".format(
@@ -82,20 +135,54 @@ class Distributor(threading.Thread):
             )
         )
 
-        if blacklist:
-            plugin_grouping = []
-            for rnd in self._plugin_rounds:
-                new_round = []
-                for plugin in rnd:
-                    if plugin not in blacklist:
-                        new_round.append(plugin)
+        # drop plugins that don't handle this event before anything else
+        plugin_rounds = self._plugin_manager.route(
+            self._plugin_rounds, self._cw_event.name, self._input_actions
+        )
+
+        if not blacklist and self._circuit_breakers is None:
+            return plugin_rounds
 
-                if new_round:
-                    plugin_grouping.append(new_round)
+        plugin_grouping = []
+        for rnd in plugin_rounds:
+            new_round = []
+            for plugin in rnd:
+                if plugin in blacklist:
+                    continue
 
-            return plugin_grouping
+                if self._circuit_breakers is not None:
+                    (allowed, reason) = self._circuit_breakers.allow(plugin)
+                    if not allowed:
+                        LOGGER.warn(
+                            "Skipping plugin {}: {}".format(plugin, reason)
+                        )
+                        database.Database.log_plugin_skipped(
+                            stack_id=self._cw_event.stack_id,
+                            plugin_name=plugin,
+                            reason=reason,
+                        )
+                        continue
+
+                new_round.append(plugin)
+
+            if new_round:
+                plugin_grouping.append(new_round)
+
+        return plugin_grouping
+
+    def _record_outcome(self, task):
+        """Tell the circuit breakers how a plugin invocation ended"""
+        if self._circuit_breakers is None or task.cancelled:
+            # a task that never left the queue says nothing about the plugin
+            return
+
+        if task.finished_at is None:
+            outcome = circuitbreaker.Outcome.TIMEOUT
+        elif task.error is not None:
+            outcome = circuitbreaker.Outcome.ERROR
         else:
-            return self._plugin_rounds
+            outcome = circuitbreaker.Outcome.SUCCESS
+        self._circuit_breakers.record(task.plugin.plugin_name, outcome)
 
     def run(self):
         """
@@ -114,7 +201,7 @@ class Distributor(threading.Thread):
             )
 
             # start them off
-            consolidated_results = self._initial_actions
+            consolidated_results = self._input_actions
             LOGGER.info(
                 'initial actions: {}'.format(consolidated_results)
             )
@@ -128,42 +215,72 @@ class Distributor(threading.Thread):
 
                 plugins = self._plugin_manager.get(rnd)
 
+                tasks = []
                 for plugin in plugins:
                     LOGGER.info(
                         "Setting up plugin: {}".format(plugin.plugin_name)
                     )
+                    timeout = self._get_timeout(plugin.plugin_name)
+                    # counts down once a worker takes the plugin
+                    deadline = plugins_api.Deadline(timeout=timeout)
                     plugin.setup(
                         self._cw_event,
                         consolidated_results,
                         self._round_results,
-                        self._agreement_map
+                        self._agreement_map,
+                        candidates=self._candidates,
+                        deadline=deadline
+                    )
+                    tasks.append(
+                        (
+                            self._plugin_scheduler.submit(
+                                plugin,
+                                self._decision_id,
+                                batch_key=plugin.batch_key(),
+                                batch_window=plugin.batch_window,
+                                deadline=deadline
+                            ),
+                            deadline
+                        )
                     )
-                    plugin.start()
                     LOGGER.info(
-                        "Started plugin: {}".format(plugin.plugin_name)
+                        "Queued plugin {} with {:.3f} seconds to run".format(
+                            plugin.plugin_name, timeout
+                        )
                     )
 
-                # wait for them to finish (for a while)
-                timeout = cfg.plugin__timeout or 30
-                LOGGER.info(
-                    "Waiting {} seconds for plugins to execute".format(timeout)
-                )
-                for plugin in plugins:
-                    plugin.join(
-                        timeout
+                # wait for them to finish (for a while). each gets its
+                # timeout once it's running, and as long again to start
+                for (task, deadline) in tasks:
+                    finished = task.wait(
+                        max(task.queued_at + deadline.timeout - time.time(), 0)
                     )
+                    if not finished and self._plugin_scheduler.cancel(task):
+                        deadline.cancel()
+                        LOGGER.warn(
+                            "Plugin {} never left the queue".format(
+                                task.plugin.plugin_name
+                            )
+                        )
+                    elif not task.wait(deadline.remaining()):
+                        # tell the plugin its results will be ignored,
+                        # and stop it holding a worker and a slot
+                        deadline.cancel()
+                        self._plugin_scheduler.abandon(task)
+                    self._record_outcome(task)
 
+                round_results = wireformat.decode_results(self._round_results)
                 LOGGER.info(
                     "results for round {}: {}".format(
                         rnd_num,
-                        self._round_results
+                        round_results
                     )
                 )
-                if not self._round_results:
-                    consolidated_results = self._initial_actions
+                if not round_results:
+                    consolidated_results = self._input_actions
                     LOGGER.info("No results this round, so just passing along previous round's")
                 else:
-                    for plugin_name, plugin_data in self._round_results.items():
+                    for plugin_name, plugin_data in round_results.items():
                         database.Database.log_plugin_result(
                             stack_id=self._cw_event.stack_id,
                             plugin_name=plugin_name,
@@ -181,8 +298,9 @@ class Distributor(threading.Thread):
                             consolidator.Consolidator.consolidate(
                                 self._cw_event,
                                 self._initial_actions,
-                                self._round_results,
-                                self._blacklisted_actions
+                                round_results,
+                                self._blacklisted_actions,
+                                memo=self._consolidation_memo
                             )
                         )
                         new_bl_len = len(self._blacklisted_actions)
@@ -191,17 +309,23 @@ class Distributor(threading.Thread):
                                 new_bl_len - current_bl_len
                             )
                         )
+                        if self._action_blacklist is not None:
+                            self._action_blacklist.add(
+                                self._cw_event.stack_id,
+                                self._blacklisted_actions[current_bl_len:]
+                            )
 
-                    self._logged_results[rnd_num] = copy.deepcopy(
-                        consolidated_results
-                    )
+                    self._logged_results[rnd_num] = consolidated_results
 
                     self._round_results = {}
 
                     if rnd_num < (len(plugin_grouping) - 1):
-                        # keep the scores on the last round
-                        for action in consolidated_results:
-                            action.score = 0
+                        # keep the scores on the last round. the logged
+                        # round keeps its own, so reset them on copies
+                        consolidated_results = [
+                            action.replace(score=0)
+                            for action in consolidated_results
+                        ]
 
         except Exception, err:
             LOGGER.error('Distributor error')
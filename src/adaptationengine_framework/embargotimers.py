@@ -0,0 +1,101 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class EmbargoTimers:
+    """
+    Keep every stack's post-adaptation embargo on one timer thread
+
+    Embargoes sit in a heap ordered by expiry; the thread sleeps until
+    the earliest one is due and then calls its on_expiry, so nothing else
+    has to wait out the embargo
+    """
+
+    def __init__(self):
+        """Start the timer thread"""
+        self._condition = threading.Condition()
+        # (expires at, sequence, stack id, on_expiry)
+        self._heap = []
+        self._sequence = itertools.count()
+        self._stopping = False
+        self._expired = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def embargo(self, stack_id, seconds, on_expiry):
+        """Call on_expiry() once a stack's embargo of `seconds` is over"""
+        expires_at = time.time() + seconds
+        with self._condition:
+            heapq.heappush(
+                self._heap,
+                (expires_at, next(self._sequence), stack_id, on_expiry)
+            )
+            self._condition.notify()
+        LOGGER.info(
+            "Stack [{}] embargoed for {} seconds".format(stack_id, seconds)
+        )
+
+    def stats(self):
+        """Return the seconds left on each embargo and how many expired"""
+        now = time.time()
+        with self._condition:
+            return {
+                'embargoed': dict(
+                    (stack_id, max(expires_at - now, 0))
+                    for expires_at, _, stack_id, _ in self._heap
+                ),
+                'expired': self._expired,
+            }
+
+    def stop(self):
+        """Stop the timer thread, leaving any embargoes unexpired"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def _run(self):
+        """Timer loop: sleep until the earliest embargo is due, expire it"""
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.time()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._stopping:
+                    return
+                (_, _, stack_id, on_expiry) = heapq.heappop(self._heap)
+                self._expired += 1
+
+            LOGGER.info("Stack [{}] embargo over".format(stack_id))
+            try:
+                on_expiry()
+            except Exception, err:
+                LOGGER.error("Embargo timer error")
+                LOGGER.exception(err)
@@ -0,0 +1,309 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import logging
+import threading
+import time
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+
+
+LOGGER = logging.getLogger('syslog')
+
+# action types that act on a server, and so load its hypervisor
+SERVER_ACTIONS = (
+    adaptationaction.AdaptationType.MigrateAction,
+    adaptationaction.AdaptationType.VerticalScaleAction,
+    adaptationaction.AdaptationType.StartAction,
+    adaptationaction.AdaptationType.StopAction,
+)
+
+
+class EnactmentTask:
+    """A single enactment queued on the scheduler"""
+
+    def __init__(self, run, adaptation_action, tenant, hypervisors=None):
+        """
+        Record what to run, what it holds while running, and when. The
+        hypervisors are None until a worker has looked them up
+        """
+        self.run = run
+        self.adaptation_action = adaptation_action
+        self.tenant = tenant
+        self.hypervisors = hypervisors
+        self.locating = False
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait for the enactment to finish, returning True if it did"""
+        return self._done.wait(timeout)
+
+    def finish(self, finished_at=None):
+        """Mark the task as finished, waking anyone waiting on it"""
+        self.finished_at = finished_at or time.time()
+        self._done.set()
+
+    @property
+    def queue_wait(self):
+        """Seconds spent queued before a worker picked the task up"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def execution_time(self):
+        """Seconds spent enacting"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class EnactmentScheduler:
+    """
+    Run enactments from one queue on a fixed pool of worker threads
+
+    No more than max_concurrent enactments run at once, no more than
+    per_hypervisor of them touch any one hypervisor (a migration counts
+    against both its source and destination), and no more than per_tenant
+    run for any one tenant. Tasks that would break a limit wait while
+    the ones behind them go ahead
+
+    The hypervisors a task loads are looked up by a free worker, not by
+    whoever submitted it, since a lookup can mean listing every server
+    """
+
+    def __init__(
+            self,
+            locate_server,
+            max_concurrent=8,
+            per_hypervisor=2,
+            per_tenant=4,
+            window=100
+    ):
+        """
+        Start one worker per allowed concurrent enactment.
+        locate_server(server id) returns the hypervisor a server is on
+        """
+        self._locate_server = locate_server
+        self._per_hypervisor = per_hypervisor
+        self._per_tenant = per_tenant
+        self._window = window
+
+        self._condition = threading.Condition()
+        self._queue = collections.deque()
+        self._running = 0
+        self._hypervisors = collections.Counter()
+        self._tenants = collections.Counter()
+        # action type -> recent (queue wait, execution time) pairs
+        self._latencies = {}
+        self._stopping = False
+
+        self._workers = []
+        for _ in xrange(max_concurrent):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+        LOGGER.info(
+            "Enactment scheduler started with {} workers".format(
+                max_concurrent
+            )
+        )
+
+    def hypervisors_for(self, adaptation_action):
+        """Return the hypervisors an action will load"""
+        if adaptation_action.adaptation_type not in SERVER_ACTIONS:
+            return ()
+        hypervisors = set([self._locate_server(adaptation_action.target)])
+        if (
+                adaptation_action.adaptation_type ==
+                adaptationaction.AdaptationType.MigrateAction
+        ):
+            hypervisors.add(adaptation_action.destination)
+        return tuple(hypervisor for hypervisor in hypervisors if hypervisor)
+
+    def submit(self, run, adaptation_action, tenant=None):
+        """Queue run() as the enactment of an action and return its task"""
+        task = EnactmentTask(run, adaptation_action, tenant)
+        with self._condition:
+            self._queue.append(task)
+            self._condition.notify()
+        LOGGER.info(
+            "Queued enactment of {} for tenant [{}], {} queued".format(
+                adaptation_action, tenant, len(self._queue)
+            )
+        )
+        return task
+
+    def _locate(self, task):
+        """
+        Look up the hypervisors a task loads, or none if that fails, and
+        let it be scheduled
+        """
+        try:
+            hypervisors = self.hypervisors_for(task.adaptation_action)
+        except Exception, err:
+            LOGGER.warn(
+                "Couldn't find the hypervisors {} loads, scheduling it "
+                "without them [{}]".format(task.adaptation_action, err)
+            )
+            hypervisors = ()
+        with self._condition:
+            task.hypervisors = hypervisors
+            task.locating = False
+            self._condition.notify_all()
+        LOGGER.debug(
+            "Enactment of {} loads hypervisors {}".format(
+                task.adaptation_action, list(hypervisors)
+            )
+        )
+
+    def stats(self):
+        """Return queue depth, what's running where, and latency per type"""
+        with self._condition:
+            latency = {}
+            for adaptation_type, samples in self._latencies.iteritems():
+                waits = [queue_wait for queue_wait, _ in samples]
+                times = [execution for _, execution in samples]
+                latency[adaptationaction.AdaptationType.get_string(
+                    adaptation_type
+                )] = {
+                    'count': len(samples),
+                    'mean_queue_wait': sum(waits) / len(waits),
+                    'mean_execution': sum(times) / len(times),
+                    'max_execution': max(times),
+                }
+            return {
+                'queued': len(self._queue),
+                'running': self._running,
+                'hypervisors': dict(
+                    (k, v) for k, v in self._hypervisors.iteritems() if v
+                ),
+                'tenants': dict(
+                    (k, v) for k, v in self._tenants.iteritems() if v
+                ),
+                'latency': latency,
+            }
+
+    def stop(self):
+        """Stop the workers once they finish what they're running"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def _runnable(self, task):
+        """Return True if a task is located and within every limit"""
+        if task.hypervisors is None:
+            return False
+        if task.tenant is not None and (
+                self._tenants[task.tenant] >= self._per_tenant
+        ):
+            return False
+        for hypervisor in task.hypervisors:
+            if self._hypervisors[hypervisor] >= self._per_hypervisor:
+                return False
+        return True
+
+    def _next_task(self):
+        """
+        Pop the oldest task that's within its limits and count it as
+        running. Must be called with the condition held
+        """
+        for task in self._queue:
+            if self._runnable(task):
+                self._queue.remove(task)
+                self._running += 1
+                if task.tenant is not None:
+                    self._tenants[task.tenant] += 1
+                for hypervisor in task.hypervisors:
+                    self._hypervisors[hypervisor] += 1
+                task.started_at = time.time()
+                return task
+
+        return None
+
+    def _next_unlocated(self):
+        """
+        Return the oldest task whose hypervisors nobody is looking up
+        yet, marked as being looked up. Must be called with the
+        condition held
+        """
+        for task in self._queue:
+            if task.hypervisors is None and not task.locating:
+                task.locating = True
+                return task
+        return None
+
+    def _work(self):
+        """
+        Worker loop: take a runnable task, enact it, repeat. With nothing
+        runnable, look up where a queued task runs
+        """
+        while True:
+            with self._condition:
+                task = self._next_task()
+                unlocated = None
+                while task is None:
+                    unlocated = self._next_unlocated()
+                    if unlocated is not None:
+                        break
+                    if self._stopping:
+                        return
+                    self._condition.wait()
+                    task = self._next_task()
+
+            if task is None:
+                self._locate(unlocated)
+                continue
+
+            try:
+                task.run()
+            except Exception, err:
+                LOGGER.error(
+                    "Error enacting {}".format(task.adaptation_action)
+                )
+                LOGGER.exception(err)
+                task.error = err
+            finally:
+                finished_at = time.time()
+                adaptation_type = task.adaptation_action.adaptation_type
+                with self._condition:
+                    self._running -= 1
+                    if task.tenant is not None:
+                        self._tenants[task.tenant] -= 1
+                    for hypervisor in task.hypervisors:
+                        self._hypervisors[hypervisor] -= 1
+                    self._latencies.setdefault(
+                        adaptation_type,
+                        collections.deque(maxlen=self._window)
+                    ).append(
+                        (task.queue_wait, finished_at - task.started_at)
+                    )
+                    self._condition.notify_all()
+                task.finish(finished_at)
+                LOGGER.info(
+                    "Enacted {}, queue wait {:.3f} seconds, execution "
+                    "{:.3f} seconds".format(
+                        task.adaptation_action,
+                        task.queue_wait,
+                        task.execution_time
+                    )
+                )
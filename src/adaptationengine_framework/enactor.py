@@ -24,6 +24,7 @@ import adaptationengine_framework.configuration as cfg
 import adaptationengine_framework.database as database
 import adaptationengine_framework.mqhandler as mqhandler
 import adaptationengine_framework.openstack as openstack
+import adaptationengine_framework.statuspoller as statuspoller
 
 
 LOGGER = logging.getLogger('syslog')
@@ -39,12 +40,20 @@ class Enactor:
             nova_client,
             adaptation_action,
             retry_wait=10,
-            retries=40
+            retries=40,
+            status_poller=None
     ):
         """
         Continually check Nova for physical location of VM until it is
-        confirmed to be on the right host, or retry count runs out
+        confirmed to be on the right host, or retry count runs out. With
+        a status poller, wait on that instead
         """
+        if status_poller is not None:
+            return status_poller.watch_server(
+                adaptation_action.target,
+                statuspoller.on_hypervisor(adaptation_action.destination)
+            ).wait()
+
         for attempt in xrange(retries):
             # get all hypervisors running VMs
             hypervisors = nova_client.hypervisors.search(
@@ -89,12 +98,17 @@ class Enactor:
             heat_client,
             stack_id,
             retry_wait=10,
-            retries=40
+            retries=40,
+            status_poller=None
     ):
         """
         Continually check Heat for status of stack until it is marked
-        as 'COMPLETE' or retries run out
+        as 'COMPLETE' or retries run out. With a status poller, wait on
+        that instead
         """
+        if status_poller is not None:
+            return status_poller.watch_stack(stack_id).wait()
+
         for attempt in xrange(retries):
             stack = heat_client.stacks.get(stack_id)
             if stack.status == 'COMPLETE':
@@ -120,7 +134,8 @@ class Enactor:
             nova_client,
             instance_id,
             retry_wait=5,
-            retries=40
+            retries=40,
+            status_poller=None
     ):
         """
         Check Nova for current instance power state and compare to
@@ -131,7 +146,8 @@ class Enactor:
             instance_id,
             [1],  # power on state
             retry_wait,
-            retries
+            retries,
+            status_poller=status_poller
         )
 
     @staticmethod
@@ -139,7 +155,8 @@ class Enactor:
             nova_client,
             instance_id,
             retry_wait=10,
-            retries=40
+            retries=40,
+            status_poller=None
     ):
         """
         Check Nova for current instance power state and compare to
@@ -150,7 +167,8 @@ class Enactor:
             instance_id,
             [0, 4],  # power off states
             retry_wait,
-            retries
+            retries,
+            status_poller=status_poller
         )
 
     @staticmethod
@@ -159,13 +177,19 @@ class Enactor:
             instance_id,
             desired_states,
             retry_wait,
-            retries
+            retries,
+            status_poller=None
     ):
         """
         Check Nova for current instance power state and compare to
         desired_states, returning True if current is in desired and
-        False otherwise
+        False otherwise. With a status poller, wait on that instead
         """
+        if status_poller is not None:
+            return status_poller.watch_server(
+                instance_id, statuspoller.in_power_state(desired_states)
+            ).wait()
+
         power_error = [-1]
         for attempt in xrange(retries):
             server = nova_client.servers.get(instance_id)
@@ -215,11 +239,15 @@ class Enactor:
             heat_resource,
             stack_id,
             adaptation_action,
-            logged_results={}
+            logged_results={},
+            status_poller=None,
+            embargo=None
     ):
         """
         Enact an adaptation action upon a specified stack using Openstack APIs,
-        posting message queue notficiations as appropriate
+        posting message queue notficiations as appropriate. Completion is
+        waited on through status_poller if one is given. Any embargo is
+        handed to embargo(seconds) if given, rather than slept through
         """
         enact_status = False
         LOGGER.info("This is when I do openstack things")
@@ -255,12 +283,11 @@ class Enactor:
 
         # Connect to OpenStack
         try:
-            keystone_client = openstack.OpenStackClients.get_keystone_client()
-            heat_client = openstack.OpenStackClients.get_heat_client(
-                keystone_client
-            )
-            nova_client = openstack.OpenStackClients.get_nova_client()
+            keystone_client = openstack.REGISTRY.keystone()
+            heat_client = openstack.REGISTRY.heat()
+            nova_client = openstack.REGISTRY.nova()
         except Exception, err:
+            openstack.REGISTRY.unauthorized(err)
             raise Exception(
                 "Couldn't connect to openstack [{}]".format(err)
             )
@@ -320,20 +347,28 @@ class Enactor:
                 )
                 enact_status = Enactor.poll_migrate_complete(
                     nova_client,
-                    adaptation_action
+                    adaptation_action,
+                    status_poller=status_poller
                 )
                 attempts -= 1
                 if enact_status:
+                    openstack.LOCATIONS.moved(
+                        adaptation_action.target,
+                        adaptation_action.destination
+                    )
                     break
         elif (
                 adaptation_action.adaptation_type ==
                 adaptationaction.AdaptationType.VerticalScaleAction
         ):
             try:
-                desired_id = None
-                for flavor in nova_client.flavors.list():
-                    if flavor.name == adaptation_action.scale_value:
-                        desired_id = flavor.id
+                # a flavor created since the last listing needs a refresh
+                flavor = openstack.INVENTORY.flavor(
+                    adaptation_action.scale_value
+                ) or openstack.INVENTORY.flavor(
+                    adaptation_action.scale_value, max_age=0
+                )
+                desired_id = flavor.id if flavor is not None else None
 
                 nova_client.servers.resize(
                     adaptation_action.target,
@@ -349,11 +384,13 @@ class Enactor:
 
             except Exception, err:
                 LOGGER.exception(err)
+                openstack.REGISTRY.unauthorized(err)
                 enact_status = False
             else:
                 enact_status = Enactor.poll_stack_update_complete(
                     heat_client,
-                    stack_id
+                    stack_id,
+                    status_poller=status_poller
                 )
         elif (
                 adaptation_action.adaptation_type ==
@@ -402,11 +439,13 @@ class Enactor:
                 heat_client.stacks.update(stack_id, template=the_yaml)
             except Exception, err:
                 LOGGER.exception(err)
+                openstack.REGISTRY.unauthorized(err)
                 enact_status = False
             else:
                 enact_status = Enactor.poll_stack_update_complete(
                     heat_client,
-                    stack_id
+                    stack_id,
+                    status_poller=status_poller
                 )
 
         elif (
@@ -459,9 +498,11 @@ class Enactor:
                 )
             except Exception, err:
                 LOGGER.warn("Powerstate start change problem")
+                openstack.REGISTRY.unauthorized(err)
             enact_status = Enactor.poll_start_complete(
                 nova_client,
-                adaptation_action.target
+                adaptation_action.target,
+                status_poller=status_poller
             )
 
         elif (
@@ -479,9 +520,11 @@ class Enactor:
                 )
             except Exception, err:
                 LOGGER.warn("Powerstate stop change problem")
+                openstack.REGISTRY.unauthorized(err)
             enact_status = Enactor.poll_stop_complete(
                 nova_client,
-                adaptation_action.target
+                adaptation_action.target,
+                status_poller=status_poller
             )
 
         elif (
@@ -518,13 +561,16 @@ class Enactor:
         # sleep for a while, if extend_embargo is set
         extend_embargo = heat_resource.get('embargo', 0)
         if enact_status is True and extend_embargo > 0:
-            LOGGER.info(
-                "Stack adaptation embargo extended by {} "
-                "seconds. Sleeping.".format(
-                    extend_embargo
+            if embargo is not None:
+                embargo(extend_embargo)
+            else:
+                LOGGER.info(
+                    "Stack adaptation embargo extended by {} "
+                    "seconds. Sleeping.".format(
+                        extend_embargo
+                    )
                 )
-            )
-            time.sleep(extend_embargo)
+                time.sleep(extend_embargo)
 
         # Publish notifications
         openstack_broker.publish_openstack_complete_event(
@@ -25,10 +25,11 @@ class Event:
     Object representation of JSON Event message
     """
 
-    def __init__(self, event_message):
+    def __init__(self, event_message=None):
         """
         Accept JSON message and parse into object, checking length
-        and structure validity
+        and structure validity. Without a message the fields are left
+        empty, for decoders that fill them in themselves
         """
         self.user_id = None
         self.tenant_id = None
@@ -42,6 +43,10 @@ class Event:
         self.name = None
         self.value = None
         self.data = None
+        self.timestamp = None
+
+        if event_message is None:
+            return
 
         # check length of message
         if len(event_message) > 8388608:  # 8MB
@@ -77,6 +82,7 @@ class Event:
             self.name = cwevent['event']['name']
             self.value = cwevent['event']['value']
             self.data = cwevent['data']
+            self.timestamp = cwevent.get('timestamp')
         else:
             raise ValueError('unsupported message')
 
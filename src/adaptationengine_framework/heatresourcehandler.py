@@ -73,6 +73,7 @@ class HeatResourceHandler:
             )
             output.OUTPUT.error("...could not connect to openstack")
         else:
+            stack_tenants = {}
             for tenant in ks_admin_client.tenants.list():
                 LOGGER.info("Trying tenant {}".format(tenant.name))
                 try:
@@ -89,6 +90,7 @@ class HeatResourceHandler:
                     )
 
                     for stack in heat_client.stacks.list():
+                        stack_tenants[stack.id] = tenant.name
                         try:
                             self._active_vms[stack.id] = []
                             for resource in heat_client.resources.list(
@@ -200,6 +202,8 @@ class HeatResourceHandler:
                     LOGGER.info(
                         "Recovered state for tenant {}".format(tenant.name)
                     )
+            openstack.REGISTRY.track_stack_tenants(stack_tenants)
+            database.Database.save_stack_tenants(stack_tenants)
             database.Database.update_stack_list(self._active_vms)
             output.OUTPUT.info("Recovered state")
 
@@ -324,6 +328,9 @@ class HeatResourceHandler:
 
                 self._update_agreement_map()
 
+                # heat_create doesn't say which tenant owns the stack;
+                # listing its vms looks it up and indexes it, off this
+                # thread
                 database.Database.update_stack_list(
                     self._active_vms,
                     delay=8,
@@ -383,6 +390,14 @@ class HeatResourceHandler:
                     # update stacks in database
                     self._active_vms.pop(stack_id, None)
                     database.Database.update_stack_list(self._active_vms, 0)
+                    # the stack's owner is only needed while it has
+                    # resources here. forgetting it in the registry
+                    # removes the stored copy too
+                    if stack_id not in [
+                            resource['stack_id']
+                            for resource in self._active_resources.values()
+                    ]:
+                        openstack.REGISTRY.forget_stack_tenant(stack_id)
                 except KeyError, err:
                     LOGGER.info(
                         "KeyError for resource [{}], "
@@ -407,10 +422,9 @@ class HeatResourceHandler:
                 for (event_resource_id, event) in (
                         self._active_resources.iteritems()
                 ):
-                    json_actions = []
-
-                    for action in event['actions']:
-                        json_actions.append(action.__dict__)
+                    json_actions = [
+                        action.attributes() for action in event['actions']
+                    ]
 
                     output_json.append({
                         'resource_id': event_resource_id,
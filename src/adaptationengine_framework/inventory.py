@@ -0,0 +1,225 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+FLAVORS = 'flavors'
+HYPERVISORS = 'hypervisors'
+CATALOG = 'catalog'
+
+
+class Inventory:
+    """
+    Flavors, hypervisors and the service catalog, listed once and indexed
+
+    Each section is listed in full when first needed and again when it's
+    older than `max_age`, or every `interval` seconds once start() is
+    called. Lookups are dictionary reads; pass max_age to insist on
+    fresher data, 0 to force a refresh. A failed refresh keeps the last
+    good listing, and its error is passed to on_error
+    """
+
+    def __init__(
+            self,
+            get_nova_client,
+            get_keystone_client,
+            max_age=300,
+            on_error=None
+    ):
+        """Set where listings come from and how long they stay good"""
+        self._loaders = {
+            FLAVORS: lambda: self._load_flavors(get_nova_client()),
+            HYPERVISORS: lambda: self._load_hypervisors(get_nova_client()),
+            CATALOG: lambda: self._load_catalog(get_keystone_client()),
+        }
+        self.max_age = max_age
+        self._on_error = on_error
+
+        self._lock = threading.Lock()
+        self._refresh_locks = dict(
+            (section, threading.Lock()) for section in self._loaders
+        )
+        # section -> (index, refreshed at)
+        self._sections = {}
+        self._refreshes = 0
+        self._failures = 0
+
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _load_flavors(nova_client):
+        """Index flavors by name and id"""
+        flavors = nova_client.flavors.list()
+        return {
+            'name': dict((flavor.name, flavor) for flavor in flavors),
+            'id': dict((flavor.id, flavor) for flavor in flavors),
+        }
+
+    @staticmethod
+    def _load_hypervisors(nova_client):
+        """Index hypervisors by hostname"""
+        return dict(
+            (hypervisor.hypervisor_hostname, hypervisor)
+            for hypervisor in nova_client.hypervisors.list()
+        )
+
+    @staticmethod
+    def _load_catalog(keystone_client):
+        """Index internal endpoint urls by service name and type"""
+        urls = dict(
+            (endpoint.service_id, endpoint.internalurl)
+            for endpoint in reversed(keystone_client.endpoints.list())
+        )
+        catalog = {'name': {}, 'type': {}}
+        for service in keystone_client.services.list():
+            if service.id not in urls:
+                continue
+            catalog['name'].setdefault(service.name, urls[service.id])
+            catalog['type'].setdefault(service.type, urls[service.id])
+        return catalog
+
+    def refresh(self, section=None):
+        """
+        List a section again, or every section. Return True if it all
+        worked
+        """
+        if section is None:
+            return all([self.refresh(name) for name in self._loaders])
+
+        requested_at = time.time()
+        with self._refresh_locks[section]:
+            # someone else may have just done it
+            entry = self._sections.get(section)
+            if entry is not None and entry[1] >= requested_at:
+                return True
+
+            try:
+                index = self._loaders[section]()
+            except Exception, err:
+                LOGGER.error(
+                    "Couldn't refresh openstack {} [{}]".format(section, err)
+                )
+                with self._lock:
+                    self._failures += 1
+                if self._on_error is not None:
+                    self._on_error(err)
+                return False
+
+            with self._lock:
+                self._sections[section] = (index, time.time())
+                self._refreshes += 1
+            LOGGER.debug("Refreshed openstack {}".format(section))
+            return True
+
+    def _index(self, section, max_age=None):
+        """Return a section's index, refreshing it first if it's too old"""
+        max_age = self.max_age if max_age is None else max_age
+        entry = self._sections.get(section)
+        if entry is None or time.time() - entry[1] >= max_age:
+            self.refresh(section)
+            entry = self._sections.get(section)
+        return entry[0] if entry is not None else {}
+
+    def flavor(self, name, max_age=None):
+        """Return the flavor with a name, or None"""
+        return self._index(FLAVORS, max_age).get('name', {}).get(name)
+
+    def flavor_by_id(self, flavor_id, max_age=None):
+        """Return the flavor with an id, or None"""
+        return self._index(FLAVORS, max_age).get('id', {}).get(flavor_id)
+
+    def hypervisor(self, hostname, max_age=None):
+        """Return the hypervisor with a hostname, or None"""
+        return self._index(HYPERVISORS, max_age).get(hostname)
+
+    def hypervisors(self, max_age=None):
+        """Return every hypervisor"""
+        return self._index(HYPERVISORS, max_age).values()
+
+    def placed(self, hostname, flavor):
+        """
+        Charge a server of a flavor to a hypervisor's listed stats, so
+        placements made before the next refresh see it there
+        """
+        ram_mb = int(getattr(flavor, 'ram', 0) or 0)
+        vcpus = int(getattr(flavor, 'vcpus', 0) or 0)
+        with self._lock:
+            entry = self._sections.get(HYPERVISORS)
+            hypervisor = entry[0].get(hostname) if entry is not None else None
+            if hypervisor is None:
+                return
+            hypervisor.free_ram_mb = hypervisor.free_ram_mb - ram_mb
+            hypervisor.vcpus_used = hypervisor.vcpus_used + vcpus
+            hypervisor.running_vms = (
+                getattr(hypervisor, 'running_vms', 0) or 0
+            ) + 1
+
+    def endpoint_url(self, service, max_age=None):
+        """
+        Return the internal endpoint url of a service, by name or else
+        by type, or None. The url may still hold a tenant id placeholder
+        """
+        catalog = self._index(CATALOG, max_age)
+        return catalog.get('name', {}).get(service) or (
+            catalog.get('type', {}).get(service)
+        )
+
+    def age(self, section):
+        """Return seconds since a section was listed, or None if never"""
+        entry = self._sections.get(section)
+        if entry is None:
+            return None
+        return time.time() - entry[1]
+
+    def stats(self):
+        """Return the age of each section and how refreshes went"""
+        with self._lock:
+            return {
+                'age': dict(
+                    (section, self.age(section)) for section in self._loaders
+                ),
+                'refreshes': self._refreshes,
+                'failures': self._failures,
+            }
+
+    def start(self, interval):
+        """Refresh every section every `interval` seconds in the background"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop refreshing in the background"""
+        self._stopping.set()
+        self._thread = None
+
+    def _run(self, interval):
+        """Refresh loop"""
+        while not self._stopping.is_set():
+            try:
+                self.refresh()
+            except Exception, err:
+                LOGGER.error("Inventory refresh error")
+                LOGGER.exception(err)
+            self._stopping.wait(interval)
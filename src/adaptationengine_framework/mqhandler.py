@@ -24,6 +24,7 @@ import pika
 
 import adaptationengine_framework.configuration as cfg
 import adaptationengine_framework.rabbitmq as rabbitmq
+import adaptationengine_framework.wireformat as wireformat
 
 
 LOGGER = logging.getLogger('syslog')
@@ -155,7 +156,7 @@ class QuickRabbit:
         )
         self._channel = self._connection.channel()
 
-    def _publish(self, exchange, key, message):
+    def _publish(self, exchange, key, message, properties=None):
         """Publish a message using supplied details"""
         self._channel.exchange_declare(
             exchange=exchange,
@@ -164,7 +165,8 @@ class QuickRabbit:
         self._channel.basic_publish(
             exchange=exchange,
             routing_key=key,
-            body=message
+            body=message,
+            properties=properties
         )
 
     def disconnect(self):
@@ -224,31 +226,49 @@ class QuickRabbit:
             )
         )
 
+    def _publish_request(
+            self, exchange, key, adaptation_action, event, **kwargs
+    ):
+        """
+        Publish an adaptation request in the configured wire format, JSON
+        or binary
+        """
+        if cfg.mq__wire_format == 'binary':
+            self._publish(
+                exchange,
+                key,
+                wireformat.encode_adaptation_request(event, **kwargs),
+                properties=pika.BasicProperties(
+                    content_type=wireformat.CONTENT_TYPE
+                )
+            )
+        else:
+            self._publish(
+                exchange,
+                key,
+                adaptation_action.generate_adaptation_request(
+                    event, **kwargs
+                )
+            )
+
     def publish_adaptation_request(
             self, exchange, key, adaptation_action, event
     ):
-        """Publish a JSON adaptation request message"""
-        self._publish(
-            exchange,
-            key,
-            adaptation_action.generate_adaptation_request(
-                event
-            )
-        )
+        """Publish an adaptation request message"""
+        self._publish_request(exchange, key, adaptation_action, event)
 
     def publish_lowpower_request(
             self, exchange, key, adaptation_action, event
     ):
-        """Publish a JSON lowpower request message"""
+        """Publish a lowpower request message"""
         # we need to redirect and rename the event before sending
-        self._publish(
+        self._publish_request(
             exchange,
             key,
-            adaptation_action.generate_adaptation_request(
-                event,
-                name='lowpower',
-                stack_id=adaptation_action.application,
-            )
+            adaptation_action,
+            event,
+            name='lowpower',
+            stack_id=adaptation_action.application,
         )
 
     def publish_app_feedback_start_event(
@@ -13,19 +13,37 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import collections
 import logging
 import random
+import threading
 
 import heatclient.client as heatc
 import keystoneclient.v2_0.client as keyc
 import novaclient.client as novac
 
+import adaptationengine_framework.candidates as candidates
 import adaptationengine_framework.configuration as cfg
+import adaptationengine_framework.inventory as inventory
+import adaptationengine_framework.serverlocations as serverlocations
 
 
 LOGGER = logging.getLogger('syslog')
 
 
+def is_unauthorized(err):
+    """
+    Return True if an error from an openstack client, or a failed
+    request's response, is an HTTP 401
+    """
+    response = getattr(err, 'response', err)
+    return 401 in (
+        getattr(err, 'http_status', None),
+        getattr(err, 'code', None),
+        getattr(response, 'status_code', None),
+    )
+
+
 class OpenStackClients:
     """
     Interfaces to the Openstack keystone, nova, and heat APIs
@@ -102,8 +120,16 @@ class OpenStackClients:
         return heat_client
 
     @staticmethod
-    def _find_endpoint(keystone_client, wanted_service, tenant_id=None):
-        """Return the endpoint url for a named openstack service"""
+    def _find_endpoint(
+            keystone_client,
+            wanted_service,
+            tenant_id=None,
+            service_inventory=None
+    ):
+        """
+        Return the endpoint url for a named openstack service, from the
+        service catalog in service_inventory if given
+        """
         if keystone_client is None:
             LOGGER.error("Invalid keystone client")
             return None
@@ -112,27 +138,35 @@ class OpenStackClients:
             "Looking for endpoint for service [{}]".format(wanted_service)
         )
         endpoint = None
-        service_id = None
-        for ks_service in keystone_client.services.list():
-            LOGGER.debug(
-                "wanted:{},  name:{},  id:{}".format(
-                    wanted_service, ks_service.name, ks_service.id
+        if service_inventory is not None:
+            # a service registered since the last listing needs a refresh
+            endpoint = service_inventory.endpoint_url(
+                wanted_service
+            ) or service_inventory.endpoint_url(wanted_service, max_age=0)
+        else:
+            service_id = None
+            for ks_service in keystone_client.services.list():
+                LOGGER.debug(
+                    "wanted:{},  name:{},  id:{}".format(
+                        wanted_service, ks_service.name, ks_service.id
+                    )
                 )
-            )
-            if ks_service.name == wanted_service:
-                service_id = ks_service.id
-                break
-
-        for ks_endpoint in keystone_client.endpoints.list():
-            LOGGER.debug(
-                "service_id:{},  endpoint.service_id:{},  "
-                "endpoint.internalurl:{}".format(
-                    service_id, ks_endpoint.service_id, ks_endpoint.internalurl
+                if ks_service.name == wanted_service:
+                    service_id = ks_service.id
+                    break
+
+            for ks_endpoint in keystone_client.endpoints.list():
+                LOGGER.debug(
+                    "service_id:{},  endpoint.service_id:{},  "
+                    "endpoint.internalurl:{}".format(
+                        service_id,
+                        ks_endpoint.service_id,
+                        ks_endpoint.internalurl
+                    )
                 )
-            )
-            if ks_endpoint.service_id == service_id:
-                endpoint = ks_endpoint.internalurl
-                break
+                if ks_endpoint.service_id == service_id:
+                    endpoint = ks_endpoint.internalurl
+                    break
 
         LOGGER.debug("Apparent endpoint url [{}]".format(endpoint))
 
@@ -205,47 +239,340 @@ class OpenStackClients:
         return (keystone_client, nova_client, heat_client)
 
 
+class ClientRegistry:
+    """
+    Authenticated keystone, heat and nova clients and service endpoints,
+    kept per tenant and service and shared by everything in the process
+
+    A keystone client is replaced when its token is due to expire within
+    `stale_seconds`, and heat clients and endpoints built from it are
+    replaced along with it. Nova clients reauthenticate themselves. Safe
+    to share between threads
+    """
+
+    def __init__(self, stale_seconds=300):
+        """Set how long before expiry a token is replaced"""
+        self._stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        # (tenant, service) -> (client, token it was built with)
+        self._clients = {}
+        self._key_locks = {}
+        self._created = collections.Counter()
+        self._reused = collections.Counter()
+        self._refreshed = collections.Counter()
+        # stack id -> name of the tenant that owns it
+        self._stack_tenants = {}
+        self._on_stack_tenants = None
+        self._on_stack_forgotten = None
+
+    def _get(self, service, tenant_name, build, is_current):
+        """
+        Return the registered client for a tenant and service, building
+        it with build(tenant) -> (client, token) if there isn't one or
+        is_current(client, token) says it's stale
+        """
+        key = (tenant_name or cfg.openstack__tenant, service)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # one build per key at a time, without holding up other keys
+        with key_lock:
+            entry = self._clients.get(key)
+            if entry is not None and is_current(*entry):
+                with self._lock:
+                    self._reused[service] += 1
+                return entry[0]
+
+            refreshing = entry is not None
+            LOGGER.info(
+                "{} openstack {} client for tenant [{}]".format(
+                    'Refreshing' if refreshing else 'Creating',
+                    service, key[0]
+                )
+            )
+            entry = build(key[0])
+            with self._lock:
+                self._clients[key] = entry
+                self._created[service] += 1
+                if refreshing:
+                    self._refreshed[service] += 1
+            return entry[0]
+
+    def _token_is_current(self, tenant_name):
+        """
+        Return a check that an entry was built with the tenant's current
+        keystone token
+        """
+        return lambda _, token: token == self.keystone(tenant_name).auth_token
+
+    def keystone(self, tenant_name=None):
+        """Return a keystone client for a tenant, the admin one by default"""
+        def build(tenant):
+            client = OpenStackClients.get_keystone_client(tenant_name=tenant)
+            return (client, client.auth_token)
+
+        def is_current(client, _):
+            try:
+                return not client.auth_ref.will_expire_soon(
+                    stale_duration=self._stale_seconds
+                )
+            except AttributeError:
+                return True
+
+        return self._get('keystone', tenant_name, build, is_current)
+
+    def heat(self, tenant_name=None):
+        """Return a heat client for a tenant, the admin one by default"""
+        def build(tenant):
+            keystone_client = self.keystone(tenant)
+            admin_ks_client = None
+            if tenant != cfg.openstack__tenant:
+                admin_ks_client = self.keystone()
+            return (
+                OpenStackClients.get_heat_client(
+                    keystone_client, admin_ks_client=admin_ks_client
+                ),
+                keystone_client.auth_token
+            )
+
+        return self._get(
+            'heat', tenant_name, build, self._token_is_current(tenant_name)
+        )
+
+    def nova(self, tenant_name=None):
+        """Return a nova client for a tenant, the admin one by default"""
+        def build(tenant):
+            return (OpenStackClients.get_nova_client(tenant=tenant), None)
+
+        return self._get('nova', tenant_name, build, lambda *entry: True)
+
+    def endpoint(self, service, tenant_name=None):
+        """Return the endpoint url of a named service for a tenant"""
+        def build(tenant):
+            keystone_client = self.keystone(tenant)
+            return (
+                OpenStackClients._find_endpoint(
+                    keystone_client, service, service_inventory=INVENTORY
+                ),
+                keystone_client.auth_token
+            )
+
+        return self._get(
+            'endpoint:' + service,
+            tenant_name,
+            build,
+            self._token_is_current(tenant_name)
+        )
+
+    def track_stack_tenants(
+            self, stack_tenants, on_learned=None, on_forgotten=None
+    ):
+        """
+        Add {stack id: tenant name} to the index of who owns each stack.
+        on_learned(stack_tenants) is called with any the index learns by
+        searching tenants itself, and on_forgotten(stack id) with any it
+        drops, e.g. to keep a stored copy in step
+        """
+        with self._lock:
+            self._stack_tenants.update(stack_tenants)
+            if on_learned is not None:
+                self._on_stack_tenants = on_learned
+            if on_forgotten is not None:
+                self._on_stack_forgotten = on_forgotten
+
+    def stack_tenant(self, stack_id):
+        """Return the name of the tenant that owns a stack, if indexed"""
+        with self._lock:
+            return self._stack_tenants.get(stack_id)
+
+    def forget_stack_tenant(self, stack_id):
+        """Drop a stack from the index, e.g. once it's deleted"""
+        with self._lock:
+            if self._stack_tenants.pop(stack_id, None) is None:
+                return
+            on_forgotten = self._on_stack_forgotten
+        if on_forgotten is not None:
+            try:
+                on_forgotten(stack_id)
+            except Exception, err:
+                LOGGER.error(
+                    "Couldn't forget stack tenant [{}]".format(err)
+                )
+
+    def heat_for_stack(self, stack_id):
+        """
+        Return a heat client for the tenant that owns a stack, or None.
+        The owner comes from the stack tenant index, as long as the stack
+        can still be got through it; if not, each tenant is tried in turn
+        as in OpenStackClients.get_heat_client_for_stack, and the one
+        found is added to the index. The clients tried are kept for next
+        time
+        """
+        tenant_name = self.stack_tenant(stack_id)
+        if tenant_name is not None:
+            try:
+                heat_client = self.heat(tenant_name)
+                heat_client.stacks.get(stack_id)
+            except Exception, err:
+                LOGGER.warn(
+                    "Stack [{}] not found in its indexed tenant {} "
+                    "[{}]".format(stack_id, tenant_name, err)
+                )
+                if not self.unauthorized(err, tenant_name):
+                    self.forget_stack_tenant(stack_id)
+            else:
+                with self._lock:
+                    self._reused['stack_tenant'] += 1
+                return heat_client
+
+        for tenant in self.keystone().tenants.list():
+            try:
+                heat_client = self.heat(tenant.name)
+                try:
+                    heat_client.stacks.get(stack_id)
+                    LOGGER.debug("Returning heat client")
+                    with self._lock:
+                        self._stack_tenants[stack_id] = tenant.name
+                        self._created['stack_tenant'] += 1
+                        on_learned = self._on_stack_tenants
+                    if on_learned is not None:
+                        try:
+                            on_learned({stack_id: tenant.name})
+                        except Exception, err:
+                            LOGGER.error(
+                                "Couldn't store stack tenant [{}]".format(err)
+                            )
+                    return heat_client
+                except Exception, err:
+                    if self.unauthorized(err, tenant.name):
+                        continue
+                    LOGGER.debug(
+                        "Stack doesn't belong to tenant {} anyway".format(
+                            tenant.name
+                        )
+                    )
+            except Exception, err:
+                LOGGER.error("Exception accessing stacks: {}".format(err))
+                self.unauthorized(err, tenant.name)
+
+        return None
+
+    def invalidate(self, tenant_name=None):
+        """Forget a tenant's clients, e.g. after its token was revoked"""
+        tenant = tenant_name or cfg.openstack__tenant
+        with self._lock:
+            for key in self._clients.keys():
+                if key[0] == tenant:
+                    del self._clients[key]
+
+    def unauthorized(self, err, tenant_name=None):
+        """
+        Forget a tenant's clients if err says its token was refused, so
+        the next call authenticates again. Return True if it did
+        """
+        if not is_unauthorized(err):
+            return False
+        LOGGER.warn(
+            "Token for tenant {} refused, dropping its clients".format(
+                tenant_name or cfg.openstack__tenant
+            )
+        )
+        self.invalidate(tenant_name)
+        return True
+
+    def stats(self):
+        """Return how many clients were created, refreshed and reused"""
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'created': dict(self._created),
+                'refreshed': dict(self._refreshed),
+                'reused': dict(self._reused),
+            }
+
+
+# the process's clients
+REGISTRY = ClientRegistry()
+
+# the process's flavors, hypervisors and service catalog
+INVENTORY = inventory.Inventory(
+    REGISTRY.nova, REGISTRY.keystone, on_error=REGISTRY.unauthorized
+)
+
+# the process's map of servers to hypervisors
+LOCATIONS = serverlocations.ServerLocations(
+    REGISTRY.nova, on_error=REGISTRY.unauthorized
+)
+
+
 class OpenStackInterface:
     """An interface to perform some needed Openstack operations"""
 
-    def __init__(self):
-        """Generate a nova client for the interface"""
+    def __init__(self, nova_client=None):
+        """Use a nova client, the registered one by default"""
         LOGGER.debug("OpenStackInterface init")
-        self._nova_client = OpenStackClients.get_nova_client()
+        self._nova_client = nova_client or REGISTRY.nova()
 
-    def get_migration_destination(self, vm_id):
-        """get a random host id to move this vm to,
-        so long as it's not the one it's already on
+    def get_nova_client(self):
+        """Return the interface's nova client"""
+        return self._nova_client
+
+    def _select_destinations(self, vm_id, count, score):
+        """
+        Return the count best (hostname, score) destinations for a vm,
+        and its flavor
         """
         LOGGER.info("Looking for a host to move vm {} to...".format(vm_id))
-        hypervisor_list = self._nova_client.hypervisors.list()
-        valid_hypervisors = []
-
-        for hypervisor in hypervisor_list:
-            hypervisor_hosts = self._nova_client.hypervisors.search(
-                hypervisor.hypervisor_hostname,
-                servers=True
-            )
-            origin_hypervisor = False
-            for hypervisor_host in hypervisor_hosts:
-                try:
-                    for server in hypervisor_host.servers:
-                        if server.get('uuid', None) == vm_id:
-                            origin_hypervisor = True
-                except AttributeError:
-                    LOGGER.warn("No servers on this hypervisor")
-            if not origin_hypervisor:
-                valid_hypervisors.append(hypervisor)
-
-        if valid_hypervisors:
-            LOGGER.info(
-                "Found these hypervisors {}".format(valid_hypervisors)
+        origin_hypervisor = None
+        flavor = None
+        try:
+            server = self._nova_client.servers.get(vm_id)
+            origin_hypervisor = server.to_dict().get(
+                'OS-EXT-SRV-ATTR:hypervisor_hostname'
             )
-            rando_hype = random.choice(valid_hypervisors)
+            flavor = INVENTORY.flavor_by_id(server.flavor.get('id'))
+        except Exception, err:
+            LOGGER.warn("Couldn't find vm {} [{}]".format(vm_id, err))
+
+        destinations = candidates.select_destinations(
+            INVENTORY.hypervisors(),
+            current_host=origin_hypervisor,
+            flavor=flavor,
+            count=count,
+            score=score
+        )
+        LOGGER.info("Found these hypervisors {}".format(destinations))
+        return (destinations, flavor)
+
+    def get_migration_destinations(
+            self, vm_id, count=1, score=candidates.spare_capacity
+    ):
+        """
+        Return the hostnames of the count best hypervisors to move this
+        vm to, best first, scored on cached hypervisor stats. Hosts that
+        don't have the RAM for the vm's flavor, and the one it's already
+        on, are left out
+        """
+        (destinations, _) = self._select_destinations(vm_id, count, score)
+        return [hostname for hostname, _ in destinations]
+
+    def get_migration_destination(self, vm_id):
+        """
+        get the best host id to move this vm to,
+        so long as it's not the one it's already on. The vm is charged
+        to the host's cached stats, so the next choice takes it into
+        account
+        """
+        (destinations, flavor) = self._select_destinations(
+            vm_id, 1, candidates.spare_capacity
+        )
+        if destinations:
+            (hostname, _) = destinations[0]
+            INVENTORY.placed(hostname, flavor)
             LOGGER.info(
-                "Returning this hypervisor [{}]".format(rando_hype)
+                "Returning this hypervisor [{}]".format(hostname)
             )
-            return rando_hype.hypervisor_hostname
+            return hostname
         else:
             LOGGER.warn("Could not find any other hypervisors")
 
@@ -253,11 +580,7 @@ class OpenStackInterface:
 
     def get_migration_target(self, stack_id):
         """get a vm id from this stack"""
-        keystone_client = OpenStackClients.get_keystone_client()
-        heat_client = OpenStackClients.get_heat_client_for_stack(
-            keystone_client,
-            stack_id
-        )
+        heat_client = REGISTRY.heat_for_stack(stack_id)
 
         LOGGER.info(
             "Looking for a vm that belongs to stack {}".format(stack_id)
@@ -285,18 +608,6 @@ class OpenStackInterface:
 
 
     def get_vm_hypervisor_mapping(self):
-        server_list = {}
-        hypvrs = self._nova_client.hypervisors.list()
-        for hype in hypvrs:
-            hype_obj = self._nova_client.hypervisors.search(
-                hype.hypervisor_hostname,
-                servers=True
-            )
-            for h in hype_obj:
-                try:
-                    for server in h.servers:
-                        server_list[server.get('uuid', None)] = h.hypervisor_hostname
-                except AttributeError:
-                    pass
-        return server_list
+        """Return {vm id: hypervisor hostname} for every vm"""
+        return LOCATIONS.mapping()
 
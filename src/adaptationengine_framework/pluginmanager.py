@@ -13,15 +13,17 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
-import imp
 import logging
 import os
 import threading
+import time
 import uuid
 
 import jpype
+import yaml
 
 import adaptationengine_framework.configuration as cfg
+import adaptationengine_framework.pluginrouting as pluginrouting
 import adaptationengine_framework.plugins as plugins
 
 LOGGER = logging.getLogger('syslog')
@@ -34,9 +36,12 @@ class PluginManager:
 
     def __init__(self):
         """
-        Load configuration, setup Java Virtual Machine, find plugins, started
-        JVM if we found Java plugins
+        Load configuration, find Java and Python plugins in parallel, and
+        start the JVM in the background (or on first use) if we found
+        Java plugins. Index which events each plugin handles
         """
+        start_time = time.time()
+
         # Load CFG
         self._plugin__grouping = cfg.plugin__grouping
         self._plugin__default_weighting = cfg.plugin__default_weighting
@@ -49,14 +54,93 @@ class PluginManager:
         # Java setup
         self._plugins = {}
         self._jvm_lock = threading.Lock()
+        self._jvm_start_lock = threading.Lock()
+        self._jvm_started = False
+        self._jvm_thread = None
         self.jvm_classpath = "{}/AdaptationEngine.jar".format(cfg.plugin_java)
-        self.jvm_needed = self._scan_for_java_plugins()
+        self.jvm_needed = False
+
+        # filled in by the scans from each plugin's routing.yaml
+        self._routing_declarations = {}
+
+        # scan both plugin directories at the same time
+        scan_results = {}
+        scanners = [
+            threading.Thread(
+                target=self._timed_scan,
+                args=('java', self._scan_for_java_plugins, scan_results)
+            ),
+            threading.Thread(
+                target=self._timed_scan,
+                args=('python', self._scan_for_python_plugins, scan_results)
+            ),
+        ]
+        for scanner in scanners:
+            scanner.start()
+        for scanner in scanners:
+            scanner.join()
+
+        self.jvm_needed = bool(scan_results.get('java'))
+
+        # configured routes take precedence over what plugins declare
+        for route in cfg.plugin__routing:
+            self._routing_declarations[route.get('name')] = route
+        self._routing = pluginrouting.PluginRoutingIndex(
+            self._routing_declarations
+        )
+
+        LOGGER.info(
+            "Startup phase [plugin discovery] took {:.3f} seconds".format(
+                time.time() - start_time
+            )
+        )
 
         if self.jvm_needed:
-            self._start_jvm()
+            if cfg.plugin__jvm_startup == 'lazy':
+                LOGGER.info("JVM will be started on first Java plugin use")
+            else:
+                self._jvm_thread = threading.Thread(target=self._ensure_jvm)
+                self._jvm_thread.daemon = True
+                self._jvm_thread.start()
 
-        # Python setup
-        self._scan_for_python_plugins()
+    @staticmethod
+    def _timed_scan(phase_name, scan_function, scan_results):
+        """
+        Run one plugin directory scan, storing its return value under
+        phase_name and logging how long it took
+        """
+        phase_start = time.time()
+        try:
+            scan_results[phase_name] = scan_function()
+        except Exception, err:
+            LOGGER.error(
+                "Plugin discovery phase [{}] failed".format(phase_name)
+            )
+            LOGGER.exception(err)
+        LOGGER.info(
+            "Startup phase [{} plugin scan] took {:.3f} seconds".format(
+                phase_name, time.time() - phase_start
+            )
+        )
+
+    def _ensure_jvm(self):
+        """
+        Start the JVM exactly once, whether called from the background
+        startup thread or by the first Java plugin to be used
+        """
+        if self._jvm_started:
+            return
+
+        with self._jvm_start_lock:
+            if not self._jvm_started:
+                phase_start = time.time()
+                self._start_jvm()
+                self._jvm_started = True
+                LOGGER.info(
+                    "Startup phase [jvm start] took {:.3f} seconds".format(
+                        time.time() - phase_start
+                    )
+                )
 
     def _start_jvm(self):
         """
@@ -79,6 +163,55 @@ class PluginManager:
         except OSError, err:
             raise Exception("Could not find/start JVM! [{}]".format(err))
 
+    def route(self, plugin_rounds, event_name, initial_actions):
+        """
+        Return the plugin rounds without the plugins that don't handle
+        this event name or any of the allowed actions' types
+        """
+        (pruned_rounds, skipped) = self._routing.prune(
+            plugin_rounds,
+            event_name,
+            [action.adaptation_type for action in initial_actions]
+        )
+        if skipped:
+            LOGGER.info(
+                "Plugins {} don't handle event [{}], skipping them".format(
+                    skipped, event_name
+                )
+            )
+        return pruned_rounds
+
+    def _load_routing(self, plugin_name, plugin_dir):
+        """
+        Read the events and action types a plugin handles from the
+        routing.yaml in its directory, if it has one
+        """
+        routing_path = os.path.join(plugin_dir, 'routing.yaml')
+        if not os.path.isfile(routing_path):
+            return
+
+        try:
+            with open(routing_path) as routing_file:
+                declaration = yaml.safe_load(routing_file) or {}
+            self._routing_declarations[plugin_name] = {
+                'events': declaration.get('events'),
+                'actions': declaration.get('actions'),
+            }
+            LOGGER.info(
+                "[{}] handles events {} and actions {}".format(
+                    plugin_name,
+                    declaration.get('events') or 'all',
+                    declaration.get('actions') or 'all',
+                )
+            )
+        except Exception, err:
+            LOGGER.error(
+                "[{}] Could not read {}, it will get every event".format(
+                    plugin_name, routing_path
+                )
+            )
+            LOGGER.exception(err)
+
     def get(self, plugin_name_list):
         """
         Get a new instance of all the plugins we have
@@ -88,6 +221,8 @@ class PluginManager:
         for name in plugin_name_list:
             generator = self._plugins.get(name)
             if generator:
+                if getattr(generator, 'needs_jvm', False):
+                    self._ensure_jvm()
                 plugin_instances.append(generator.next())
             else:
                 LOGGER.error("could not get plugin {}".format(name))
@@ -107,12 +242,12 @@ class PluginManager:
                     )
                     plugin_uuid = uuid.uuid4().hex
                     if os.path.isfile(full_module_path):
+                        # module lookup is left until first use, so it
+                        # doesn't hold up startup
                         self._plugins[dir_name] = (
                             plugins.PythonPluginGenerator(
                                 file_path=full_module_path,
-                                info=imp.find_module(
-                                    '{}'.format(dir_name), [full_dir_path]
-                                ),
+                                info=None,
                                 name=dir_name,
                                 uuid=plugin_uuid,
                                 weight=(
@@ -123,6 +258,7 @@ class PluginManager:
                                 )
                             )
                         )
+                        self._load_routing(dir_name, full_dir_path)
                         LOGGER.info(
                             "Using a plugin called [{}] in "
                             "file [{}] with uuid [{}]".format(
@@ -193,6 +329,7 @@ class PluginManager:
                                 )
                             )
                         )
+                        self._load_routing(dir_name, full_dir_path)
                         jvm_needed = True
                         self.jvm_classpath += ":{}".format(full_all_jars_path)
                         LOGGER.info(
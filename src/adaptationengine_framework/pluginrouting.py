@@ -0,0 +1,113 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class PluginRoutingIndex:
+    """
+    Which plugins apply to which events
+
+    Built once from each plugin's declaration of the event names and
+    action types it handles. A plugin that doesn't declare events handles
+    every event, and one that doesn't declare actions handles every action
+    type; a plugin with no declaration at all always runs
+    """
+
+    def __init__(self, declarations):
+        """
+        Index a dict of plugin name to declaration, where a declaration is
+        a dict that may have a list of 'events' and a list of 'actions'
+        (action type names or numbers)
+        """
+        self._by_event = {}
+        self._event_filtered = set()
+        self._actions = {}
+
+        for plugin_name, declaration in declarations.iteritems():
+            events = declaration.get('events')
+            if events:
+                self._event_filtered.add(plugin_name)
+                for event_name in events:
+                    self._by_event.setdefault(event_name, set()).add(
+                        plugin_name
+                    )
+
+            actions = declaration.get('actions')
+            if actions:
+                try:
+                    self._actions[plugin_name] = frozenset(
+                        [
+                            adaptationaction.AdaptationType.get_type(action)
+                            for action in actions
+                        ]
+                    )
+                except LookupError, err:
+                    LOGGER.error(
+                        "[{}] Ignoring declared actions: {}".format(
+                            plugin_name, err
+                        )
+                    )
+
+        LOGGER.info(
+            "Plugin routing index: {} plugins filter by event, "
+            "{} by action type".format(
+                len(self._event_filtered), len(self._actions)
+            )
+        )
+
+    def handles(self, plugin_name, event_name, action_types):
+        """Return True if a plugin applies to an event's name and actions"""
+        if (
+                plugin_name in self._event_filtered and
+                plugin_name not in self._by_event.get(event_name, ())
+        ):
+            return False
+
+        declared_actions = self._actions.get(plugin_name)
+        if (
+                declared_actions is not None and
+                declared_actions.isdisjoint(action_types)
+        ):
+            return False
+
+        return True
+
+    def prune(self, plugin_rounds, event_name, action_types):
+        """
+        Return (rounds, skipped): the plugin rounds with plugins that don't
+        apply to this event removed, dropping rounds left empty, and the
+        names of the plugins removed
+        """
+        action_types = frozenset(action_types)
+        pruned_rounds = []
+        skipped = []
+        for rnd in plugin_rounds:
+            new_round = []
+            for plugin_name in rnd:
+                if self.handles(plugin_name, event_name, action_types):
+                    new_round.append(plugin_name)
+                else:
+                    skipped.append(plugin_name)
+
+            if new_round:
+                pruned_rounds.append(new_round)
+
+        return (pruned_rounds, skipped)
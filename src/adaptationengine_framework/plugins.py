@@ -14,9 +14,12 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 import imp
+import inspect
 import json
 import logging
+import os
 import threading
+import time
 
 import jpype
 import requests
@@ -24,20 +27,83 @@ import requests
 import adaptationengine_framework.adaptationaction as adaptationaction
 import adaptationengine_framework.configuration as cfg
 import adaptationengine_framework.openstack as openstack
+import adaptationengine_framework.wireformat as wireformat
 
 
 LOGGER = logging.getLogger('syslog')
 
 
+class Deadline:
+    """
+    Tells a plugin how long it has left before its results are ignored,
+    and whether it has already been given up on
+
+    Handed to python plugins that take a `deadline` keyword argument and
+    to java plugins that implement setDeadline. Every OpenStackAPI made
+    for the plugin caps its request timeouts with it too
+    """
+
+    def __init__(self, expires_at=None, timeout=None):
+        """
+        Set the absolute time (as from time.time) results are due by, or
+        a timeout in seconds that starts counting down at start()
+        """
+        self.expires_at = expires_at
+        self.timeout = timeout
+        self._cancelled = threading.Event()
+
+    def start(self):
+        """Start counting down the timeout, if it isn't already"""
+        if self.expires_at is None:
+            self.expires_at = time.time() + self.timeout
+
+    def is_started(self):
+        """Return True once the deadline is counting down"""
+        return self.expires_at is not None
+
+    def remaining(self):
+        """Return the seconds left, or 0 once expired or cancelled"""
+        if self._cancelled.is_set():
+            return 0
+        if self.expires_at is None:
+            return self.timeout
+        return max(self.expires_at - time.time(), 0)
+
+    def expired(self):
+        """Return True if there's no point in doing any more work"""
+        return self.remaining() <= 0
+
+    def cancel(self):
+        """Give up on the plugin: its results will be ignored"""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        """Return True if the plugin has been given up on"""
+        return self._cancelled.is_set()
+
+    def getRemainingMillis(self):
+        """Java interface: milliseconds left"""
+        return int(self.remaining() * 1000)
+
+    def isExpired(self):
+        """Java interface: see expired"""
+        return self.expired()
+
+    def isCancelled(self):
+        """Java interface: see is_cancelled"""
+        return self.is_cancelled()
+
+
 class OpenStackAPI:
     """
     Allow access for plugins to openstack apis
     without knowing where they are
     """
 
-    def __init__(self, plugin_name):
+    def __init__(self, plugin_name, deadline=None):
         """Connect to keystone and get authentication for later queries"""
         self._plugin_name = plugin_name
+        self._deadline = deadline
         self._service_name = None
         self._endpoint = None
         self._headers = {}
@@ -50,7 +116,7 @@ class OpenStackAPI:
             )
         )
         try:
-            self._keystone = openstack.OpenStackClients.get_keystone_client()
+            self._keystone = openstack.REGISTRY.keystone()
 
             self._token = self._keystone.auth_ref['token']['id']
             LOGGER.debug("[{}] Got auth token".format(self._plugin_name))
@@ -63,15 +129,42 @@ class OpenStackAPI:
                     self._plugin_name, err
                 )
             )
+            openstack.REGISTRY.unauthorized(err)
             self._keystone = None
             self._token = None
             self._auth = None
             self._headers = None
 
+    def _find_endpoint(self):
+        """
+        Return the registered endpoint url for this API's service, or None
+        if there's no keystone client
+        """
+        if self._keystone is None:
+            LOGGER.error("Invalid keystone client")
+            return None
+        return openstack.REGISTRY.endpoint(self._service_name)
+
     def get(self, url, tenant_id=None):
-        """Return the results (JSON) of a GET request to url"""
+        """
+        Return the results (JSON) of a GET request to url. If the plugin
+        has a deadline the request can't outlive it, and nothing is
+        requested once it has passed
+        """
+        request_args = {}
+        if self._deadline is not None:
+            if self._deadline.expired():
+                LOGGER.warn(
+                    "[{}] Deadline passed, not requesting API url: {}".format(
+                        self._plugin_name, url
+                    )
+                )
+                return None
+            request_args['timeout'] = self._deadline.remaining()
+
         use_headers = self._headers
         use_endpoint = self._endpoint
+        use_tenant = None
 
         if tenant_id:
             LOGGER.info(
@@ -83,13 +176,12 @@ class OpenStackAPI:
                 use_headers = None
                 use_endpoint = None
                 desired_tenant = self._keystone.tenants.get(tenant_id)
-                tenant_keystone = (
-                    openstack.OpenStackClients.get_keystone_client(
-                        tenant_name=desired_tenant.name
-                    )
+                use_tenant = desired_tenant.name
+                tenant_keystone = openstack.REGISTRY.keystone(
+                    tenant_name=desired_tenant.name
                 )
-                use_endpoint = openstack.OpenStackClients._find_endpoint(
-                    tenant_keystone, self._service_name
+                use_endpoint = openstack.REGISTRY.endpoint(
+                    self._service_name, tenant_name=desired_tenant.name
                 )
                 tenant_token = tenant_keystone.auth_ref['token']['id']
                 LOGGER.info("[{}] Got auth token".format(self._plugin_name))
@@ -100,6 +192,7 @@ class OpenStackAPI:
                         self._plugin_name, err
                     )
                 )
+                openstack.REGISTRY.unauthorized(err, use_tenant)
 
         LOGGER.info(
             "[{}] Plugin requested API url: {}".format(
@@ -117,7 +210,8 @@ class OpenStackAPI:
         try:
             final_url = use_endpoint + url
             response = requests.get(
-                final_url, auth=self._auth, headers=use_headers
+                final_url, auth=self._auth, headers=use_headers,
+                **request_args
             )
             LOGGER.info(
                 "[{}] Final requested API url: {}".format(
@@ -127,6 +221,8 @@ class OpenStackAPI:
             LOGGER.info(
                 "[{}] API resonse: {}".format(self._plugin_name, response)
             )
+            if openstack.REGISTRY.unauthorized(response, use_tenant):
+                return None
 
             return response.text
         except Exception, err:
@@ -142,46 +238,54 @@ class OpenStackAPI:
 class Metrics(OpenStackAPI):
     """Provide access to OpenStack metric api (ceilometer)"""
 
-    def __init__(self, plugin_name="NoName"):
+    def __init__(self, plugin_name="NoName", deadline=None):
         """Find endpoint url"""
-        OpenStackAPI.__init__(self, plugin_name)
+        OpenStackAPI.__init__(self, plugin_name, deadline)
         self._service_name = 'ceilometer'
-        self._endpoint = openstack.OpenStackClients._find_endpoint(
-            self._keystone, self._service_name
-        )
+        self._endpoint = self._find_endpoint()
 
 
 class Compute(OpenStackAPI):
     """Provide access to OpenStack compute api (nova)"""
 
-    def __init__(self, plugin_name="NoName"):
+    def __init__(self, plugin_name="NoName", candidates=None, deadline=None):
         """Find endpoint url"""
-        OpenStackAPI.__init__(self, plugin_name)
+        OpenStackAPI.__init__(self, plugin_name, deadline)
         self._service_name = 'nova'
-        self._endpoint = openstack.OpenStackClients._find_endpoint(
-            self._keystone, self._service_name
-        )
+        self._endpoint = self._find_endpoint()
+        self._candidates = candidates
+
+    def get_candidates(self):
+        """
+        Return the decision's CandidateFeatures: every MigrateAction
+        (target, destination) pair with a row of hypervisor and flavor
+        features. Built once per decision and shared between plugins.
+        None for a run_batch call, which is given each event's own
+        """
+        if self._candidates is None:
+            return None
+
+        return self._candidates.get()
 
 
 class Orchestration(OpenStackAPI):
     """Provide access to OpenStack orchestration api (heat)"""
 
-    def __init__(self, plugin_name="NoName"):
+    def __init__(self, plugin_name="NoName", deadline=None):
         """Find endpoint url"""
-        OpenStackAPI.__init__(self, plugin_name)
+        OpenStackAPI.__init__(self, plugin_name, deadline)
         self._service_name = 'heat'
-        self._endpoint = openstack.OpenStackClients._find_endpoint(
-            self._keystone, self._service_name
-        )
+        self._endpoint = self._find_endpoint()
 
 
 class Agreements(OpenStackAPI):
     """Provide access to SLA api"""
 
-    def __init__(self, agreement_map, plugin_name="NoName"):
+    def __init__(self, agreement_map, plugin_name="NoName", deadline=None):
         """Skip OpenStackAPI init and do our own"""
         self._keystone = None
         self._plugin_name = plugin_name
+        self._deadline = deadline
         self._agreement_map = agreement_map
         self._endpoint = cfg.sla_agreements__endpoint
         self._auth = (
@@ -225,12 +329,22 @@ class Plugin(threading.Thread):
         self._initial_actions = None
         self._agreement_map = None
         self._results = None
+        self._candidates = None
+        self._deadline = None
 
         LOGGER.debug("[{}] Plugin init complete".format(name))
 
         threading.Thread.__init__(self)
 
-    def setup(self, event, initial_actions, results, agreement_map=None):
+    def setup(
+            self,
+            event,
+            initial_actions,
+            results,
+            agreement_map=None,
+            candidates=None,
+            deadline=None
+    ):
         """
         Additional setup used when plugin instance is created by generator
         """
@@ -238,6 +352,39 @@ class Plugin(threading.Thread):
         self._initial_actions = initial_actions
         self._agreement_map = agreement_map
         self._results = results
+        self._candidates = candidates
+        self._deadline = deadline
+
+    def batch_key(self):
+        """
+        Return what this instance must share with others to be evaluated
+        in the same batch, or None if it can't be batched
+        """
+        return None
+
+    @property
+    def batch_window(self):
+        """Seconds this instance waits on the queue for a batch to form"""
+        return 0
+
+    def _store_results(self, results):
+        """
+        Hand this plugin's results to the distributor, in the binary wire
+        format if configured to and they can be encoded, otherwise as
+        they are
+        """
+        if cfg.plugin__wire_format == 'binary' and results is not None:
+            try:
+                results = wireformat.encode_actions(results)
+            except ValueError, err:
+                self._log_error(
+                    "Couldn't encode results, sending them as objects "
+                    "[{}]".format(err)
+                )
+        self._results[self.plugin_name] = {
+            'results': results,
+            'weight': self.weight
+        }
 
     def _log_info(self, msg):
         """Plugin logs to log level INFO"""
@@ -252,12 +399,84 @@ class Plugin(threading.Thread):
         LOGGER.error("[{}] {}".format(self.plugin_name, msg))
 
 
+class BatchRequest:
+    """A single event evaluated as part of a plugin batch"""
+
+    def __init__(self, event, initial_actions, candidates=None):
+        """Store the event and set up somewhere to put the outcome"""
+        self.event = event
+        self.initial_actions = initial_actions
+        self.candidates = candidates
+        self.results = None
+        self.error = None
+
+
+class PluginBatcher:
+    """
+    Micro-batching for a plugin that supports run_batch
+
+    Every Distributor that invokes the same plugin shares the one
+    batcher. Instances of the plugin set up with compatible events (same
+    event name and same allowed action types) are collected off the
+    plugin scheduler's queue while they wait there, so a batch takes one
+    worker and one of the plugin's concurrency slots however big it is.
+    The first of them stays queued for up to `window` seconds to let
+    others arrive; with a window of 0 only those already queued join it
+    """
+
+    def __init__(self, name, window):
+        """Set the plugin name and window length in seconds"""
+        self._name = name
+        self.window = window
+
+    @staticmethod
+    def batch_key(event, initial_actions):
+        """Return the key events must share to be batched together"""
+        action_types = set(
+            [action.adaptation_type for action in initial_actions]
+        )
+        return (event.name, tuple(sorted(action_types)))
+
+    def evaluate(self, batch, run_batch):
+        """
+        Run one batch of requests and give each its results, or the error
+        if it failed. run_batch is called with a list of events and
+        matching lists of initial actions and of candidate providers
+        """
+        LOGGER.info(
+            "[{}] Evaluating a batch of {} events".format(
+                self._name, len(batch)
+            )
+        )
+        try:
+            batch_results = run_batch(
+                [request.event for request in batch],
+                [request.initial_actions for request in batch],
+                [request.candidates for request in batch]
+            )
+            if batch_results is None or len(batch_results) != len(batch):
+                raise ValueError(
+                    "run_batch returned results for {} events, "
+                    "expected {}".format(
+                        len(batch_results or []), len(batch)
+                    )
+                )
+            for request, results in zip(batch, batch_results):
+                request.results = results
+        except Exception, err:
+            LOGGER.error("[{}] Batch evaluation failed".format(self._name))
+            LOGGER.exception(err)
+            for request in batch:
+                request.error = err
+
+
 class PythonPlugin(Plugin):
     """Python-specific sub-class of Plugin"""
 
-    def __init__(self, file_path, info, name, uuid, weight):
+    def __init__(self, file_path, info, name, uuid, weight, batcher=None):
         """Python-specific Plugin intialisation"""
         self._plugin = imp.load_module('{}.py'.format(name), *info)
+        self._batcher = batcher
 
         Plugin.__init__(self, file_path, name, uuid, weight)
 
@@ -265,54 +484,173 @@ class PythonPlugin(Plugin):
             "initialising plugin [{}] [{}]".format(file_path, info)
         )
 
+    def _get_apis(self, candidates=None):
+        """Create the interfaces passed to a python plugin"""
+        return (
+            Metrics(self.plugin_name, deadline=self._deadline),
+            Compute(
+                self.plugin_name,
+                candidates=candidates,
+                deadline=self._deadline
+            ),
+            Orchestration(self.plugin_name, deadline=self._deadline),
+            Agreements(
+                self._agreement_map, self.plugin_name, deadline=self._deadline
+            ),
+            PluginLogger(self.plugin_name),
+        )
+
+    def _deadline_args(self, function):
+        """
+        Return the deadline as a keyword argument if the plugin function
+        takes one, so older plugins are called exactly as before
+        """
+        if self._deadline is None:
+            return {}
+        try:
+            argspec = inspect.getargspec(function)
+        except TypeError:
+            return {}
+        if 'deadline' in argspec.args or argspec.keywords:
+            return {'deadline': self._deadline}
+        return {}
+
+    def _run_batch(self, events, actions_per_event, candidates_per_event):
+        """
+        Evaluate several events with the plugin's run_batch. If it takes
+        a `candidates` keyword argument it gets each event's
+        CandidateFeatures, in the same order as the events
+        """
+        self._log_debug(
+            "Executing Python plugin on a batch of {} events".format(
+                len(events)
+            )
+        )
+        kwargs = self._deadline_args(self._plugin.run_batch)
+        try:
+            argspec = inspect.getargspec(self._plugin.run_batch)
+        except TypeError:
+            argspec = None
+        if argspec is not None and (
+                'candidates' in argspec.args or argspec.keywords
+        ):
+            kwargs['candidates'] = [
+                None if candidates is None else candidates.get()
+                for candidates in candidates_per_event
+            ]
+        return self._plugin.run_batch(
+            events,
+            actions_per_event,
+            *self._get_apis(),
+            **kwargs
+        )
+
+    def batch_key(self):
+        """
+        Return the plugin name, event name and allowed action types if
+        the plugin supports run_batch and batching is on, otherwise None
+        """
+        if self._batcher is None or not hasattr(self._plugin, 'run_batch'):
+            return None
+        return (self.plugin_name,) + PluginBatcher.batch_key(
+            self._event, self._initial_actions
+        )
+
+    @property
+    def batch_window(self):
+        """Seconds this instance waits on the queue for a batch to form"""
+        if self._batcher is None:
+            return 0
+        return self._batcher.window
+
+    def run_batch(self, plugins):
+        """
+        Evaluate this and other set-up instances of the plugin with one
+        run_batch call, storing each one's results. Return each one's
+        error, or None if it got its results
+        """
+        batch = [
+            BatchRequest(
+                plugin._event, plugin._initial_actions, plugin._candidates
+            )
+            for plugin in plugins
+        ]
+        self._batcher.evaluate(batch, self._run_batch)
+        for plugin, request in zip(plugins, batch):
+            if request.error is None:
+                plugin._store_results(request.results)
+        return [request.error for request in batch]
+
     def run(self):
         """Execute a python plugin instance and collect results"""
-        api_metrics = Metrics(self.plugin_name)
-        api_compute = Compute(self.plugin_name)
-        api_orchestration = Orchestration(self.plugin_name)
-        api_sla = Agreements(self._agreement_map, self.plugin_name)
-        plugin_logger = PluginLogger(self.plugin_name)
+        (
+            api_metrics,
+            api_compute,
+            api_orchestration,
+            api_sla,
+            plugin_logger
+        ) = self._get_apis(self._candidates)
 
         self._log_debug("Executing Python plugin")
-        self._results[self.plugin_name] = {
-            'results': self._plugin.run(
-                self._event,
-                self._initial_actions,
-                api_metrics,
-                api_compute,
-                api_orchestration,
-                api_sla,
-                plugin_logger
-            ),
-            'weight': self.weight
-        }
+        results = self._plugin.run(
+            self._event,
+            self._initial_actions,
+            api_metrics,
+            api_compute,
+            api_orchestration,
+            api_sla,
+            plugin_logger,
+            **self._deadline_args(self._plugin.run)
+        )
+
+        self._store_results(results)
 
 
 class PythonPluginGenerator:
     """Generate a new instance of a specific python plugin"""
 
+    needs_jvm = False
+
     def __init__(self, file_path, info, name, uuid, weight):
-        """Initialise vars"""
+        """
+        Initialise vars. If info is None the module is looked up
+        when the first instance is generated
+        """
         self._file_path = file_path
         self._info = info
         self._name = name
         self._uuid = uuid
         self._weight = weight
 
+        # shared by every instance, so events from different
+        # distributors can end up in the same batch
+        batch_window = cfg.plugin__batch_window
+        self._batcher = None
+        if batch_window is not None:
+            self._batcher = PluginBatcher(name, batch_window)
+
     def next(self):
         """Generate a new instance"""
+        if self._info is None:
+            self._info = imp.find_module(
+                self._name, [os.path.dirname(self._file_path)]
+            )
+
         return PythonPlugin(
             self._file_path,
             self._info,
             self._name,
             self._uuid,
-            self._weight
+            self._weight,
+            batcher=self._batcher
         )
 
 
 class JavaPluginGenerator:
     """Generate a new instance of a specific java plugin"""
 
+    needs_jvm = True
+
     def __init__(self, file_path, lock, name, uuid, weight):
         """Initialise vars"""
         self._file_path = file_path
@@ -359,7 +697,7 @@ class JavaPlugin(Plugin):
 
         # interfaces
         try:
-            metrics = Metrics(self.plugin_name)
+            metrics = Metrics(self.plugin_name, deadline=self._deadline)
             j_metrics = jpype.JProxy(
                 "intel.adaptationengine.Metrics",
                 inst=metrics
@@ -369,7 +707,7 @@ class JavaPlugin(Plugin):
             LOGGER.exception(err)
 
         try:
-            compute = Compute(self.plugin_name)
+            compute = Compute(self.plugin_name, deadline=self._deadline)
             j_compute = jpype.JProxy(
                 "intel.adaptationengine.Compute",
                 inst=compute
@@ -379,7 +717,9 @@ class JavaPlugin(Plugin):
             LOGGER.exception(err)
 
         try:
-            orchestration = Orchestration(self.plugin_name)
+            orchestration = Orchestration(
+                self.plugin_name, deadline=self._deadline
+            )
             j_orchestration = jpype.JProxy(
                 "intel.adaptationengine.Orchestration",
                 inst=orchestration
@@ -453,6 +793,20 @@ class JavaPlugin(Plugin):
         j_ae_plugin = jpype.JClass(plugin_class_name)
         j_ae = j_ae_plugin()
 
+        if self._deadline is not None:
+            # only plugins built against the Deadline interface take one
+            try:
+                if hasattr(j_ae, 'setDeadline'):
+                    j_ae.setDeadline(
+                        jpype.JProxy(
+                            "intel.adaptationengine.Deadline",
+                            inst=self._deadline
+                        )
+                    )
+            except Exception, err:
+                LOGGER.error("Error passing deadline to java plugin")
+                LOGGER.exception(err)
+
         self._log_info("Checking plugin response")
 
         response_actions = None
@@ -499,10 +853,7 @@ class JavaPlugin(Plugin):
             LOGGER.warn(
                 "Returning original initial actions becuase of plugin error"
             )
-            self._results[self.plugin_name] = {
-                'results': self._initial_actions,
-                'weight': self.weight
-            }
+            self._store_results(self._initial_actions)
         else:
 
             for action in output_actions:
@@ -510,10 +861,7 @@ class JavaPlugin(Plugin):
                     "Result action from plugin: {}".format(action)
                 )
 
-            self._results[self.plugin_name] = {
-                'results': output_actions,
-                'weight': self.weight
-            }
+            self._store_results(output_actions)
 
         self._log_info("Detaching thread from JVM...")
         jpype.detachThreadFromJVM()
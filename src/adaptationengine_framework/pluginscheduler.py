@@ -0,0 +1,367 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class PluginTask:
+    """A single plugin invocation queued on the scheduler"""
+
+    def __init__(
+            self,
+            plugin,
+            decision_id,
+            batch_key=None,
+            batch_window=0,
+            deadline=None
+    ):
+        """
+        Record the plugin, which decision it's for, and when it queued.
+        Tasks with the same batch_key run as one batch; the first waits
+        batch_window seconds for the others. A deadline is started when
+        a worker takes the task, so time on the queue doesn't count
+        """
+        self.plugin = plugin
+        self.decision_id = decision_id
+        self.batch_key = batch_key
+        self.deadline = deadline
+        self.queued_at = time.time()
+        self.ready_at = self.queued_at
+        if batch_key is not None:
+            self.ready_at += batch_window
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = False
+        self.abandoned = False
+        self.error = None
+        # the tasks run alongside this one, itself included
+        self.batch = [self]
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait for the plugin to finish, returning True if it did"""
+        return self._done.wait(timeout)
+
+    def finish(self):
+        """Mark the task as finished, waking anyone waiting on it"""
+        self.finished_at = time.time()
+        self._done.set()
+
+    @property
+    def queue_wait(self):
+        """Seconds spent queued before a worker picked the task up"""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.queued_at
+
+    @property
+    def execution_time(self):
+        """Seconds spent running the plugin"""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class PluginScheduler:
+    """
+    Run plugin invocations from every Distributor on one reusable pool of
+    worker threads
+
+    Each decision gets its own queue and workers take from the queues in
+    turn, so a decision that queued many plugins can't starve the others.
+    No more than a plugin's concurrency limit of copies of it run at once;
+    tasks for a plugin at its limit wait while other work goes ahead
+
+    Queued tasks that share a batch key are taken together, from any
+    decision, and run with one run_batch call on one worker, counting
+    once against the plugin's limit
+
+    A running task whose caller has given up on it can be abandoned: it
+    stops counting against the plugin's limit and a new worker takes
+    the place of the one running it, which exits if it ever returns
+    """
+
+    def __init__(self, workers, default_limit, limits=None, timeouts=None):
+        """
+        Start the worker threads. If a PluginTimeouts is given, every
+        execution time is recorded in it
+        """
+        self._default_limit = default_limit
+        self._timeouts = timeouts
+        self._limits = {
+            p.get('name'): p.get('max') for p in (limits or [])
+        }
+        self._condition = threading.Condition()
+        self._queues = collections.OrderedDict()
+        self._running = {}
+        self._wake_at = None
+        self._batches = 0
+        self._batched = 0
+        self._abandoned = 0
+        self._stopping = False
+
+        self._workers = []
+        for _ in xrange(workers):
+            self._start_worker()
+
+        LOGGER.info(
+            "Plugin scheduler started with {} workers".format(workers)
+        )
+
+    def _start_worker(self):
+        """Start a worker thread"""
+        worker = threading.Thread(target=self._work)
+        worker.daemon = True
+        worker.start()
+        self._workers.append(worker)
+
+    def get_limit(self, plugin_name):
+        """Return the maximum concurrent copies allowed for a plugin"""
+        return self._limits.get(plugin_name, self._default_limit)
+
+    def get_timeout(self, plugin_name):
+        """
+        Return the adaptive timeout for a plugin, or None if timeouts
+        aren't being tracked
+        """
+        if self._timeouts is None:
+            return None
+        return self._timeouts.get(plugin_name)
+
+    def submit(
+            self,
+            plugin,
+            decision_id,
+            batch_key=None,
+            batch_window=0,
+            deadline=None
+    ):
+        """Queue a set-up plugin instance and return its task"""
+        task = PluginTask(
+            plugin, decision_id, batch_key, batch_window, deadline
+        )
+        with self._condition:
+            self._queues.setdefault(decision_id, collections.deque())
+            self._queues[decision_id].append(task)
+            self._condition.notify()
+        return task
+
+    def cancel(self, task):
+        """
+        Take a task off the queue if it hasn't started yet. Return True
+        if it was cancelled
+        """
+        with self._condition:
+            if task.started_at is not None or task.cancelled:
+                return False
+
+            queue = self._queues.get(task.decision_id)
+            if queue is not None:
+                try:
+                    queue.remove(task)
+                except ValueError:
+                    pass
+                if not queue:
+                    del self._queues[task.decision_id]
+
+            task.cancelled = True
+            task.finish()
+            return True
+
+    def abandon(self, task):
+        """
+        Stop counting a running task, and the rest of its batch, against
+        its plugin's limit, and replace the worker running it. Return
+        True if it was abandoned
+        """
+        with self._condition:
+            if (
+                    task.started_at is None or task.finished_at is not None
+                    or task.abandoned
+            ):
+                return False
+
+            plugin_name = task.plugin.plugin_name
+            for member in task.batch:
+                member.abandoned = True
+            self._running[plugin_name] -= 1
+            self._abandoned += 1
+            if not self._stopping:
+                self._start_worker()
+            self._condition.notify_all()
+
+        LOGGER.warn(
+            "[{}] Abandoned a plugin that ran past its deadline".format(
+                plugin_name
+            )
+        )
+        return True
+
+    def stats(self):
+        """Return current queue depth and running counts per plugin"""
+        with self._condition:
+            return {
+                'queued': sum([len(q) for q in self._queues.itervalues()]),
+                'decisions': len(self._queues),
+                'running': dict(
+                    (k, v) for k, v in self._running.iteritems() if v
+                ),
+                'batches': self._batches,
+                'batched': self._batched,
+                'abandoned': self._abandoned,
+            }
+
+    def stop(self):
+        """Stop the workers once they finish what they're running"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def _take_batch(self, task):
+        """
+        Pop every other queued task in the same batch as a task. Must be
+        called with the condition held
+        """
+        batch = [task]
+        for decision_id in list(self._queues.iterkeys()):
+            queue = self._queues[decision_id]
+            members = [
+                member for member in queue
+                if member.batch_key == task.batch_key
+            ]
+            for member in members:
+                queue.remove(member)
+            if not queue:
+                del self._queues[decision_id]
+            batch.extend(members)
+        return batch
+
+    def _next_tasks(self):
+        """
+        Pop the next runnable task, and the rest of its batch, taking
+        decisions in turn. Must be called with the condition held
+        """
+        now = time.time()
+        self._wake_at = None
+        for decision_id in list(self._queues.iterkeys()):
+            queue = self._queues[decision_id]
+            for task in queue:
+                plugin_name = task.plugin.plugin_name
+                running = self._running.get(plugin_name, 0)
+                if running >= self.get_limit(plugin_name):
+                    continue
+                if task.ready_at > now:
+                    # still waiting for its batch to form
+                    self._wake_at = min(
+                        self._wake_at or task.ready_at, task.ready_at
+                    )
+                    continue
+                queue.remove(task)
+                # move this decision to the back of the line
+                del self._queues[decision_id]
+                if queue:
+                    self._queues[decision_id] = queue
+                batch = [task]
+                if task.batch_key is not None:
+                    batch = self._take_batch(task)
+                self._running[plugin_name] = running + 1
+                for member in batch:
+                    member.batch = batch
+                    member.started_at = now
+                    if member.deadline is not None:
+                        member.deadline.start()
+                return batch
+
+        return []
+
+    def _wait(self):
+        """
+        Wait to be notified, or until a batch has had its window. Must
+        be called with the condition held
+        """
+        if self._wake_at is None:
+            self._condition.wait()
+        else:
+            self._condition.wait(max(self._wake_at - time.time(), 0))
+
+    def _run(self, batch):
+        """Run a task, or a batch of them with one run_batch call"""
+        task = batch[0]
+        if len(batch) == 1:
+            task.plugin.run()
+            return
+
+        LOGGER.info(
+            "[{}] Running a batch of {} tasks".format(
+                task.plugin.plugin_name, len(batch)
+            )
+        )
+        with self._condition:
+            self._batches += 1
+            self._batched += len(batch)
+        errors = task.plugin.run_batch([member.plugin for member in batch])
+        for member, error in zip(batch, errors):
+            member.error = error
+
+    def _work(self):
+        """
+        Worker loop: take a runnable task or batch, run it, repeat. A
+        worker whose batch was abandoned has been replaced, so it exits
+        """
+        while True:
+            with self._condition:
+                batch = self._next_tasks()
+                while not batch:
+                    if self._stopping:
+                        return
+                    self._wait()
+                    batch = self._next_tasks()
+
+            plugin_name = batch[0].plugin.plugin_name
+            try:
+                self._run(batch)
+            except Exception, err:
+                LOGGER.error("[{}] Plugin raised an error".format(plugin_name))
+                LOGGER.exception(err)
+                for task in batch:
+                    task.error = err
+            finally:
+                with self._condition:
+                    abandoned = batch[0].abandoned
+                    if not abandoned:
+                        self._running[plugin_name] -= 1
+                    # under the condition, so it can't be abandoned now
+                    for task in batch:
+                        task.finish()
+                    self._condition.notify_all()
+                for task in batch:
+                    if self._timeouts is not None:
+                        self._timeouts.record(
+                            plugin_name, task.execution_time
+                        )
+                    LOGGER.info(
+                        "[{}] queue wait {:.3f} seconds, execution {:.3f} "
+                        "seconds".format(
+                            plugin_name, task.queue_wait, task.execution_time
+                        )
+                    )
+            if abandoned:
+                return
@@ -0,0 +1,120 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import logging
+import math
+import threading
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class PluginTimeouts:
+    """
+    Work out a timeout for each plugin from how long it has actually been
+    taking
+
+    The last `window` execution times of each plugin are kept. Once a plugin
+    has at least `min_samples` of them its timeout is the chosen percentile
+    of those times plus `headroom` (a fraction, so 0.5 is 50% extra),
+    clamped between `floor` and `ceiling` seconds. Until then, the default
+    timeout is used
+    """
+
+    def __init__(
+            self,
+            default_timeout,
+            percentile=99,
+            headroom=0.5,
+            floor=1,
+            ceiling=None,
+            window=200,
+            min_samples=20,
+    ):
+        """Set the timeout policy"""
+        self._default_timeout = default_timeout
+        self._percentile = percentile
+        self._headroom = headroom
+        self._floor = floor
+        self._ceiling = ceiling or default_timeout
+        self._window = window
+        self._min_samples = min_samples
+
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._timeouts = {}
+
+    @staticmethod
+    def percentile(samples, percentile):
+        """Return the nearest-rank percentile of a list of samples"""
+        ordered = sorted(samples)
+        rank = int(math.ceil(percentile / 100.0 * len(ordered))) - 1
+        return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+    def record(self, plugin_name, seconds):
+        """Add a plugin's execution time to its rolling window"""
+        with self._lock:
+            samples = self._samples.get(plugin_name)
+            if samples is None:
+                samples = collections.deque(maxlen=self._window)
+                self._samples[plugin_name] = samples
+            samples.append(seconds)
+            # recalculated on next get
+            self._timeouts.pop(plugin_name, None)
+
+    def get(self, plugin_name):
+        """Return the timeout in seconds to allow this plugin"""
+        with self._lock:
+            timeout = self._timeouts.get(plugin_name)
+            if timeout is None:
+                timeout = self._calculate(plugin_name)
+                self._timeouts[plugin_name] = timeout
+            return timeout
+
+    def _calculate(self, plugin_name):
+        """Derive a plugin's timeout. Must be called with the lock held"""
+        samples = self._samples.get(plugin_name, [])
+        if len(samples) < self._min_samples:
+            return self._default_timeout
+
+        latency = PluginTimeouts.percentile(samples, self._percentile)
+        timeout = latency * (1 + self._headroom)
+        timeout = min(max(timeout, self._floor), self._ceiling)
+        LOGGER.debug(
+            "[{}] p{} latency {:.3f} seconds, timeout now {:.3f}".format(
+                plugin_name, self._percentile, latency, timeout
+            )
+        )
+        return timeout
+
+    def stats(self):
+        """Return each plugin's current timeout and how it was chosen"""
+        with self._lock:
+            plugin_names = list(self._samples.iterkeys())
+        output = {}
+        for plugin_name in plugin_names:
+            timeout = self.get(plugin_name)
+            with self._lock:
+                samples = list(self._samples[plugin_name])
+            output[plugin_name] = {
+                'timeout': timeout,
+                'samples': len(samples),
+                'latency_percentile': self._percentile,
+                'latency': PluginTimeouts.percentile(
+                    samples, self._percentile
+                ),
+            }
+        return output
@@ -40,17 +40,22 @@ class WebboNoPrinto:
 class Webbo(threading.Thread):
     """Run a webserver"""
 
-    def __init__(self, get_agreement_map_function):
-        """Initialise the server, setup the thread"""
+    def __init__(self, get_agreement_map_function, stats_functions=None):
+        """
+        Initialise the server, setup the thread. stats_functions maps
+        names to functions returning json-compatible runtime statistics
+        """
         LOGGER.info("Making a webbo")
         self._get_agreement_map = get_agreement_map_function
+        self._stats_functions = stats_functions or {}
         self._app = None
 
         threading.Thread.__init__(self)
 
     def load_agreements(self, handler):
-        """Pass the agreement map into the request class"""
+        """Pass the agreement map and stats into the request class"""
         web.ctx.agreements = self._get_agreement_map()
+        web.ctx.stats_functions = self._stats_functions
         return handler()
 
     def run(self):
@@ -59,6 +64,7 @@ class Webbo(threading.Thread):
         try:
             urls = (
                 '/agreements', 'RESTAgreements',
+                '/stats/?(.*)', 'RESTStats',
                 '/(.*)', 'RESTRoot',
             )
             # suppress most of webpy's output
@@ -97,3 +103,21 @@ class RESTAgreements:
     def GET(self, *args):
         """dump"""
         return json.dumps(web.ctx.agreements)
+
+
+class RESTStats:
+    """
+    Handles presenting runtime statistics (e.g. plugin timeouts) as json
+    """
+
+    def GET(self, name=None, *args):
+        """dump one named set of stats, or the list of names"""
+        stats_functions = web.ctx.stats_functions
+        if not name:
+            return json.dumps(sorted(stats_functions.keys()))
+
+        stats_function = stats_functions.get(name)
+        if stats_function is None:
+            raise web.notfound()
+
+        return json.dumps(stats_function())
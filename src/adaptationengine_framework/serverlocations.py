@@ -0,0 +1,152 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import collections
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+
+class ServerLocations:
+    """
+    Which hypervisor every server is on
+
+    Seeded by one listing of every server, then kept current by moved()
+    and forget() as migrations finish and compute notifications arrive.
+    A server that isn't known is looked up on its own. The whole mapping
+    is listed again once it's `max_age` seconds old, to catch anything
+    that was missed. Errors from nova are passed to on_error
+    """
+
+    def __init__(self, get_nova_client, max_age=600, on_error=None):
+        """Set where listings come from and how often to start over"""
+        self._get_nova_client = get_nova_client
+        self.max_age = max_age
+        self._on_error = on_error
+
+        self._lock = threading.Lock()
+        self._seed_lock = threading.Lock()
+        self._hypervisors = {}
+        # server id -> (when, hypervisor) for moves since the last seed
+        self._moves = {}
+        self._seeded_at = None
+        self._counts = collections.Counter()
+
+    @staticmethod
+    def _hypervisor(server):
+        """Return the hypervisor hostname from a server's details"""
+        return getattr(server, 'OS-EXT-SRV-ATTR:hypervisor_hostname', None)
+
+    def _seed(self):
+        """List every server if the mapping is missing or too old"""
+        seeded_at = self._seeded_at
+        if seeded_at is not None and time.time() - seeded_at < self.max_age:
+            return
+
+        with self._seed_lock:
+            if self._seeded_at is not None and (
+                    time.time() - self._seeded_at < self.max_age
+            ):
+                return
+
+            listed_at = time.time()
+            try:
+                servers = self._get_nova_client().servers.list(
+                    detailed=True, search_opts={'all_tenants': True}
+                )
+            except Exception, err:
+                LOGGER.error("Couldn't list servers [{}]".format(err))
+                if self._on_error is not None:
+                    self._on_error(err)
+                return
+
+            hypervisors = dict(
+                (server.id, self._hypervisor(server)) for server in servers
+            )
+            with self._lock:
+                # moves recorded while listing are newer than the listing
+                for server_id, (moved_at, hypervisor) in (
+                        self._moves.iteritems()
+                ):
+                    if moved_at >= listed_at:
+                        hypervisors[server_id] = hypervisor
+                self._moves = {}
+                self._hypervisors = hypervisors
+                self._seeded_at = listed_at
+                self._counts['seeds'] += 1
+            LOGGER.info(
+                "Mapped {} servers to hypervisors".format(len(hypervisors))
+            )
+
+    def hypervisor_of(self, server_id):
+        """Return the hypervisor a server is on, or None if not known"""
+        self._seed()
+        with self._lock:
+            self._counts['lookups'] += 1
+            if server_id in self._hypervisors:
+                return self._hypervisors[server_id]
+            self._counts['misses'] += 1
+
+        try:
+            server = self._get_nova_client().servers.get(server_id)
+        except Exception, err:
+            LOGGER.warn(
+                "Couldn't find server [{}] [{}]".format(server_id, err)
+            )
+            if self._on_error is not None:
+                self._on_error(err)
+            return None
+
+        hypervisor = self._hypervisor(server)
+        with self._lock:
+            self._hypervisors[server_id] = hypervisor
+        return hypervisor
+
+    def mapping(self):
+        """Return {server id: hypervisor hostname} for every server"""
+        self._seed()
+        with self._lock:
+            return dict(self._hypervisors)
+
+    def moved(self, server_id, hypervisor):
+        """Record that a server is now on a hypervisor"""
+        with self._lock:
+            self._hypervisors[server_id] = hypervisor
+            self._moves[server_id] = (time.time(), hypervisor)
+            self._counts['updates'] += 1
+
+    def forget(self, server_id):
+        """Record that a server is gone"""
+        with self._lock:
+            self._hypervisors.pop(server_id, None)
+            self._moves.pop(server_id, None)
+            self._counts['updates'] += 1
+
+    def stats(self):
+        """Return the mapping's size and age, and how it's been used"""
+        with self._lock:
+            stats = {
+                'servers': len(self._hypervisors),
+                'age': (
+                    None if self._seeded_at is None
+                    else time.time() - self._seeded_at
+                ),
+            }
+            for name in ['seeds', 'lookups', 'misses', 'updates']:
+                stats[name] = self._counts[name]
+            return stats
@@ -0,0 +1,400 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+import threading
+import time
+
+
+LOGGER = logging.getLogger('syslog')
+
+SERVER = 'server'
+STACK = 'stack'
+
+
+def on_hypervisor(hypervisor_hostname):
+    """Return a check that a server has arrived on a hypervisor"""
+    def check(server):
+        if server is None:
+            return None
+        details = server.to_dict()
+        if details.get(
+                'OS-EXT-SRV-ATTR:hypervisor_hostname'
+        ) == hypervisor_hostname:
+            return True
+        return None
+    return check
+
+
+def in_power_state(desired_states):
+    """
+    Return a check that a server is in one of the desired power states.
+    It fails if the server or its power state can't be found
+    """
+    def check(server):
+        if server is None:
+            return False
+        power_state = server.to_dict().get('OS-EXT-STS:power_state', -1)
+        if power_state in desired_states:
+            return True
+        elif power_state == -1:
+            return False
+        return None
+    return check
+
+
+def stack_complete(stack):
+    """Check that a stack is marked as 'COMPLETE'"""
+    if stack is not None and stack.status == 'COMPLETE':
+        return True
+    return None
+
+
+class StatusWatch:
+    """An enactment waiting for a server or stack to reach a state"""
+
+    def __init__(self, kind, resource_id, check, timeout, silence=0):
+        """
+        Record what's being watched. check(resource) returns True or
+        False once the outcome is known, or None to keep waiting; the
+        resource is None if it wasn't listed. It isn't polled until
+        `silence` seconds have passed
+        """
+        self.kind = kind
+        self.resource_id = resource_id
+        self.check = check
+        self.started_at = time.time()
+        self.expires_at = self.started_at + timeout
+        self.poll_after = self.started_at + silence
+        self.result = None
+        self.resolved_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Wait for the outcome and return it, False if it timed out"""
+        self._done.wait(timeout)
+        return bool(self.result)
+
+    def resolve(self, result):
+        """Record the outcome, waking anyone waiting on it"""
+        if self._done.is_set():
+            return
+        self.result = result
+        self.resolved_at = time.time()
+        self._done.set()
+
+    @property
+    def done(self):
+        """True once the outcome is known"""
+        return self._done.is_set()
+
+
+class StatusPoller:
+    """
+    Check on every in-flight enactment from one thread
+
+    Each tick lists every server (across tenants) and every stack once,
+    whatever the number of enactments waiting, and resolves the watches
+    whose resources have reached their state. The interval between
+    ticks doubles while nothing changes, up to max_interval, and drops
+    back to min_interval when a watch is added or resolved. Adding a
+    watch never makes a tick happen sooner than min_interval after it
+
+    When something else reports changes to resources (see
+    completiontracker), `silence` holds off polling a watch until that
+    many seconds pass without a nudge() about its resource; a nudge
+    checks it at the next tick, which it brings forward to no sooner
+    than min_interval after the last listing, so a burst of nudges
+    costs one listing
+
+    Listing stacks across tenants needs heat's global_index policy. If
+    that's refused, each watched stack is fetched once per tick through
+    a client for its owner, from get_heat_client_for_stack(stack id).
+    Errors listing servers or stacks are passed to on_error, which
+    returns True if it dealt with them, e.g. by dropping clients whose
+    token was refused, so the listing is worth trying again as it was
+    """
+
+    def __init__(
+            self,
+            get_nova_client,
+            get_heat_client,
+            min_interval=2,
+            max_interval=30,
+            timeout=400,
+            silence=0,
+            get_heat_client_for_stack=None,
+            on_error=None
+    ):
+        """Start the polling thread"""
+        self._get_nova_client = get_nova_client
+        self._get_heat_client = get_heat_client
+        self._get_heat_client_for_stack = get_heat_client_for_stack
+        self._global_stacks = True
+        self._on_error = on_error
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self.timeout = timeout
+        self.silence = silence
+
+        self._condition = threading.Condition()
+        self._watches = []
+        self._interval = min_interval
+        self._next_tick = None
+        # when the last listing was taken, and the tick nudges want since
+        self._listed_at = None
+        self._nudged_tick = None
+        self._stopping = False
+
+        self._ticks = 0
+        self._api_calls = 0
+        self._resolved = 0
+        self._timed_out = 0
+        self._nudges = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def watch(self, kind, resource_id, check, timeout=None):
+        """Start watching a server or stack and return the watch"""
+        watch = StatusWatch(
+            kind, resource_id, check,
+            self.timeout if timeout is None else timeout,
+            self.silence
+        )
+        with self._condition:
+            next_tick = time.time() + self._min_interval
+            if self._watches:
+                next_tick = min(self._next_tick, next_tick)
+            self._watches.append(watch)
+            self._interval = self._min_interval
+            self._next_tick = next_tick
+            self._condition.notify()
+        LOGGER.info(
+            "Watching {} [{}], {} in flight".format(
+                kind, resource_id, len(self._watches)
+            )
+        )
+        return watch
+
+    def watch_server(self, server_id, check, timeout=None):
+        """Start watching a server"""
+        return self.watch(SERVER, server_id, check, timeout)
+
+    def watch_stack(self, stack_id, check=stack_complete, timeout=None):
+        """Start watching a stack, by default until it's complete"""
+        return self.watch(STACK, stack_id, check, timeout)
+
+    def nudge(self, kind, resource_id):
+        """
+        Check any watches on a resource at the next tick, which happens
+        straight away unless a listing was taken within min_interval.
+        Return True if anything is watching it
+        """
+        with self._condition:
+            watches = [
+                watch for watch in self._watches
+                if watch.kind == kind and watch.resource_id == resource_id
+            ]
+            if not watches:
+                return False
+            now = time.time()
+            for watch in watches:
+                watch.poll_after = now
+            tick_at = now
+            if self._listed_at is not None:
+                tick_at = max(now, self._listed_at + self._min_interval)
+            if self._nudged_tick is None or tick_at < self._nudged_tick:
+                self._nudged_tick = tick_at
+            self._next_tick = min(self._next_tick, tick_at)
+            self._nudges += 1
+            self._condition.notify()
+        return True
+
+    def stats(self):
+        """Return in-flight watches, the current interval and API calls"""
+        with self._condition:
+            return {
+                'in_flight': len(self._watches),
+                'interval': self._interval,
+                'ticks': self._ticks,
+                'api_calls': self._api_calls,
+                'resolved': self._resolved,
+                'timed_out': self._timed_out,
+                'nudges': self._nudges,
+            }
+
+    def stop(self):
+        """Stop polling, failing anything still in flight"""
+        with self._condition:
+            self._stopping = True
+            watches = self._watches
+            self._watches = []
+            self._condition.notify_all()
+        for watch in watches:
+            watch.resolve(False)
+
+    def _get_stacks(self, stack_ids):
+        """
+        Return {id: stack} for some stacks, each fetched by its owner,
+        and the number of API calls it took
+        """
+        stacks = {}
+        api_calls = 0
+        for stack_id in stack_ids:
+            try:
+                heat_client = self._get_heat_client_for_stack(stack_id)
+                if heat_client is None:
+                    continue
+                api_calls += 1
+                stacks[stack_id] = heat_client.stacks.get(stack_id)
+            except Exception, err:
+                LOGGER.error(
+                    "Couldn't get stack [{}] [{}]".format(stack_id, err)
+                )
+        return (stacks, api_calls)
+
+    def _list(self, watches):
+        """
+        Return {kind: {id: resource}} for the kinds being watched, leaving
+        out any kind whose listing failed, and the number of API calls it
+        took
+        """
+        kinds = set([watch.kind for watch in watches])
+        listings = {}
+        api_calls = 0
+        if SERVER in kinds:
+            api_calls += 1
+            try:
+                listings[SERVER] = dict(
+                    (server.id, server)
+                    for server in self._get_nova_client().servers.list(
+                        detailed=True, search_opts={'all_tenants': True}
+                    )
+                )
+            except Exception, err:
+                LOGGER.error("Couldn't list servers [{}]".format(err))
+                if self._on_error is not None:
+                    self._on_error(err)
+        if STACK in kinds and self._global_stacks:
+            api_calls += 1
+            try:
+                listings[STACK] = dict(
+                    (stack.id, stack)
+                    for stack in self._get_heat_client().stacks.list(
+                        global_tenant=True
+                    )
+                )
+            except Exception, err:
+                LOGGER.error("Couldn't list stacks [{}]".format(err))
+                dealt_with = (
+                    self._on_error is not None and self._on_error(err)
+                )
+                if (
+                        not dealt_with and
+                        self._get_heat_client_for_stack is not None
+                ):
+                    LOGGER.warn(
+                        "Getting watched stacks one by one from now on"
+                    )
+                    self._global_stacks = False
+        if STACK in kinds and not self._global_stacks:
+            (listings[STACK], stack_calls) = self._get_stacks(set([
+                watch.resource_id for watch in watches
+                if watch.kind == STACK
+            ]))
+            api_calls += stack_calls
+        return (listings, api_calls)
+
+    def _tick(self, watches):
+        """
+        Check the watches that are due against one listing of each kind,
+        and fail the ones that have timed out
+        """
+        with self._condition:
+            now = time.time()
+            due = [watch for watch in watches if watch.poll_after <= now]
+            if due:
+                self._listed_at = now
+                self._nudged_tick = None
+        (listings, api_calls) = self._list(due)
+
+        resolved = 0
+        timed_out = 0
+        for watch in watches:
+            if watch.kind in listings and watch.poll_after <= now:
+                try:
+                    result = watch.check(
+                        listings[watch.kind].get(watch.resource_id)
+                    )
+                except Exception, err:
+                    LOGGER.exception(err)
+                    result = False
+                if result is not None:
+                    watch.resolve(result)
+                    resolved += 1
+                    continue
+                with self._condition:
+                    # unless nudged since the listing was taken
+                    if watch.poll_after <= now:
+                        watch.poll_after = now + self.silence
+            if now >= watch.expires_at:
+                LOGGER.warn(
+                    "Gave up waiting on {} [{}]".format(
+                        watch.kind, watch.resource_id
+                    )
+                )
+                watch.resolve(False)
+                timed_out += 1
+
+        with self._condition:
+            self._watches = [w for w in self._watches if not w.done]
+            self._ticks += 1
+            self._api_calls += api_calls
+            self._resolved += resolved
+            self._timed_out += timed_out
+            if resolved:
+                self._interval = self._min_interval
+            else:
+                self._interval = min(
+                    self._interval * 2, self._max_interval
+                )
+            self._next_tick = time.time() + self._interval
+            # nudged while listing
+            if self._nudged_tick is not None:
+                self._next_tick = min(self._next_tick, self._nudged_tick)
+
+    def _run(self):
+        """Polling loop: wait for the next tick, check everything, repeat"""
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if not self._watches:
+                        self._condition.wait()
+                        continue
+                    delay = self._next_tick - time.time()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._stopping:
+                    return
+                watches = list(self._watches)
+
+            try:
+                self._tick(watches)
+            except Exception, err:
+                LOGGER.error("Status poller error")
+                LOGGER.exception(err)
@@ -0,0 +1,212 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+
+import numpy
+
+import adaptationengine_framework.configuration as cfg
+import adaptationengine_framework.stv as stv
+import adaptationengine_framework.stvmatrix as stvmatrix
+
+LOGGER = logging.getLogger('syslog')
+
+
+def collect_ballots(round_results):
+    """
+    Return (actions, ballots) from plugin round results. actions are the
+    distinct actions in the order they were first proposed, and each ballot
+    is (normalised plugin weight, [(action index, score), ...]) in the
+    plugin's order of preference, without duplicates
+    """
+    actions = []
+    action_index = {}
+    ballots = []
+
+    total_plugin_weight = sum(
+        [plugin['weight'] for key, plugin in round_results.items()]
+    )
+
+    for plugin_name, plugin_results in round_results.items():
+        weight = float(plugin_results['weight']) / total_plugin_weight
+        ballot = []
+        chosen = set()
+        for action in plugin_results['results']:
+            candidate_id = hash(action)
+            index = action_index.get(candidate_id)
+            if index is None:
+                index = len(actions)
+                action_index[candidate_id] = index
+                actions.append(action)
+            if index not in chosen:
+                chosen.add(index)
+                ballot.append((index, action.score))
+        ballots.append((weight, ballot))
+
+    return (actions, ballots)
+
+
+def rank_actions(actions, points):
+    """
+    Return the actions ordered by points, highest first, with ties left in
+    the order they were first proposed. Each action's votes are set to its
+    points
+    """
+    order = sorted(xrange(len(actions)), key=lambda i: points[i], reverse=True)
+    for index in order:
+        actions[index].votes = int(points[index])
+    return [actions[index] for index in order]
+
+
+class ConsolidationStrategy:
+    """
+    A way of combining every plugin's list of actions into one
+
+    tally takes the round results and the blacklist like
+    stv.SingleTransferrableVote.tally does, blacklists any action scored
+    -1, and returns (ordered actions, blacklist). Strategies rank by their
+    own points; by default an action's points are every plugin's score
+    for it times the plugin's weight
+    """
+
+    name = None
+
+    @staticmethod
+    def points(actions, ballots):
+        """Return the weighted score total for each action"""
+        points = [0] * len(actions)
+        for (weight, ballot) in ballots:
+            for (index, score) in ballot:
+                points[index] += int((score * 1000) * weight)
+        return points
+
+    @classmethod
+    def tally(cls, round_results, blacklist):
+        """Rank the actions by the points the strategy gives them"""
+        stv.SingleTransferrableVote._remove_blacklisted(
+            round_results, blacklist
+        )
+        (actions, ballots) = collect_ballots(round_results)
+        return (rank_actions(actions, cls.points(actions, ballots)), blacklist)
+
+
+class WeightedBorda(ConsolidationStrategy):
+    """
+    Weighted Borda count: on a ballot of n actions the first gets n points,
+    the next n - 1 and so on, times the plugin's weight (x1000, to match
+    the scale of STV votes). Scores are ignored, only order matters
+    """
+
+    name = 'borda'
+
+    @staticmethod
+    def points(actions, ballots):
+        """Return the Borda points for each action"""
+        points = [0] * len(actions)
+        for (weight, ballot) in ballots:
+            for rank, (index, _) in enumerate(ballot):
+                points[index] += int((len(ballot) - rank) * 1000 * weight)
+        return points
+
+
+class WeightedScoreSum(ConsolidationStrategy):
+    """
+    Sum of every plugin's score for an action, times the plugin's weight.
+    The same votes STV starts from, without any transfers
+    """
+
+    name = 'score_sum'
+
+
+class Schulze(ConsolidationStrategy):
+    """
+    Schulze method: d[a, b] is the weight of plugins ranking a above b
+    (an action a plugin didn't propose is below all the ones it did), the
+    strongest path strengths between every pair are found, and actions are
+    ranked by how many others they beat. Cubic in the number of actions, so
+    best kept to events with tens or hundreds of them
+    """
+
+    name = 'schulze'
+
+    @staticmethod
+    def points(actions, ballots):
+        """Return how many other actions each action beats"""
+        candidates = len(actions)
+        if not candidates:
+            return []
+
+        preferred = numpy.zeros((candidates, candidates))
+        for (weight, ballot) in ballots:
+            ranks = numpy.full(candidates, numpy.inf)
+            ranks[[index for (index, _) in ballot]] = numpy.arange(len(ballot))
+            preferred += weight * (ranks[:, None] < ranks[None, :])
+
+        strength = numpy.where(preferred > preferred.T, preferred, 0)
+        for k in xrange(candidates):
+            strength = numpy.maximum(
+                strength,
+                numpy.minimum(strength[:, k, None], strength[None, k, :])
+            )
+
+        return (strength > strength.T).sum(axis=1).tolist()
+
+
+class SingleTransferrableVoteStrategy(ConsolidationStrategy):
+    """STV, with the engine chosen by consolidation.stv_engine"""
+
+    name = 'stv'
+
+    @classmethod
+    def tally(cls, round_results, blacklist):
+        """Tally with the configured STV engine"""
+        if cfg.consolidation__stv_engine == 'matrix':
+            return stvmatrix.MatrixSingleTransferrableVote.tally(
+                round_results, blacklist
+            )
+        return stv.SingleTransferrableVote.tally(round_results, blacklist)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in [
+        SingleTransferrableVoteStrategy,
+        WeightedBorda,
+        WeightedScoreSum,
+        Schulze,
+    ]
+}
+
+
+def get_strategy(event_name):
+    """
+    Return the consolidation strategy configured for an event name, or the
+    default strategy
+    """
+    strategy_name = cfg.consolidation__strategy
+    for entry in cfg.consolidation__event_strategies or []:
+        if entry.get('event') == event_name:
+            strategy_name = entry.get('strategy')
+            break
+
+    strategy = STRATEGIES.get(strategy_name)
+    if strategy is None:
+        LOGGER.error(
+            "Unknown consolidation strategy [{}] for event [{}], "
+            "using stv".format(strategy_name, event_name)
+        )
+        strategy = SingleTransferrableVoteStrategy
+
+    return strategy
@@ -13,6 +13,7 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import itertools
 import logging
 
 import adaptationengine_framework.adaptationaction as adaptationaction
@@ -30,21 +31,26 @@ class Voter:
     def __init__(self, name):
         self.name = name
         self.votes = []
+        # candidate id -> first preference it was voted at
+        self.positions = {}
 
     def vote(self, preference, candidate_id):
         """
         fill candidate_id into appropriate place in votes list,
         or expand votes list until the place is created
         """
-        try:
-            self.votes[preference] = candidate_id
-        except IndexError:
-            self.votes.append(0)
-            self.vote(preference, candidate_id)
+        if preference >= len(self.votes):
+            self.votes.extend([0] * (preference + 1 - len(self.votes)))
+        self.votes[preference] = candidate_id
+        self.positions.setdefault(candidate_id, preference)
 
 
-class Candidate(adaptationaction.AdaptationAction):
-    """a wrapper for adaptation actions to add some additional info"""
+class Candidate:
+    """
+    an adaptation action's running tally. the action is reached through
+    `action` rather than passed through, so the tally never changes it
+    until the final votes are written
+    """
 
     def __init__(self, action):
         self.action = action
@@ -52,20 +58,6 @@ class Candidate(adaptationaction.AdaptationAction):
         self.votes = [0]
         self.id = hash(action)
 
-    def __getattr__(self, key):
-        """
-        pass through attribute requests to the AdaptationAction object unless
-        it's candidate-specific
-        """
-        if (
-                key is 'votes' or
-                key is 'id' or
-                key is 'supporters'
-        ):
-            return getattr(self, key)
-        else:
-            return getattr(self.action, key)
-
     def __repr__(self):
         output = (
             "Candidate(id={id}, "
@@ -77,12 +69,12 @@ class Candidate(adaptationaction.AdaptationAction):
                 id=self.id,
                 type=(
                     adaptationaction.AdaptationType.get_string(
-                        self.adaptation_type
+                        self.action.adaptation_type
                     )
                 ),
-                target=self.target,
-                destination=self.destination,
-                scale_value=self.scale_value,
+                target=self.action.target,
+                destination=self.action.destination,
+                scale_value=self.action.scale_value,
                 votes=self.votes
         )
         return output
@@ -93,35 +85,45 @@ class Candidate(adaptationaction.AdaptationAction):
         or expand votes list until the place is created. also add an
         entry into the supporters list
         """
-        try:
-            self.votes[seat] += amount
-            self.supporters.setdefault(seat, [])
-            self.supporters[seat] += [supporter]
-        except IndexError:
-            self.votes.append(0)
-            self.add_votes(supporter, amount, seat)
+        self._extend_votes(seat)
+        self.votes[seat] += amount
+        self.supporters.setdefault(seat, [])
+        self.supporters[seat] += [supporter]
 
     def add_transfer(self, amount, seat):
         """
         fill votes into appropriate place in votes list,
         or expand votes list until the place is created
         """
-        try:
-            self.votes[seat] += amount
-        except IndexError:
-            self.votes.append(0)
-            self.add_transfer(amount, seat)
+        self._extend_votes(seat)
+        self.votes[seat] += amount
+
+    def _extend_votes(self, seat):
+        """pad the votes list with zeros until it has a place for seat"""
+        if seat >= len(self.votes):
+            self.votes.extend([0] * (seat + 1 - len(self.votes)))
 
 
 class SingleTransferrableVote:
     """
     take a plugin-round-results dictionary and use the STV method to re-order
     and combine the lists of adaptation actions
+
+    candidates are indexed by id and the hopefuls' ids are kept in a set, so
+    finding a candidate or checking it's still in the running doesn't
+    search the candidate list
     """
 
     @staticmethod
     def _transfer_votes(
-            win_or_lose, transferer, hopefuls, voters, seat, quota
+            win_or_lose,
+            transferer,
+            hopefuls,
+            hopeful_ids,
+            candidates,
+            voters,
+            seat,
+            quota
     ):
         """
         transfer votes from either a vinning candidate or an excluded one,
@@ -132,44 +134,40 @@ class SingleTransferrableVote:
         if win_or_lose:
             # winner
             total_transferrable_votes = surplus_votes
+            transfer_seat = seat + 1
         else:
             total_transferrable_votes = sum(transferer.votes)
+            transfer_seat = seat
 
         # get next highest valid preference of whoever voted for this guy
         receipients = {}
 
         for voter in voters:
             # did you vote for this guy
-            if transferer.id in voter.votes:
-                # if so, who is your next choice that hasn't
-                # been elected or removed
-                p = voter.votes.index(transferer.id) + 1
-                while True:
-                    try:
-                        next_preference = (voter.votes[p])
-                        if next_preference in [h.id for h in hopefuls]:
-                            receipients.setdefault(next_preference, 0)
-                            receipients[next_preference] += 1
-                            break
-                        else:
-                            p += 1
-                    except IndexError:
-                        break
+            position = voter.positions.get(transferer.id)
+            if position is None:
+                continue
+
+            # if so, who is your next choice that hasn't
+            # been elected or removed
+            for next_preference in itertools.islice(
+                    voter.votes, position + 1, None
+            ):
+                if next_preference in hopeful_ids:
+                    receipients.setdefault(next_preference, 0)
+                    receipients[next_preference] += 1
+                    break
 
         if receipients:
             # if there is some, split transferer's votes between them
             total_preferences = sum(receipients.itervalues())
 
-            for candidate in hopefuls:
-                if candidate.id in receipients.iterkeys():
-                    ratio = (
-                        float(receipients[candidate.id]) / total_preferences
-                    )
-                    votes_transferred = int(total_transferrable_votes * ratio)
-                    if win_or_lose:
-                        candidate.add_transfer(votes_transferred, seat + 1)
-                    else:
-                        candidate.add_transfer(votes_transferred, seat)
+            for candidate_id, preferences in receipients.iteritems():
+                ratio = float(preferences) / total_preferences
+                votes_transferred = int(total_transferrable_votes * ratio)
+                candidates[candidate_id].add_transfer(
+                    votes_transferred, transfer_seat
+                )
         else:
             # if not, split transferer's vote between all hopefuls
             total_candidates = len(hopefuls)
@@ -178,17 +176,44 @@ class SingleTransferrableVote:
             )
 
             for candidate in hopefuls:
-                if win_or_lose:
-                    candidate.add_transfer(votes_transferred, seat + 1)
-                else:
-                    candidate.add_transfer(votes_transferred, seat)
+                candidate.add_transfer(votes_transferred, transfer_seat)
 
         return hopefuls
 
+    @staticmethod
+    def _remove_blacklisted(round_results, blacklist):
+        """
+        add any action with a score of -1 to the blacklist, then remove
+        every blacklisted action from every plugin's results
+        """
+        for plugin_name, plugin_data in round_results.items():
+            for action in plugin_data.get('results', []):
+                if action.score == -1:
+                    LOGGER.info("Adding to blacklist {}".format(action))
+                    blacklist.append(action)
+
+        blacklisted = set([action.key() for action in blacklist])
+        if not blacklisted:
+            return
+
+        for plugin_name, plugin_data in round_results.items():
+            results = plugin_data.get('results', [])
+            valid_results = []
+            for action in results:
+                if action.key() in blacklisted:
+                    LOGGER.info(
+                        "Removing blacklisted action {}".format(action)
+                    )
+                else:
+                    valid_results.append(action)
+            results[:] = valid_results
+
     @staticmethod
     def tally(round_results, blacklist):
         """tally up the votes"""
+        candidates = {}
         hopefuls = []
+        hopeful_ids = set()
         all_voters = []
         winners = []
         excluded = []
@@ -200,22 +225,7 @@ class SingleTransferrableVote:
             [plugin['weight'] for key, plugin in round_results.items()]
         )
 
-        # find any action with a score of -1 and add to blacklist
-        for plugin_name, plugin_data in round_results.items():
-            for action in plugin_data.get('results', []):
-                if action.score == -1:
-                    LOGGER.info("Adding to blacklist {}".format(action))
-                    blacklist.append(action)
-
-        # and remove it from all lists
-        for plugin_name, plugin_data in round_results.items():
-            results_copy = list(plugin_data.get('results', []))
-            for action in results_copy:
-                if action in blacklist:
-                    LOGGER.info(
-                        "Removing blacklisted action {}".format(action)
-                    )
-                    round_results[plugin_name]['results'].remove(action)
+        SingleTransferrableVote._remove_blacklisted(round_results, blacklist)
 
         LOGGER.info("Valid Round results: {}". format(round_results))
         # now actually go through results
@@ -223,20 +233,27 @@ class SingleTransferrableVote:
             voter = Voter(plugin_name)
             all_voters.append(voter)
 
-            # remove duplicate actions from plugin
-            results = list(set(plugin_results['results']))
+            # remove duplicate actions from plugin, keeping its order
+            results = []
+            seen = set()
+            for action in plugin_results['results']:
+                if action not in seen:
+                    seen.add(action)
+                    results.append(action)
 
             # normalise plugin weight
             weight = float(plugin_results['weight']) / total_plugin_weight
 
             for preference, action in enumerate(results):
                 votes = int((action.score * 1000) * weight)
-                candidate = Candidate(action)
+                candidate_id = hash(action)
+                candidate = candidates.get(candidate_id)
 
-                if candidate not in hopefuls:
+                if candidate is None:
+                    candidate = Candidate(action)
+                    candidates[candidate_id] = candidate
                     hopefuls.append(candidate)
-                else:
-                    candidate = hopefuls[hopefuls.index(candidate)]
+                    hopeful_ids.add(candidate_id)
 
                 candidate.add_votes(plugin_name, votes, preference)
                 voter.vote(preference, candidate.id)
@@ -258,46 +275,46 @@ class SingleTransferrableVote:
         for seat in xrange(seats_to_fill):
             winner = False
             while not winner and len(hopefuls) > 1:
-                LOGGER.info("Tallying for seat {}".format(seat + 1))
+                LOGGER.debug("Tallying for seat {}".format(seat + 1))
 
-                # sort by score
+                # sort by score. the sort is stable, so ties stay in the
+                # order candidates were first proposed
                 hopefuls.sort(
                     key=lambda candidate: candidate.votes[seat], reverse=True
                 )
 
-                # everyone with more X PREFERENCE votes than quota gets in
-                removed_candidate = None
-                for candidate in hopefuls:
-                    if candidate.votes[seat] >= quota:
-                        # add winner to final list
-                        winners.append(candidate)
-                        hopefuls.remove(candidate)
-                        removed_candidate = candidate
-                        winner = True
-                        break  # we found a winner, exit loop
-
-                if winner:
-                    hopefuls = SingleTransferrableVote._transfer_votes(
+                # the top candidate gets in if they've reached the quota
+                if hopefuls[0].votes[seat] >= quota:
+                    # add winner to final list
+                    candidate = hopefuls.pop(0)
+                    hopeful_ids.discard(candidate.id)
+                    winners.append(candidate)
+                    winner = True
+                    SingleTransferrableVote._transfer_votes(
                         True,
-                        removed_candidate,
+                        candidate,
                         hopefuls,
+                        hopeful_ids,
+                        candidates,
                         all_voters,
                         seat,
                         quota
                     )
                     LOGGER.info(
-                        "Candidate {} won the seat".format(removed_candidate)
+                        "Candidate {} won the seat".format(candidate)
                     )
                 else:
                     # if nobody reaches the quota, remove the lowest and
                     # transfer their votes to the top
-                    candidate = hopefuls[-1]
-                    hopefuls.remove(candidate)
+                    candidate = hopefuls.pop()
+                    hopeful_ids.discard(candidate.id)
                     excluded.append(candidate)
-                    hopefuls = SingleTransferrableVote._transfer_votes(
+                    SingleTransferrableVote._transfer_votes(
                         False,
                         candidate,
                         hopefuls,
+                        hopeful_ids,
+                        candidates,
                         all_voters,
                         seat,
                         quota=0
@@ -313,7 +330,7 @@ class SingleTransferrableVote:
         for i, val in enumerate(excluded):
             excluded[i].action.votes = val.votes[0]
 
-		# add winners
+        # add winners
         final_list = [winner.action for winner in winners]
         # add remaining hopefuls
         final_list += [hopeful.action for hopeful in hopefuls]
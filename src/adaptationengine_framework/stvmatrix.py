@@ -0,0 +1,263 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+import logging
+
+import numpy
+
+import adaptationengine_framework.stv as stv
+
+LOGGER = logging.getLogger('syslog')
+
+
+class VoteMatrix:
+    """
+    Every plugin's preferences as arrays
+
+    preferences[voter, rank] is the index of the candidate the voter put at
+    that rank (-1 past the end of its list) and votes[voter, rank] is the
+    votes it gave them there. position[voter, candidate] is the rank the
+    voter gave a candidate, or -1 if it didn't vote for them
+    """
+
+    def __init__(self, round_results):
+        """Index the candidates and fill in the arrays"""
+        self.actions = []
+        candidate_index = {}
+        ballots = []
+
+        total_plugin_weight = sum(
+            [plugin['weight'] for key, plugin in round_results.items()]
+        )
+
+        for plugin_name, plugin_results in round_results.items():
+            # normalise plugin weight
+            weight = float(plugin_results['weight']) / total_plugin_weight
+
+            ballot = []
+            seen = set()
+            chosen = set()
+            for action in plugin_results['results']:
+                if action in seen:
+                    continue
+                seen.add(action)
+
+                candidate_id = hash(action)
+                index = candidate_index.get(candidate_id)
+                if index is None:
+                    index = len(self.actions)
+                    candidate_index[candidate_id] = index
+                    self.actions.append(action)
+                elif index in chosen:
+                    # a voter can only vote for a candidate once
+                    continue
+
+                chosen.add(index)
+                ballot.append((index, int((action.score * 1000) * weight)))
+            ballots.append(ballot)
+
+        voters = len(ballots)
+        ranks = max([len(ballot) for ballot in ballots] or [0])
+        self.candidates = len(self.actions)
+
+        self.preferences = numpy.full((voters, ranks), -1, dtype=numpy.int64)
+        self.votes = numpy.zeros((voters, ranks), dtype=numpy.float64)
+        self.position = numpy.full(
+            (voters, self.candidates), -1, dtype=numpy.int64
+        )
+        for voter, ballot in enumerate(ballots):
+            if not ballot:
+                continue
+            (choices, votes) = zip(*ballot)
+            self.preferences[voter, :len(ballot)] = choices
+            self.votes[voter, :len(ballot)] = votes
+            self.position[voter, list(choices)] = numpy.arange(len(ballot))
+
+    def rank_votes(self, rank):
+        """Return the votes every candidate got at a rank"""
+        if rank >= self.preferences.shape[1]:
+            return numpy.zeros(self.candidates)
+
+        choices = self.preferences[:, rank]
+        voted = choices >= 0
+        return numpy.bincount(
+            choices[voted],
+            weights=self.votes[voted, rank],
+            minlength=self.candidates
+        )
+
+    def total_votes(self):
+        """Return the votes every candidate got over all ranks"""
+        voted = self.preferences >= 0
+        return numpy.bincount(
+            self.preferences[voted],
+            weights=self.votes[voted],
+            minlength=self.candidates
+        )
+
+
+class MatrixSingleTransferrableVote:
+    """
+    The same STV tally as stv.SingleTransferrableVote, on numpy arrays
+
+    Only the current seat's votes, the next seat's transfers and each
+    candidate's total are held, so memory grows with candidates rather
+    than candidates squared. Quota checks, exclusions and surplus transfers
+    are array operations, which pays off once plugins expand actions into
+    thousands of candidates
+    """
+
+    @staticmethod
+    def _transfer_votes(
+            matrix, transferer, amount, hopeful, order, target, totals
+    ):
+        """
+        split `amount` votes from a winning or excluded candidate into
+        `target` (the votes for the seat they go to), in ratio of the next
+        preferences still in the running of the voters who voted for them
+        """
+        voters = numpy.nonzero(matrix.position[:, transferer] >= 0)[0]
+        next_choices = numpy.empty(0, dtype=numpy.int64)
+
+        if voters.size:
+            ranks = numpy.arange(matrix.preferences.shape[1])
+            later = ranks > matrix.position[voters, transferer][:, None]
+            still_hopeful = later & hopeful[voters]
+            has_next = still_hopeful.any(axis=1)
+            next_rank = still_hopeful.argmax(axis=1)
+            next_choices = matrix.preferences[
+                voters[has_next], next_rank[has_next]
+            ]
+
+        if next_choices.size:
+            # split transferer's votes between their voters' next choices
+            (receipients, preferences) = numpy.unique(
+                next_choices, return_counts=True
+            )
+            ratio = preferences.astype(numpy.float64) / next_choices.size
+            transferred = numpy.trunc(amount * ratio)
+            target[receipients] += transferred
+            totals[receipients] += transferred
+        else:
+            # if not, split transferer's vote between all hopefuls
+            transferred = int(amount) / len(order)
+            target[order] += transferred
+            totals[order] += transferred
+
+    @staticmethod
+    def _remove(matrix, candidate, hopeful):
+        """take a candidate out of the running"""
+        voters = numpy.nonzero(matrix.position[:, candidate] >= 0)[0]
+        hopeful[voters, matrix.position[voters, candidate]] = False
+
+    @staticmethod
+    def tally(round_results, blacklist):
+        """tally up the votes"""
+        stv.SingleTransferrableVote._remove_blacklisted(
+            round_results, blacklist
+        )
+        LOGGER.info("Valid Round results: {}". format(round_results))
+
+        matrix = VoteMatrix(round_results)
+        seats_to_fill = matrix.candidates
+
+        # whether each ballot entry is still in the running
+        hopeful = matrix.preferences >= 0
+        # hopefuls in the order the object engine keeps them, for ties
+        order = numpy.arange(seats_to_fill)
+        totals = matrix.total_votes()
+        current = matrix.rank_votes(0)
+        transfers = numpy.zeros(seats_to_fill)
+        first_seat = current
+        winners = []
+        excluded = []
+
+        # calculate quota (droop) (total votes / seats + 1) + 1
+        total_number_of_votes = int(matrix.votes.sum())
+        quota = (total_number_of_votes / (seats_to_fill + 1)) + 1
+
+        # tally
+        LOGGER.info("Voting quota: {}".format(quota))
+        for seat in xrange(seats_to_fill):
+            if len(order) <= 1:
+                break
+
+            if seat > 0:
+                current = transfers + matrix.rank_votes(seat)
+                transfers = numpy.zeros(seats_to_fill)
+
+            winner = False
+            while not winner and len(order) > 1:
+                # stable sort by score, so ties keep their order
+                order = order[
+                    numpy.argsort(-current[order], kind='mergesort')
+                ]
+
+                if current[order[0]] >= quota:
+                    # the top candidate reached the quota and gets in
+                    candidate = order[0]
+                    order = order[1:]
+                    MatrixSingleTransferrableVote._remove(
+                        matrix, candidate, hopeful
+                    )
+                    winners.append(candidate)
+                    winner = True
+                    MatrixSingleTransferrableVote._transfer_votes(
+                        matrix,
+                        candidate,
+                        current[candidate] - quota,
+                        hopeful,
+                        order,
+                        transfers,
+                        totals
+                    )
+                else:
+                    # if nobody reaches the quota, remove the lowest and
+                    # transfer their votes to the top
+                    candidate = order[-1]
+                    order = order[:-1]
+                    MatrixSingleTransferrableVote._remove(
+                        matrix, candidate, hopeful
+                    )
+                    excluded.append(candidate)
+                    MatrixSingleTransferrableVote._transfer_votes(
+                        matrix,
+                        candidate,
+                        totals[candidate],
+                        hopeful,
+                        order,
+                        current,
+                        totals
+                    )
+
+            if seat == 0:
+                first_seat = current
+
+        LOGGER.info(
+            "{} candidates: {} won, {} excluded".format(
+                seats_to_fill, len(winners), len(excluded)
+            )
+        )
+
+        # put the vote value in place of score for the final output
+        excluded.reverse()
+        final_list = []
+        for candidate in winners + list(order) + excluded:
+            action = matrix.actions[candidate]
+            action.votes = int(first_seat[candidate])
+            final_list.append(action)
+
+        # return results and new blacklist
+        return (final_list, blacklist)
@@ -104,6 +104,9 @@ def load_config(configfile, clear_db_config):
         cfg.database__collection_config = yml_database['collections']['config']
         cfg.database__collection_log = yml_database['collections']['log']
         cfg.database__collection_stack = yml_database['collections']['stack']
+        cfg.database__collection_stack_tenant = yml_database[
+            'collections'
+        ].get('stack_tenant', 'stack_tenant')
 
         # message queue config
         yml_mq = yaml_config['adaptation_engine']['mq_broker']
@@ -114,6 +117,7 @@ def load_config(configfile, clear_db_config):
         cfg.mq__outbound = yml_mq['routing_key']['outbound']
         cfg.mq__username = yml_mq['username']
         cfg.mq__password = yml_mq['password']
+        cfg.mq__wire_format = yml_mq.get('wire_format', 'json')
 
         # plugin config
         yml_plugin = yaml_config['adaptation_engine']['plugins']
@@ -124,6 +128,84 @@ def load_config(configfile, clear_db_config):
         cfg.plugin__grouping = yml_plugin.get('grouping', [])
         cfg.plugin__default_weighting = yml_plugin.get('default_weighting', 1)
         cfg.plugin__weightings = yml_plugin.get('weightings', [])
+        cfg.plugin__jvm_startup = yml_plugin.get('jvm_startup', 'background')
+        cfg.plugin__batch_window = yml_plugin.get('batch_window')
+        cfg.plugin__workers = yml_plugin.get('workers', 16)
+        cfg.plugin__default_concurrency = yml_plugin.get(
+            'default_concurrency', 4
+        )
+        cfg.plugin__concurrency = yml_plugin.get('concurrency', [])
+        cfg.plugin__routing = yml_plugin.get('routing', [])
+        cfg.plugin__wire_format = yml_plugin.get('wire_format', 'objects')
+        yml_timeout = yml_plugin.get('adaptive_timeout', {})
+        cfg.plugin__adaptive_timeout = yml_timeout.get('enabled', True)
+        cfg.plugin__timeout_percentile = yml_timeout.get('percentile', 99)
+        cfg.plugin__timeout_headroom = yml_timeout.get('headroom', 0.5)
+        cfg.plugin__timeout_floor = yml_timeout.get('floor', 1)
+        cfg.plugin__timeout_ceiling = yml_timeout.get(
+            'ceiling', cfg.plugin__timeout
+        )
+        cfg.plugin__timeout_window = yml_timeout.get('window', 200)
+        cfg.plugin__timeout_min_samples = yml_timeout.get('min_samples', 20)
+        yml_breaker = yml_plugin.get('circuit_breaker', {})
+        cfg.plugin__circuit_breaker = yml_breaker.get('enabled', True)
+        cfg.plugin__breaker_failure_rate = yml_breaker.get('failure_rate', 0.5)
+        cfg.plugin__breaker_window = yml_breaker.get('window', 20)
+        cfg.plugin__breaker_min_calls = yml_breaker.get('min_calls', 5)
+        cfg.plugin__breaker_open_seconds = yml_breaker.get('open_seconds', 60)
+
+        # consolidation config
+        yml_consolidation = yaml_config['adaptation_engine'].get(
+            'consolidation', {}
+        )
+        cfg.consolidation__stv_engine = yml_consolidation.get(
+            'stv_engine', 'objects'
+        )
+        cfg.consolidation__strategy = yml_consolidation.get('strategy', 'stv')
+        cfg.consolidation__event_strategies = (
+            yml_consolidation.get('event_strategies') or []
+        )
+        cfg.consolidation__blacklist_ttl = yml_consolidation.get(
+            'blacklist_ttl', 3600
+        )
+        cfg.consolidation__memo_size = yml_consolidation.get('memo_size', 128)
+
+        # enactment config
+        yml_enactment = yaml_config['adaptation_engine'].get('enactment', {})
+        yml_poller = yml_enactment.get('poller', {})
+        cfg.enactment__poller = yml_poller.get('enabled', True)
+        cfg.enactment__poll_min_interval = yml_poller.get('min_interval', 2)
+        cfg.enactment__poll_max_interval = yml_poller.get('max_interval', 30)
+        cfg.enactment__poll_timeout = yml_poller.get('timeout', 400)
+        # notifications come from the event broker unless told otherwise
+        yml_notify = yml_enactment.get('notifications', {})
+        yml_event = yaml_config['adaptation_engine']['event']
+        cfg.enactment__notifications = yml_notify.get('enabled', False)
+        cfg.enactment__notifications_host = yml_notify.get(
+            'host', yml_event['host']
+        )
+        cfg.enactment__notifications_port = yml_notify.get(
+            'port', yml_event['port']
+        )
+        cfg.enactment__notifications_username = yml_notify.get(
+            'username', yml_event['username']
+        )
+        cfg.enactment__notifications_password = yml_notify.get(
+            'password', yml_event['password']
+        )
+        cfg.enactment__notifications_exchange = yml_notify.get(
+            'exchange', 'openstack'
+        )
+        cfg.enactment__notifications_key = yml_notify.get(
+            'key', 'notifications.*'
+        )
+        cfg.enactment__notifications_silence = yml_notify.get('silence', 60)
+
+        yml_scheduler = yml_enactment.get('scheduler', {})
+        cfg.enactment__scheduler = yml_scheduler.get('enabled', True)
+        cfg.enactment__max_concurrent = yml_scheduler.get('max_concurrent', 8)
+        cfg.enactment__per_hypervisor = yml_scheduler.get('per_hypervisor', 2)
+        cfg.enactment__per_tenant = yml_scheduler.get('per_tenant', 4)
 
         # heat resource config
         yml_heat = yaml_config['adaptation_engine']['heat_resource']
@@ -140,6 +222,9 @@ def load_config(configfile, clear_db_config):
         cfg.openstack__username = yml_opstk['username']
         cfg.openstack__password = yml_opstk['password']
         cfg.openstack__tenant = yml_opstk['tenant']
+        cfg.openstack__inventory_refresh = yml_opstk.get(
+            'inventory_refresh', 300
+        )
 
         # event message queue config
         yml_event = yaml_config['adaptation_engine']['event']
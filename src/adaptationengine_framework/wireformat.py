@@ -0,0 +1,314 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Compact binary encoding of events and adaptation action lists
+
+A message is a header (magic, version, kind), a string table, then the
+body. Every text value in the body is a 4-byte index into the string
+table, so ids repeated across many actions (targets, hypervisors, stack
+ids) are sent once. Values that aren't text (an event's value, data and
+machines, a scale value that is a number) go in the table as JSON.
+Fields are only ever added at the end of a record with a new version, so
+older messages keep decoding
+"""
+import copy
+import json
+import logging
+import struct
+import time
+import uuid
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.event as event
+
+
+LOGGER = logging.getLogger('syslog')
+
+MAGIC = 'AEWF'
+VERSION = 2
+CONTENT_TYPE = 'application/x-adaptation-engine-wire; version=2'
+
+KIND_EVENT = 1
+KIND_ACTIONS = 2
+
+_HEADER = struct.Struct('!4sBB')
+_COUNT = struct.Struct('!I')
+_ENTRY = struct.Struct('!cI')
+_ACTION = struct.Struct('!B5IdqH')
+_NONE = 0xFFFFFFFF
+
+_TEXT = 't'
+_JSON = 'j'
+
+EVENT_FIELDS = (
+    'user_id', 'tenant_id', 'stack_id', 'source', 'instance_id', 'context',
+    'data_center', 'severity', 'name', 'machines', 'value', 'data',
+    'timestamp',
+)
+# how many of the event fields each version sends
+_EVENT_FIELD_COUNTS = {1: 12, 2: 13}
+
+
+def is_binary(message):
+    """Return True if a message is in this format rather than JSON"""
+    return isinstance(message, str) and message.startswith(MAGIC)
+
+
+class StringTable:
+    """The distinct values in a message, each sent once"""
+
+    def __init__(self):
+        """Start with an empty table"""
+        self.entries = []
+        self._text = {}
+        self._json = {}
+
+    def ref(self, value):
+        """Return the table index for a value, adding it if it's new"""
+        if value is None:
+            return _NONE
+
+        if isinstance(value, basestring):
+            (tag, index_of) = (_TEXT, self._text)
+        else:
+            (tag, index_of) = (_JSON, self._json)
+            value = json.dumps(value, separators=(',', ':'))
+
+        index = index_of.get(value)
+        if index is None:
+            index = len(self.entries)
+            index_of[value] = index
+            self.entries.append((tag, value))
+        return index
+
+    def pack(self):
+        """Return the table as bytes"""
+        chunks = [_COUNT.pack(len(self.entries))]
+        for (tag, value) in self.entries:
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            chunks.append(_ENTRY.pack(tag, len(value)))
+            chunks.append(value)
+        return ''.join(chunks)
+
+    @staticmethod
+    def unpack(data, offset):
+        """Return (values, offset after the table) read from data"""
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        values = []
+        for _ in xrange(count):
+            (tag, length) = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            text = data[offset:offset + length].decode('utf-8')
+            offset += length
+            if tag == _TEXT:
+                values.append(text)
+            elif tag == _JSON:
+                values.append(json.loads(text))
+            else:
+                raise ValueError("unknown string table entry [{}]".format(tag))
+        return (values, offset)
+
+
+def _lookup(values, index):
+    """Return the value at a table index"""
+    if index == _NONE:
+        return None
+    return values[index]
+
+
+def _encode(kind, table, body):
+    """Return a whole message from its kind, string table and body"""
+    return _HEADER.pack(MAGIC, VERSION, kind) + table.pack() + ''.join(body)
+
+
+def _version(data):
+    """Return the version in a message's header"""
+    return _HEADER.unpack_from(data, 0)[1]
+
+
+def _decode(data, kind):
+    """
+    Check a message's header and return (string table values, offset of
+    the body)
+    """
+    if not is_binary(data) or len(data) < _HEADER.size:
+        raise ValueError('not a binary message')
+
+    (_, version, message_kind) = _HEADER.unpack_from(data, 0)
+    if version > VERSION:
+        raise ValueError('unsupported message version [{}]'.format(version))
+    if message_kind != kind:
+        raise ValueError('unexpected message kind [{}]'.format(message_kind))
+
+    return StringTable.unpack(data, _HEADER.size)
+
+
+def _numbers(action):
+    """
+    Return an action's score and votes as a float and an int, or raise
+    ValueError if they can't be sent as those without changing them
+    """
+    try:
+        score = float(action.score)
+        votes = int(action.votes)
+    except (TypeError, ValueError):
+        score = votes = None
+    if score != action.score or votes != action.votes:
+        raise ValueError(
+            "score [{!r}] and votes [{!r}] of {} aren't numbers".format(
+                action.score, action.votes, action
+            )
+        )
+    return (score, votes)
+
+
+def _pack_actions(actions, table, body):
+    """Add actions to a message body, sub-actions after their parent"""
+    (pack, ref) = (_ACTION.pack, table.ref)
+    for action in actions:
+        (score, votes) = _numbers(action)
+        try:
+            record = pack(
+                action.adaptation_type,
+                ref(action.target),
+                ref(action.destination),
+                ref(action.scale_value),
+                ref(action.target_app),
+                ref(action.candidate),
+                score,
+                votes,
+                len(action.actions),
+            )
+        except struct.error, err:
+            raise ValueError(
+                "can't encode {} [{}]".format(action, err)
+            )
+        body.append(record)
+        if action.actions:
+            _pack_actions(action.actions, table, body)
+
+
+def _unpack_actions(data, offset, count, values):
+    """Return (actions, offset after them) read from a message body"""
+    actions = []
+    for _ in xrange(count):
+        (
+            adaptation_type, target, destination, scale_value, target_app,
+            candidate, score, votes, sub_actions
+        ) = _ACTION.unpack_from(data, offset)
+        offset += _ACTION.size
+        (children, offset) = _unpack_actions(data, offset, sub_actions, values)
+        actions.append(
+            adaptationaction.AdaptationAction(
+                adaptation_type,
+                target=_lookup(values, target),
+                destination=_lookup(values, destination),
+                scale_value=_lookup(values, scale_value),
+                actions=children,
+                target_app=_lookup(values, target_app),
+                score=score,
+                votes=votes,
+                candidate=_lookup(values, candidate),
+            )
+        )
+    return (actions, offset)
+
+
+def encode_actions(actions):
+    """
+    Return a list of adaptation actions as a binary message. Raises
+    ValueError if an action can't be encoded, e.g. its score isn't a
+    number
+    """
+    table = StringTable()
+    body = [_COUNT.pack(len(actions))]
+    _pack_actions(actions, table, body)
+    return _encode(KIND_ACTIONS, table, body)
+
+
+def decode_actions(data):
+    """Return the list of adaptation actions in a binary message"""
+    (values, offset) = _decode(data, KIND_ACTIONS)
+    (count,) = _COUNT.unpack_from(data, offset)
+    (actions, _) = _unpack_actions(
+        data, offset + _COUNT.size, count, values
+    )
+    return actions
+
+
+def decode_results(round_results):
+    """
+    Return a plain copy of round results with any plugin's binary results
+    decoded into adaptation actions. Reads a Manager dict only once
+    """
+    decoded = {}
+    for (plugin_name, plugin_data) in round_results.items():
+        results = plugin_data.get('results')
+        if is_binary(results):
+            plugin_data = dict(plugin_data, results=decode_actions(results))
+        decoded[plugin_name] = plugin_data
+    return decoded
+
+
+def encode_event(cw_event):
+    """Return an event as a binary message"""
+    table = StringTable()
+    body = [
+        struct.pack(
+            '!{}I'.format(len(EVENT_FIELDS)),
+            *[
+                table.ref(getattr(cw_event, field, None))
+                for field in EVENT_FIELDS
+            ]
+        )
+    ]
+    return _encode(KIND_EVENT, table, body)
+
+
+def decode_event(data):
+    """Return the event in a binary message"""
+    if len(data) > 8388608:  # 8MB, as for JSON events
+        raise ValueError('message too large')
+
+    (values, offset) = _decode(data, KIND_EVENT)
+    count = _EVENT_FIELD_COUNTS.get(_version(data))
+    if count is None:
+        raise ValueError('unsupported message version')
+    fields = EVENT_FIELDS[:count]
+    refs = struct.unpack_from('!{}I'.format(len(fields)), data, offset)
+
+    cw_event = event.Event()
+    for field, index in zip(fields, refs):
+        setattr(cw_event, field, _lookup(values, index))
+
+    if cw_event.stack_id is None or cw_event.name is None:
+        raise ValueError('unsupported message')
+    return cw_event
+
+
+def encode_adaptation_request(adaptation_event, name=None, stack_id=None):
+    """
+    Return the binary equivalent of
+    AdaptationAction.generate_adaptation_request
+    """
+    request = copy.copy(adaptation_event)
+    request.timestamp = time.time()
+    request.instance_id = uuid.uuid4().hex
+    request.context = 'adaptation request'
+    request.name = name or adaptation_event.name
+    request.stack_id = stack_id or adaptation_event.stack_id
+    return encode_event(request)
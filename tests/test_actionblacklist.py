@@ -0,0 +1,92 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.actionblacklist as actionblacklist
+import adaptationengine_framework.adaptationaction as adaptationaction
+
+
+def make_action(target, score=0):
+    """Return a migration of a target"""
+    action = adaptationaction.AdaptationAction('MigrateAction')
+    action.target = target
+    action.score = score
+    return action
+
+
+class TestActionBlacklist(unittest.TestCase):
+    """Test cases for the per-stack action blacklist"""
+
+    def setUp(self):
+        """Create patchers and a blacklist"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.actionblacklist.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.blacklist = actionblacklist.ActionBlacklist(ttl=60)
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__get(self):
+        """Actions are kept per stack"""
+        self.blacklist.add('stack1', [make_action('vm1', -1)], now=0)
+
+        assert [
+            action.target for action in self.blacklist.get('stack1', now=1)
+        ] == ['vm1']
+        assert self.blacklist.get('stack2', now=1) == []
+
+    def test__get__expired(self):
+        """Actions are forgotten after the ttl, unless vetoed again"""
+        self.blacklist.add('stack1', [make_action('vm1', -1)], now=0)
+        self.blacklist.add('stack1', [make_action('vm2', -1)], now=0)
+        self.blacklist.add('stack1', [make_action('vm2', -1)], now=30)
+
+        assert [
+            action.target for action in self.blacklist.get('stack1', now=60)
+        ] == ['vm2']
+        assert self.blacklist.get('stack1', now=90) == []
+        assert self.blacklist.stats()['stacks'] == {}
+
+    def test__prune(self):
+        """Blacklisted actions match whatever their score"""
+        self.blacklist.add('stack1', [make_action('vm1', -1)], now=0)
+
+        (allowed, vetoed) = self.blacklist.prune(
+            'stack1', [make_action('vm1', 0.9), make_action('vm2')], now=1
+        )
+
+        assert [action.target for action in allowed] == ['vm2']
+        assert [action.target for action in vetoed] == ['vm1']
+
+    def test__add__no_ttl(self):
+        """A ttl of 0 keeps nothing between decisions"""
+        blacklist = actionblacklist.ActionBlacklist(ttl=0)
+        blacklist.add('stack1', [make_action('vm1', -1)])
+
+        assert blacklist.get('stack1') == []
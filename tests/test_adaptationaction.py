@@ -17,6 +17,7 @@ limitations under the License.
 # pylint: disable=unused-argument, no-self-use
 
 import json
+import pickle
 import unittest
 import sys
 
@@ -81,6 +82,18 @@ class TestAdaptationType(unittest.TestCase):
         with self.assertRaises(LookupError):
             adaptationaction.AdaptationType.get_string(200)
 
+    def test__get_type(self):
+        """Tests looking up a type from an int or any-case name"""
+        get_type = adaptationaction.AdaptationType.get_type
+
+        assert get_type(2) == 2
+        assert get_type('migrateACTION') == 0
+        assert get_type(u'LowPowerAction') == 8
+        with self.assertRaises(LookupError):
+            get_type(-1)
+        with self.assertRaises(LookupError):
+            get_type('FakeAction')
+
 
 class TestAdaptationAction(unittest.TestCase):
     """Test cases for the adaptation action class"""
@@ -219,6 +232,97 @@ class TestAdaptationAction(unittest.TestCase):
         assert hash1 == hash2
         assert hash1 != hash3
 
+    def test__key(self):
+        """Keys ignore score and votes, but not what the action does"""
+        test1 = adaptationaction.AdaptationAction(0)
+        test1.target = "target"
+        test1.destination = "dest"
+        test1.score = 3
+        test1.votes = 300
+
+        test2 = adaptationaction.AdaptationAction(0)
+        test2.target = "target"
+        test2.destination = "dest"
+        test2.score = -1
+
+        assert test1.key() == test2.key()
+
+        test2.destination = "otherdest"
+        assert test1.key() != test2.key()
+
+    def test__hash__overlay(self):
+        """Score and votes don't change the hash, core attributes do"""
+        test = adaptationaction.AdaptationAction(0, target="target")
+        first = hash(test)
+
+        test.score = 0.7
+        test.votes = 700
+        assert hash(test) == first
+
+        test.destination = "dest"
+        assert hash(test) != first
+        assert test == adaptationaction.AdaptationAction(
+            0, target="target", destination="dest", votes=3
+        )
+
+    def test__key__sub_actions(self):
+        """Sub-actions changed in place still change the key and hash"""
+        test = adaptationaction.AdaptationAction(0, target="target")
+        first = (test.key(), hash(test))
+
+        test.actions.append(adaptationaction.AdaptationAction(1))
+
+        assert (test.key(), hash(test)) != first
+        assert test == adaptationaction.AdaptationAction(
+            0, target="target", actions=[adaptationaction.AdaptationAction(1)]
+        )
+
+    def test__attributes(self):
+        """Every attribute is given, sub-actions included"""
+        test = adaptationaction.AdaptationAction(
+            4,
+            target="target",
+            actions=[adaptationaction.AdaptationAction(1, target="sub")],
+            target_app="app",
+            score=3
+        )
+
+        result = json.loads(json.dumps(test.attributes()))
+
+        assert result['adaptation_type'] == 4
+        assert result['target_app'] == "app"
+        assert result['score'] == 3
+        assert result['actions'][0]['adaptation_type'] == 1
+        assert result['actions'][0]['target'] == "sub"
+        assert result['actions'][0]['actions'] == []
+
+    def test__replace(self):
+        """Replacing attributes gives a changed copy"""
+        test = adaptationaction.AdaptationAction(0, target="target", score=3)
+        hash(test)
+
+        changed = test.replace(score=0)
+        moved = test.replace(destination="dest")
+
+        assert test.score == 3
+        assert changed.score == 0
+        assert changed == test
+        assert moved != test
+        assert test.destination == ""
+
+    def test__pickle(self):
+        """Actions survive pickling, as they do going through a Manager"""
+        test = adaptationaction.AdaptationAction(
+            0, target="target", score=0.5, votes=10
+        )
+
+        for protocol in (0, pickle.HIGHEST_PROTOCOL):
+            copied = pickle.loads(pickle.dumps(test, protocol))
+
+            assert copied == test
+            assert hash(copied) == hash(test)
+            assert (copied.score, copied.votes) == (0.5, 10)
+
     def test__to_dict(self):
         """Test conversion to a limited dictionary"""
         expected = {
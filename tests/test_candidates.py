@@ -0,0 +1,252 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.candidates as candidates
+
+
+def make_nova_client():
+    """Fake a nova client with three hypervisors and two vms"""
+    nova_client = mock.Mock()
+    nova_client.hypervisors.list.return_value = [
+        mock.Mock(
+            hypervisor_hostname='host1',
+            vcpus=8, vcpus_used=2, free_ram_mb=4096
+        ),
+        mock.Mock(
+            hypervisor_hostname='host2',
+            vcpus=8, vcpus_used=6, free_ram_mb=1024
+        ),
+        mock.Mock(
+            hypervisor_hostname='host3',
+            vcpus=4, vcpus_used=0, free_ram_mb=8192
+        ),
+    ]
+
+    vm1 = mock.Mock(id='vm1', flavor={'id': 'small'})
+    setattr(vm1, 'OS-EXT-SRV-ATTR:hypervisor_hostname', 'host1')
+    vm2 = mock.Mock(id='vm2', flavor={'id': 'large'})
+    setattr(vm2, 'OS-EXT-SRV-ATTR:hypervisor_hostname', 'host2')
+    nova_client.servers.list.return_value = [vm1, vm2]
+
+    nova_client.flavors.list.return_value = [
+        mock.Mock(id='small', ram=512, vcpus=1),
+        mock.Mock(id='large', ram=2048, vcpus=4),
+    ]
+    return nova_client
+
+
+class TestCandidateFeatures(unittest.TestCase):
+    """Test cases for the candidate feature matrix"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.candidates.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+        self.event = mock.Mock(machines=[{'id': 'vm1'}, {'id': 'vm2'}])
+        self.actions = [
+            adaptationaction.AdaptationAction('MigrateAction')
+        ]
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__build(self):
+        """Every vm gets a row for every hypervisor it isn't on"""
+        nova_client = make_nova_client()
+
+        features = candidates.CandidateFeatures.build(
+            self.event, self.actions, nova_client
+        )
+
+        assert len(features) == 4
+        assert zip(features.targets, features.destinations) == [
+            ('vm1', 'host2'), ('vm1', 'host3'),
+            ('vm2', 'host1'), ('vm2', 'host3'),
+        ]
+        assert list(features.column('free_ram_mb')) == [
+            1024, 8192, 4096, 8192
+        ]
+        assert list(features.column('free_vcpus')) == [2, 4, 6, 4]
+        assert list(features.column('hypervisor_load')) == [
+            0.75, 0.0, 0.25, 0.0
+        ]
+        assert list(features.column('flavor_ram_mb')) == [
+            512, 512, 2048, 2048
+        ]
+        assert list(features.column('flavor_vcpus')) == [1, 1, 4, 4]
+
+        # one listing each, not one call per hypervisor or vm
+        assert nova_client.hypervisors.list.call_count == 1
+        assert nova_client.servers.list.call_count == 1
+        assert nova_client.flavors.list.call_count == 1
+        assert not nova_client.hypervisors.search.called
+
+    def test__build__action_target(self):
+        """A target already set on the allowed action is used instead"""
+        self.actions[0].target = 'vm2'
+
+        features = candidates.CandidateFeatures.build(
+            self.event, self.actions, make_nova_client()
+        )
+
+        assert features.targets == ['vm2', 'vm2']
+
+    def test__build__no_migrate_action(self):
+        """No candidates if migration isn't an allowed action"""
+        nova_client = make_nova_client()
+
+        features = candidates.CandidateFeatures.build(
+            self.event,
+            [adaptationaction.AdaptationAction('NoAction')],
+            nova_client
+        )
+
+        assert len(features) == 0
+        assert features.matrix.shape == (
+            0, len(candidates.CandidateFeatures.COLUMNS)
+        )
+        assert not nova_client.hypervisors.list.called
+
+    def test__best(self):
+        """The best rows come back as scored MigrateActions"""
+        features = candidates.CandidateFeatures.build(
+            self.event, self.actions, make_nova_client()
+        )
+        scores = (
+            features.column('free_ram_mb') - features.column('flavor_ram_mb')
+        )
+
+        best = features.best(scores, count=2)
+
+        assert [(a.target, a.destination) for a in best] == [
+            ('vm1', 'host3'), ('vm2', 'host3')
+        ]
+        assert best[0].score == 7680
+        assert best[0].adaptation_type == (
+            adaptationaction.AdaptationType.MigrateAction
+        )
+
+    def test__exclude(self):
+        """Rows whose actions have excluded keys are dropped"""
+        features = candidates.CandidateFeatures.build(
+            self.event, self.actions, make_nova_client()
+        )
+        vetoed = features.action(0)
+
+        remaining = features.exclude(frozenset([vetoed.key()]))
+
+        assert len(remaining) == len(features) - 1
+        assert remaining.matrix.shape == (len(features) - 1, 5)
+        assert (vetoed.target, vetoed.destination) not in zip(
+            remaining.targets, remaining.destinations
+        )
+        assert features.exclude(frozenset()) is features
+
+
+class TestCandidateProvider(unittest.TestCase):
+    """Test cases for the per-decision candidate provider"""
+
+    @mock.patch('adaptationengine_framework.candidates.LOGGER')
+    def test__get__built_once(self, mock_logger):
+        """Features are only built on the first request"""
+        nova_client = make_nova_client()
+        get_nova_client = mock.Mock(return_value=nova_client)
+        provider = candidates.CandidateProvider(
+            mock.Mock(machines=[{'id': 'vm1'}]),
+            [adaptationaction.AdaptationAction('MigrateAction')],
+            get_nova_client
+        )
+        assert not get_nova_client.called
+
+        first = provider.get()
+        second = provider.get()
+
+        assert first is second
+        assert get_nova_client.call_count == 1
+        assert nova_client.hypervisors.list.call_count == 1
+
+    @mock.patch('adaptationengine_framework.candidates.LOGGER')
+    def test__get__error(self, mock_logger):
+        """An openstack error gives an empty feature set"""
+        provider = candidates.CandidateProvider(
+            mock.Mock(machines=[{'id': 'vm1'}]),
+            [adaptationaction.AdaptationAction('MigrateAction')],
+            mock.Mock(side_effect=Exception("no nova for you"))
+        )
+
+        assert len(provider.get()) == 0
+        assert mock_logger.exception.called
+
+
+class TestSelectDestinations(unittest.TestCase):
+    """Test cases for migration destination selection"""
+
+    def setUp(self):
+        """Fake three hypervisors and a flavor"""
+        self.hypervisors = make_nova_client().hypervisors.list()
+        for hypervisor, running_vms in zip(self.hypervisors, [2, 6, 0]):
+            hypervisor.running_vms = running_vms
+        self.flavor = mock.Mock(ram=2048, vcpus=2)
+
+    def test__select_destinations(self):
+        """Hosts are ranked by spare capacity, leaving out full ones"""
+        destinations = candidates.select_destinations(
+            self.hypervisors, flavor=self.flavor, count=3
+        )
+
+        # host2 doesn't have the RAM
+        assert [host for host, _ in destinations] == ['host3', 'host1']
+        assert destinations[0][1] > destinations[1][1]
+
+    def test__select_destinations__current_host(self):
+        """The host a server is already on is never chosen"""
+        destinations = candidates.select_destinations(
+            self.hypervisors, current_host='host3', count=3
+        )
+
+        assert [host for host, _ in destinations] == [
+            'host1', 'host2'
+        ]
+
+    def test__select_destinations__score(self):
+        """Scoring can be swapped for any vectorised function"""
+        def fewest_vms(hosts, flavor_ram_mb, flavor_vcpus):
+            return -hosts.column('running_vms')
+
+        destinations = candidates.select_destinations(
+            self.hypervisors, score=fewest_vms, count=2
+        )
+
+        assert destinations == [('host3', 0.0), ('host1', -2.0)]
+
+    def test__select_destinations__none(self):
+        """No hypervisors, no destinations"""
+        assert candidates.select_destinations([]) == []
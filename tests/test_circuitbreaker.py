@@ -0,0 +1,125 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.circuitbreaker as circuitbreaker
+
+
+SUCCESS = circuitbreaker.Outcome.SUCCESS
+ERROR = circuitbreaker.Outcome.ERROR
+TIMEOUT = circuitbreaker.Outcome.TIMEOUT
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for a single plugin's circuit breaker"""
+
+    def setUp(self):
+        """Create a breaker that opens at half failures over 4 calls"""
+        self.breaker = circuitbreaker.CircuitBreaker(
+            failure_rate=0.5, window=10, min_calls=4, open_seconds=60
+        )
+
+    def test__stays_closed__too_few_calls(self):
+        """Failures don't count until there are enough calls"""
+        for _ in xrange(3):
+            self.breaker.record(ERROR, now=100)
+
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.CLOSED
+        assert self.breaker.allow(now=100)
+
+    def test__stays_closed__low_failure_rate(self):
+        """Occasional failures don't open the breaker"""
+        for outcome in [SUCCESS, ERROR, SUCCESS, SUCCESS, TIMEOUT, SUCCESS]:
+            self.breaker.record(outcome, now=100)
+
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.CLOSED
+        assert self.breaker.failure_rate() == 2.0 / 6
+
+    def test__opens(self):
+        """Errors and timeouts both count towards opening"""
+        for outcome in [ERROR, SUCCESS, TIMEOUT, SUCCESS]:
+            self.breaker.record(outcome, now=100)
+
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.OPEN
+        assert self.breaker.opened_at == 100
+        assert self.breaker.last_failure == TIMEOUT
+        assert not self.breaker.allow(now=159)
+
+    def _open(self):
+        """Open the breaker at time 100"""
+        for _ in xrange(4):
+            self.breaker.record(ERROR, now=100)
+
+    def test__half_open__one_trial(self):
+        """After the open period exactly one trial call is allowed"""
+        self._open()
+
+        assert self.breaker.allow(now=160)
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.HALF_OPEN
+        assert not self.breaker.allow(now=161)
+
+        # the trial never reported back
+        assert self.breaker.allow(now=220)
+
+    def test__half_open__success_closes(self):
+        """A successful trial closes the breaker with a clean slate"""
+        self._open()
+        self.breaker.allow(now=160)
+
+        self.breaker.record(SUCCESS, now=161)
+
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.CLOSED
+        assert self.breaker.failure_rate() == 0.0
+        assert self.breaker.allow(now=161)
+
+    def test__half_open__failure_reopens(self):
+        """A failed trial opens the breaker for another period"""
+        self._open()
+        self.breaker.allow(now=160)
+
+        self.breaker.record(TIMEOUT, now=170)
+
+        assert self.breaker.state == circuitbreaker.CircuitBreaker.OPEN
+        assert self.breaker.opened_at == 170
+        assert not self.breaker.allow(now=200)
+
+
+class TestPluginCircuitBreakers(unittest.TestCase):
+    """Test cases for the per-plugin breaker registry"""
+
+    @mock.patch('adaptationengine_framework.circuitbreaker.LOGGER')
+    def test__allow(self, mock_logger):
+        """Only the failing plugin is skipped, with a reason"""
+        breakers = circuitbreaker.PluginCircuitBreakers(
+            failure_rate=1, window=2, min_calls=2, open_seconds=60
+        )
+        breakers.record('plugin1', ERROR)
+        breakers.record('plugin1', ERROR)
+
+        (allowed, reason) = breakers.allow('plugin1')
+        assert not allowed
+        assert 'error' in reason
+        assert breakers.allow('plugin2') == (True, None)
+        assert mock_logger.warn.call_count == 1
+
+        stats = breakers.stats()
+        assert stats['plugin1']['state'] == 'open'
+        assert stats['plugin1']['failure_rate'] == 1.0
+        assert stats['plugin2']['state'] == 'closed'
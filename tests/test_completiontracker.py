@@ -0,0 +1,143 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import json
+import sys
+import unittest
+
+import mock
+
+# we don't need any of these installed to test
+# but we do need their importing to not-break-everything
+sys.modules.setdefault('pika', mock.Mock())
+
+import adaptationengine_framework.completiontracker as completiontracker
+import adaptationengine_framework.statuspoller as statuspoller
+
+
+def notification(event_type, payload):
+    """Return a notification message body"""
+    return json.dumps({'event_type': event_type, 'payload': payload})
+
+
+class TestCompletionTracker(unittest.TestCase):
+    """Test cases for notification-driven enactment completion"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.completiontracker.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        patcher_rabbitmq = mock.patch(
+            'adaptationengine_framework.completiontracker.rabbitmq'
+        )
+        self.patchers.append(patcher_rabbitmq)
+        self.mock_rabbitmq = patcher_rabbitmq.start()
+
+        self.mock_poller = mock.Mock()
+        self.mock_locations = mock.Mock()
+        self.tracker = completiontracker.CompletionTracker(
+            self.mock_poller, 'host', 5672, 'guest', 'guest',
+            'openstack', 'notifications.*',
+            server_locations=self.mock_locations
+        )
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__parse_notification(self):
+        """Finished server and stack operations are recognised"""
+        assert completiontracker.parse_notification(
+            notification(
+                'compute.instance.live_migration.post.dest.end',
+                {'instance_id': 'vm1'}
+            )
+        ) == (statuspoller.SERVER, 'vm1')
+        assert completiontracker.parse_notification(
+            notification(
+                'orchestration.stack.update.error',
+                {'stack_identity': 'arn:openstack:heat::t1:stacks/web/s1'}
+            )
+        ) == (statuspoller.STACK, 's1')
+        assert completiontracker.parse_notification(
+            json.dumps({
+                'oslo.version': '2.0',
+                'oslo.message': notification(
+                    'compute.instance.power_off.end', {'instance_id': 'vm2'}
+                ),
+            })
+        ) == (statuspoller.SERVER, 'vm2')
+
+    def test__parse_notification__ignored(self):
+        """Starts, other services and missing ids are ignored"""
+        for (event_type, payload) in [
+                ('compute.instance.resize.start', {'instance_id': 'vm1'}),
+                ('volume.attach.end', {'volume_id': 'v1'}),
+                ('compute.instance.power_on.end', {}),
+        ]:
+            assert completiontracker.parse_notification(
+                notification(event_type, payload)
+            ) is None
+
+    def test__message(self):
+        """Notifications about watched resources nudge the poller"""
+        self.mock_poller.nudge.side_effect = (
+            lambda kind, resource_id: resource_id == 'vm1'
+        )
+
+        self.tracker.message(
+            notification('compute.instance.power_on.end', {'instance_id': 'vm1'})
+        )
+        self.tracker.message(
+            notification('compute.instance.power_on.end', {'instance_id': 'vm9'})
+        )
+        self.tracker.message('not json')
+
+        assert self.mock_poller.nudge.call_args_list == [
+            mock.call(statuspoller.SERVER, 'vm1'),
+            mock.call(statuspoller.SERVER, 'vm9'),
+        ]
+        assert self.tracker.stats() == {'received': 3, 'matched': 1}
+
+    def test__message__server_locations(self):
+        """Compute notifications keep server locations current"""
+        self.tracker.message(
+            notification(
+                'compute.instance.live_migration.post.dest.end',
+                {'instance_id': 'vm1', 'node': 'host2'}
+            )
+        )
+        self.tracker.message(
+            notification(
+                'compute.instance.live_migration.pre.start',
+                {'instance_id': 'vm2', 'node': 'host1'}
+            )
+        )
+        self.tracker.message(
+            notification('compute.instance.delete.end', {'instance_id': 'vm3'})
+        )
+
+        self.mock_locations.moved.assert_called_once_with('vm1', 'host2')
+        self.mock_locations.forget.assert_called_once_with('vm3')
@@ -0,0 +1,112 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.consolidationmemo as consolidationmemo
+
+
+def make_action(target, score=0.5):
+    """Return a migration of a target"""
+    action = adaptationaction.AdaptationAction('MigrateAction')
+    action.target = target
+    action.score = score
+    return action
+
+
+def make_round(*targets):
+    """Return round results from one plugin proposing targets"""
+    return {
+        'plugin1': {
+            'weight': 1,
+            'results': [make_action(target) for target in targets],
+        },
+    }
+
+
+class TestConsolidationMemo(unittest.TestCase):
+    """Test cases for the consolidation memo"""
+
+    def test__key(self):
+        """Keys change with anything that can change the tally"""
+        key = consolidationmemo.ConsolidationMemo.key
+
+        same = key('stv', make_round('vm1', 'vm2'), [])
+        assert same == key('stv', make_round('vm1', 'vm2'), [])
+
+        changed_round = make_round('vm1', 'vm2')
+        changed_round['plugin1']['weight'] = 2
+        changed_score = make_round('vm1', 'vm2')
+        changed_score['plugin1']['results'][0].score = 0.9
+
+        assert same != key('borda', make_round('vm1', 'vm2'), [])
+        assert same != key('stv', make_round('vm2', 'vm1'), [])
+        assert same != key('stv', changed_round, [])
+        assert same != key('stv', changed_score, [])
+        assert same != key('stv', make_round('vm1', 'vm2'), [make_action('vm3')])
+
+    def test__key__sub_actions(self):
+        """Sub-actions count in full, not just as far as their repr goes"""
+        key = consolidationmemo.ConsolidationMemo.key
+
+        def combined(target_app, score):
+            """Round results with one combined action"""
+            sub_action = make_action('vm1', score)
+            sub_action.target_app = target_app
+            action = adaptationaction.AdaptationAction(
+                'CombinedAction', actions=[sub_action]
+            )
+            return {'plugin1': {'weight': 1, 'results': [action]}}
+
+        assert key('stv', combined('app1', 0.5), []) != (
+            key('stv', combined('app2', 0.5), [])
+        )
+        # a sub-action's score doesn't change what it does
+        assert key('stv', combined('app1', 0.5), []) == (
+            key('stv', combined('app1', 0.9), [])
+        )
+
+    def test__get(self):
+        """Hits return copies, misses return None"""
+        memo = consolidationmemo.ConsolidationMemo(size=2)
+        output = [make_action('vm1')]
+        memo.put('key1', output, [make_action('vm2', -1)], 'id1')
+        output[0].score = 0
+
+        (cached, vetoed, consolidation_id) = memo.get('key1')
+        cached[0].score = 0.1
+
+        assert memo.get('key1')[0][0].score == 0.5
+        assert [action.target for action in vetoed] == ['vm2']
+        assert consolidation_id == 'id1'
+        assert memo.get('key2') is None
+        assert memo.stats()['hits'] == 2
+        assert memo.stats()['misses'] == 1
+
+    def test__put__evicts_least_recently_used(self):
+        """The entry used longest ago goes first"""
+        memo = consolidationmemo.ConsolidationMemo(size=2)
+        memo.put('key1', [], [], 'id1')
+        memo.put('key2', [], [], 'id2')
+        memo.get('key1')
+        memo.put('key3', [], [], 'id3')
+
+        assert memo.get('key2') is None
+        assert memo.get('key1') is not None
+        assert memo.get('key3') is not None
+        assert memo.stats()['size'] == 2
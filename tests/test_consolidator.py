@@ -0,0 +1,163 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.consolidationmemo as consolidationmemo
+import adaptationengine_framework.consolidator as consolidator
+
+
+def make_action(adaptation_type, target='vm1'):
+    """Return an adaptation action of a type"""
+    action = adaptationaction.AdaptationAction(adaptation_type)
+    action.target = target
+    action.score = 0.5
+    return action
+
+
+class TestConsolidator(unittest.TestCase):
+    """Test cases for the consolidator"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.consolidator.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        patcher_database = mock.patch(
+            'adaptationengine_framework.consolidator.database'
+        )
+        self.patchers.append(patcher_database)
+        self.mock_database = patcher_database.start()
+
+        patcher_strategies = mock.patch(
+            'adaptationengine_framework.consolidator.strategies'
+        )
+        self.patchers.append(patcher_strategies)
+        self.mock_strategies = patcher_strategies.start()
+        self.mock_strategy = self.mock_strategies.get_strategy.return_value
+        self.mock_strategy.tally.side_effect = lambda results, blacklist: (
+            [
+                action
+                for plugin in results.values()
+                for action in plugin['results']
+            ],
+            blacklist
+        )
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__whitelist(self):
+        """Only whitelisted types are kept, in new lists"""
+        results = [
+            make_action('MigrateAction', 'vm1'),
+            make_action('StartAction'),
+            make_action('MigrateAction', 'vm2'),
+        ]
+        round_results = {'plugin1': {'weight': 2, 'results': results}}
+
+        whitelisted = consolidator.Consolidator._whitelist(
+            round_results,
+            frozenset([adaptationaction.AdaptationType.MigrateAction])
+        )
+
+        assert whitelisted['plugin1']['weight'] == 2
+        assert [
+            action.target for action in whitelisted['plugin1']['results']
+        ] == ['vm1', 'vm2']
+        assert len(round_results['plugin1']['results']) == 3
+
+    def test__consolidate(self):
+        """The event's strategy tallies whitelisted and low power actions"""
+        event = mock.Mock()
+        event.name = 'cpu_high'
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [
+                    make_action('MigrateAction'),
+                    make_action('StartAction'),
+                    make_action('LowPowerAction'),
+                ],
+            },
+        }
+
+        (output, blacklist) = consolidator.Consolidator.consolidate(
+            event, [make_action('MigrateAction')], round_results, ['old']
+        )
+
+        self.mock_strategies.get_strategy.assert_called_once_with('cpu_high')
+        assert [action.adaptation_type for action in output] == [
+            adaptationaction.AdaptationType.MigrateAction,
+            adaptationaction.AdaptationType.LowPowerAction,
+        ]
+        assert blacklist == ['old']
+        assert self.mock_database.Database.log_consolidation.called
+
+    def test__consolidate__memo(self):
+        """Identical inputs reuse the first consolidation and its record"""
+        event = mock.Mock()
+        event.name = 'cpu_high'
+        memo = consolidationmemo.ConsolidationMemo()
+
+        def make_round():
+            """Return the same round results each time"""
+            vetoed = make_action('MigrateAction', 'vm2')
+            vetoed.score = -1
+            return {
+                'plugin1': {
+                    'weight': 1,
+                    'results': [make_action('MigrateAction'), vetoed],
+                },
+            }
+
+        def tally(results, blacklist):
+            """Blacklist the vetoed action and return the rest"""
+            blacklist.append(results['plugin1']['results'][1])
+            return ([results['plugin1']['results'][0]], blacklist)
+        self.mock_strategy.tally.side_effect = tally
+
+        initial = [make_action('MigrateAction')]
+        (first, _) = consolidator.Consolidator.consolidate(
+            event, initial, make_round(), [], memo=memo
+        )
+        (second, second_blacklist) = consolidator.Consolidator.consolidate(
+            event, initial, make_round(), [], memo=memo
+        )
+
+        assert self.mock_strategy.tally.call_count == 1
+        assert [action.target for action in second] == ['vm1']
+        assert second[0] is not first[0]
+        assert [action.target for action in second_blacklist] == ['vm2']
+        mock_db = self.mock_database.Database
+        consolidation_id = (
+            mock_db.log_consolidation.call_args[1]['consolidation_id']
+        )
+        mock_db.log_consolidation_reused.assert_called_once_with(
+            stack_id=event.stack_id, consolidation_id=consolidation_id
+        )
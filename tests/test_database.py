@@ -0,0 +1,134 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import sys
+import unittest
+
+import mock
+
+# we don't need any of these installed to test
+# but we do need their importing to not-break-everything
+NO_IMPORT = mock.Mock()
+sys.modules['pymongo'] = NO_IMPORT
+sys.modules['heatclient'] = NO_IMPORT
+sys.modules['heatclient.client'] = NO_IMPORT
+sys.modules['keystoneclient'] = NO_IMPORT
+sys.modules['keystoneclient.v2_0'] = NO_IMPORT
+sys.modules['keystoneclient.v2_0.client'] = NO_IMPORT
+sys.modules['novaclient'] = NO_IMPORT
+sys.modules['novaclient.client'] = NO_IMPORT
+
+import adaptationengine_framework.database as database
+
+
+class TestDatabaseStackTenants(unittest.TestCase):
+    """Test cases for the stored stack tenant index"""
+
+    def setUp(self):
+        """Patch out mongo, logging and config"""
+        self.patchers = []
+
+        patcher_pymongo = mock.patch(
+            'adaptationengine_framework.database.pymongo'
+        )
+        self.patchers.append(patcher_pymongo)
+        self.mock_pymongo = patcher_pymongo.start()
+
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.database.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+        patcher_cfg = mock.patch('adaptationengine_framework.database.cfg')
+        self.patchers.append(patcher_cfg)
+        self.mock_cfg = patcher_cfg.start()
+        self.mock_cfg.database__port = '27017'
+        self.mock_cfg.database__database_name = 'adaptation_engine'
+        self.mock_cfg.database__collection_stack_tenant = 'stack_tenant'
+
+        self.mock_collection = mock.Mock()
+        mock_client = self.mock_pymongo.MongoClient.return_value
+        mock_client.__getitem__ = mock.Mock(
+            return_value={'stack_tenant': self.mock_collection}
+        )
+
+    def tearDown(self):
+        """Stop all the patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__load_stack_tenants(self):
+        """Stored entries are read back as {stack id: tenant}"""
+        self.mock_collection.find.return_value = [
+            {'_id': 'stack1', 'tenant': 'tenant1'},
+            {'_id': 'stack2', 'tenant': 'tenant2'},
+        ]
+
+        stack_tenants = database.Database.load_stack_tenants()
+
+        assert stack_tenants == {'stack1': 'tenant1', 'stack2': 'tenant2'}
+
+    def test__load_stack_tenants__error(self):
+        """An unreachable database is logged and gives an empty index"""
+        self.mock_collection.find.side_effect = Exception('down')
+
+        assert database.Database.load_stack_tenants() == {}
+        assert self.mock_logger.error.called
+
+    def test__save_stack_tenants(self):
+        """Each stack's tenant is upserted by stack id"""
+        database.Database.save_stack_tenants({'stack1': 'tenant1'})
+
+        self.mock_pymongo.ReplaceOne.assert_called_once_with(
+            {'_id': 'stack1'},
+            {'_id': 'stack1', 'tenant': 'tenant1'},
+            upsert=True
+        )
+        self.mock_collection.bulk_write.assert_called_once_with(
+            [self.mock_pymongo.ReplaceOne.return_value]
+        )
+
+    def test__save_stack_tenants__empty(self):
+        """Nothing to save means no connection at all"""
+        database.Database.save_stack_tenants({})
+
+        assert not self.mock_pymongo.MongoClient.called
+
+    def test__save_stack_tenants__error(self):
+        """A failed save is logged"""
+        self.mock_collection.bulk_write.side_effect = Exception('down')
+
+        database.Database.save_stack_tenants({'stack1': 'tenant1'})
+
+        assert self.mock_logger.error.called
+
+    def test__delete_stack_tenant(self):
+        """A forgotten stack is removed by stack id"""
+        database.Database.delete_stack_tenant('stack1')
+
+        self.mock_collection.delete_one.assert_called_once_with(
+            {'_id': 'stack1'}
+        )
+
+    def test__delete_stack_tenant__error(self):
+        """A failed delete is logged"""
+        self.mock_collection.delete_one.side_effect = Exception('down')
+
+        database.Database.delete_stack_tenant('stack1')
+
+        assert self.mock_logger.error.called
@@ -0,0 +1,87 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import threading
+import unittest
+
+import mock
+
+import adaptationengine_framework.embargotimers as embargotimers
+
+
+class TestEmbargoTimers(unittest.TestCase):
+    """Test cases for the embargo timers"""
+
+    def setUp(self):
+        """Create patchers and the timers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.embargotimers.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.timers = embargotimers.EmbargoTimers()
+
+    def tearDown(self):
+        """Destroy patchers and stop the timers"""
+        self.timers.stop()
+        self.timers._thread.join(5)
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__embargo(self):
+        """Embargoes expire in order of expiry, not of arrival"""
+        expired = []
+        done = threading.Event()
+
+        def on_expiry(stack_id):
+            expired.append(stack_id)
+            if len(expired) == 2:
+                done.set()
+
+        self.timers.embargo('stack1', 0.2, lambda: on_expiry('stack1'))
+        self.timers.embargo('stack2', 0.05, lambda: on_expiry('stack2'))
+        self.timers.embargo('stack3', 3600, lambda: on_expiry('stack3'))
+
+        assert done.wait(5)
+        assert expired == ['stack2', 'stack1']
+        stats = self.timers.stats()
+        assert stats['expired'] == 2
+        assert stats['embargoed'].keys() == ['stack3']
+        assert stats['embargoed']['stack3'] > 3500
+
+    def test__embargo__error(self):
+        """An on_expiry error doesn't stop later embargoes expiring"""
+        done = threading.Event()
+
+        self.timers.embargo('stack1', 0, mock.Mock(side_effect=Exception))
+        self.timers.embargo('stack2', 0.01, done.set)
+
+        assert done.wait(5)
+
+    def test__stop(self):
+        """Stopping leaves embargoes unexpired"""
+        on_expiry = mock.Mock()
+        self.timers.embargo('stack1', 0.05, on_expiry)
+
+        self.timers.stop()
+        self.timers._thread.join(5)
+
+        assert not on_expiry.called
@@ -0,0 +1,230 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import threading
+import time
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.enactmentscheduler as enactmentscheduler
+
+
+class FakeEnactment:
+    """An enactment that records how many run at once"""
+
+    def __init__(self, tracker, release):
+        """Set where to record things and what to wait for"""
+        self._tracker = tracker
+        self._release = release
+
+    def __call__(self):
+        """Count ourselves in, wait to be released, count ourselves out"""
+        with self._tracker['lock']:
+            self._tracker['running'] += 1
+            self._tracker['peak'] = max(
+                self._tracker['peak'], self._tracker['running']
+            )
+        self._release.wait(5)
+        with self._tracker['lock']:
+            self._tracker['running'] -= 1
+
+
+def make_tracker():
+    """Return somewhere for fake enactments to record themselves"""
+    return {'lock': threading.Lock(), 'running': 0, 'peak': 0}
+
+
+def wait_until(condition, timeout=5):
+    """Wait for a condition to become true, returning whether it did"""
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def migration(server, destination):
+    """Return a migration of a server"""
+    return adaptationaction.AdaptationAction(
+        adaptationaction.AdaptationType.MigrateAction,
+        target=server,
+        destination=destination,
+    )
+
+
+class TestEnactmentScheduler(unittest.TestCase):
+    """Test cases for the enactment scheduler"""
+
+    def setUp(self):
+        """Create patchers, with every server on host1"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.enactmentscheduler.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.locate_server = mock.Mock(return_value='host1')
+        self.scheduler = None
+
+    def tearDown(self):
+        """Destroy patchers and stop the scheduler"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            for worker in self.scheduler._workers:
+                worker.join(5)
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def make_scheduler(self, **limits):
+        """Start a scheduler with the given limits"""
+        self.scheduler = enactmentscheduler.EnactmentScheduler(
+            self.locate_server, **limits
+        )
+        return self.scheduler
+
+    def test__hypervisors_for(self):
+        """Migrations load both ends, stack actions load none"""
+        scheduler = self.make_scheduler(max_concurrent=1)
+
+        assert sorted(
+            scheduler.hypervisors_for(migration('vm1', 'host2'))
+        ) == ['host1', 'host2']
+        assert scheduler.hypervisors_for(
+            adaptationaction.AdaptationAction(
+                adaptationaction.AdaptationType.StopAction, target='vm1'
+            )
+        ) == ('host1',)
+        assert scheduler.hypervisors_for(
+            adaptationaction.AdaptationAction(
+                adaptationaction.AdaptationType.HorizontalScaleAction
+            )
+        ) == ()
+
+        self.locate_server.return_value = None
+        assert scheduler.hypervisors_for(migration('vm1', 'host2')) == (
+            'host2',
+        )
+
+    def test__submit(self):
+        """An enactment runs on a worker and its latency is recorded"""
+        scheduler = self.make_scheduler(max_concurrent=2)
+        run = mock.Mock(side_effect=Exception('enactment failed'))
+
+        task = scheduler.submit(run, migration('vm1', 'host2'), 'tenant1')
+
+        assert task.wait(5)
+        run.assert_called_once_with()
+        assert task.error is not None
+        stats = scheduler.stats()
+        assert stats['queued'] == 0
+        assert stats['running'] == 0
+        assert stats['latency']['MigrateAction']['count'] == 1
+
+    def test__submit__located_by_worker(self):
+        """Hypervisors are looked up off the submitting thread"""
+        scheduler = self.make_scheduler(max_concurrent=1)
+        threads = []
+        self.locate_server.side_effect = (
+            lambda server_id: threads.append(threading.current_thread())
+        )
+
+        task = scheduler.submit(mock.Mock(), migration('vm1', 'host2'))
+
+        assert task.wait(5)
+        assert threads and threading.current_thread() not in threads
+        assert task.hypervisors == ('host2',)
+
+    def test__submit__lookup_fails(self):
+        """A failed lookup still enacts, loading no hypervisors"""
+        scheduler = self.make_scheduler(max_concurrent=1)
+        self.locate_server.side_effect = Exception('nova is down')
+        run = mock.Mock()
+
+        task = scheduler.submit(run, migration('vm1', 'host2'))
+
+        assert task.wait(5)
+        run.assert_called_once_with()
+        assert task.hypervisors == ()
+
+    def test__per_hypervisor(self):
+        """Migrations sharing a hypervisor take turns"""
+        scheduler = self.make_scheduler(max_concurrent=4, per_hypervisor=1)
+        tracker = make_tracker()
+        release = threading.Event()
+
+        tasks = [
+            scheduler.submit(
+                FakeEnactment(tracker, release),
+                migration('vm{}'.format(i), 'host2')
+            )
+            for i in range(3)
+        ]
+        assert wait_until(lambda: tracker['running'] == 1)
+        stats = scheduler.stats()
+        release.set()
+
+        assert all([task.wait(5) for task in tasks])
+        assert tracker['peak'] == 1
+        assert stats['hypervisors'] == {'host1': 1, 'host2': 1}
+
+    def test__per_tenant(self):
+        """A tenant at its limit doesn't hold up other tenants"""
+        scheduler = self.make_scheduler(max_concurrent=4, per_tenant=1)
+        tracker = make_tracker()
+        release = threading.Event()
+        action = adaptationaction.AdaptationAction(
+            adaptationaction.AdaptationType.NoAction
+        )
+
+        blocked = [
+            scheduler.submit(FakeEnactment(tracker, release), action, 't1')
+            for _ in range(2)
+        ]
+        other = scheduler.submit(mock.Mock(), action, 't2')
+
+        assert other.wait(5)
+        assert not blocked[1].wait(0.05)
+        assert scheduler.stats()['tenants'] == {'t1': 1}
+        release.set()
+        assert blocked[1].wait(5)
+        assert tracker['peak'] == 1
+
+    def test__max_concurrent(self):
+        """No more than max_concurrent enactments run at once"""
+        scheduler = self.make_scheduler(max_concurrent=2)
+        tracker = make_tracker()
+        release = threading.Event()
+        action = adaptationaction.AdaptationAction(
+            adaptationaction.AdaptationType.NoAction
+        )
+
+        tasks = [
+            scheduler.submit(FakeEnactment(tracker, release), action)
+            for _ in range(5)
+        ]
+        assert wait_until(lambda: tracker['running'] == 2)
+        assert scheduler.stats()['queued'] == 3
+        release.set()
+
+        assert all([task.wait(5) for task in tasks])
+        assert tracker['peak'] == 2
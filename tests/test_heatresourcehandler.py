@@ -16,6 +16,8 @@ limitations under the License.
 # pylint: disable=protected-access,no-self-use,too-many-public-methods
 # pylint: disable=no-member,invalid-name,unused-variable
 
+import collections
+import json
 import multiprocessing
 import unittest
 import sys
@@ -27,9 +29,14 @@ import mock
 NO_IMPORT = mock.Mock()
 sys.modules['requests'] = NO_IMPORT
 
+import adaptationengine_framework.adaptationaction as adaptationaction
 import adaptationengine_framework.heatresourcehandler as heatresourcehandler
 
 
+Tenant = collections.namedtuple('Tenant', ['name'])
+Stack = collections.namedtuple('Stack', ['id'])
+
+
 def generic_setup(instance):
     """Create patchers"""
     instance.patchers = []
@@ -252,6 +259,60 @@ class TestHeatResourceHandler(unittest.TestCase):
             mock_hrh_instance
         )
 
+    @mock.patch(
+        'adaptationengine_framework.heatresourcehandler.'
+        'HeatResourceHandler._update_agreement_map'
+    )
+    def test__recover_state__stack_tenants(self, mock_update):
+        """Every stack found is indexed by the tenant it was found in"""
+        mock_hrh_instance = mock.Mock(heatresourcehandler.HeatResourceHandler)
+        mock_hrh_instance._active_vms = {}
+        mock_hrh_instance._active_resources = {}
+        mock_hrh_instance._agreement_map = {}
+
+        mock_ks = self.mock_ops.OpenStackClients.get_keystone_client()
+        mock_ks.tenants.list.return_value = [
+            Tenant('tenant1'), Tenant('tenant2')
+        ]
+        stacks = {
+            'tenant1': [Stack('stack1'), Stack('stack2')],
+            'tenant2': [Stack('stack3')],
+        }
+
+        def get_keystone_client(tenant_name=None):
+            """Return a keystone client that knows its tenant"""
+            return mock.Mock(spec=['tenants'], tenants=mock_ks.tenants) if (
+                tenant_name is None
+            ) else tenant_name
+
+        def get_heat_client(tenant_name, admin_ks_client):
+            """Return a heat client listing the tenant's stacks"""
+            heat_client = mock.Mock()
+            heat_client.stacks.list.return_value = stacks[tenant_name]
+            heat_client.resources.list.return_value = []
+            return heat_client
+
+        self.mock_ops.OpenStackClients.get_keystone_client.side_effect = (
+            get_keystone_client
+        )
+        self.mock_ops.OpenStackClients.get_heat_client.side_effect = (
+            get_heat_client
+        )
+
+        heatresourcehandler.HeatResourceHandler._recover_state(
+            mock_hrh_instance
+        )
+
+        expected = {
+            'stack1': 'tenant1', 'stack2': 'tenant1', 'stack3': 'tenant2'
+        }
+        self.mock_ops.REGISTRY.track_stack_tenants.assert_called_once_with(
+            expected
+        )
+        self.mock_db.Database.save_stack_tenants.assert_called_once_with(
+            expected
+        )
+
     def test__get_initial_actions(self):
         mock_hrh_instance = mock.Mock(heatresourcehandler.HeatResourceHandler)
         mock_event_name = '<event-name>'
@@ -450,3 +511,73 @@ class TestHeatResourceHandler(unittest.TestCase):
             )
         except Exception:
             self.fail
+
+    def test__message_heat_query(self):
+        """A query lists every active resource and its actions"""
+        mock_hrh_instance = mock.Mock(heatresourcehandler.HeatResourceHandler)
+        mock_hrh_instance._agreement_map = {}
+        mock_hrh_instance._mq_handler = mock.Mock()
+        mock_hrh_instance._active_resources = {
+            'resource': {
+                'stack_id': 'stack',
+                'event': 'event',
+                'agreement_id': None,
+                'actions': [
+                    adaptationaction.AdaptationAction('MigrateAction'),
+                    adaptationaction.AdaptationAction(
+                        'DeveloperAction',
+                        actions=[
+                            adaptationaction.AdaptationAction('StartAction')
+                        ]
+                    ),
+                ],
+                'embargo': 0,
+                'blacklist': [],
+            }
+        }
+
+        heatresourcehandler.HeatResourceHandler.message(
+            mock_hrh_instance,
+            json.dumps({
+                'heat': {'type': 'heat_query', 'data': {'resource_id': 'x'}}
+            })
+        )
+
+        (_, kwargs) = (
+            mock_hrh_instance._mq_handler.publish_to_heat_resource.call_args
+        )
+        assert kwargs['resource_id'] == 'x'
+        [resource] = json.loads(kwargs['message'])['resources']
+        assert resource['resource_id'] == 'resource'
+        assert resource['stack_id'] == 'stack'
+        assert [
+            action['adaptation_type'] for action in resource['actions']
+        ] == [0, 3]
+        assert resource['actions'][1]['actions'][0]['adaptation_type'] == 6
+
+    def test__message_heat_delete(self):
+        """A stack's owner is forgotten with the last of its resources"""
+        mock_hrh_instance = mock.Mock(heatresourcehandler.HeatResourceHandler)
+        mock_hrh_instance._agreement_map = {}
+        mock_hrh_instance._mq_handler = mock.Mock()
+        mock_hrh_instance._active_vms = {'stack1': [], 'stack2': []}
+        mock_hrh_instance._active_resources = {
+            'resource1': {'stack_id': 'stack1', 'event': 'event1'},
+            'resource2': {'stack_id': 'stack1', 'event': 'event2'},
+            'resource3': {'stack_id': 'stack2', 'event': 'event1'},
+        }
+        forget = self.mock_ops.REGISTRY.forget_stack_tenant
+
+        for resource_id in ['resource1', 'resource3']:
+            heatresourcehandler.HeatResourceHandler.message(
+                mock_hrh_instance,
+                json.dumps({
+                    'heat': {
+                        'type': 'heat_delete',
+                        'data': {'resource_id': resource_id}
+                    }
+                })
+            )
+
+        forget.assert_called_once_with('stack2')
+        assert mock_hrh_instance._active_resources.keys() == ['resource2']
@@ -0,0 +1,157 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import collections
+import unittest
+
+import mock
+
+import adaptationengine_framework.inventory as inventory
+
+
+Flavor = collections.namedtuple('Flavor', ['id', 'name'])
+Hypervisor = collections.namedtuple('Hypervisor', ['hypervisor_hostname'])
+Service = collections.namedtuple('Service', ['id', 'name', 'type'])
+Endpoint = collections.namedtuple('Endpoint', ['service_id', 'internalurl'])
+
+
+class HypervisorStats(object):
+    """A hypervisor with the stats destinations are chosen on"""
+
+    def __init__(self, hostname):
+        """Set a host with 8GB and 8 vCPUs free"""
+        self.hypervisor_hostname = hostname
+        self.free_ram_mb = 8192
+        self.vcpus_used = 0
+        self.running_vms = 0
+
+
+class TestInventory(unittest.TestCase):
+    """Test cases for the openstack inventory"""
+
+    def setUp(self):
+        """Create patchers and clients with a little in them"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.inventory.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.nova = mock.Mock()
+        self.nova.flavors.list.return_value = [
+            Flavor('1', 'm1.small'), Flavor('2', 'm1.large')
+        ]
+        self.nova.hypervisors.list.return_value = [
+            Hypervisor('host1'), Hypervisor('host2')
+        ]
+        self.keystone = mock.Mock()
+        self.keystone.services.list.return_value = [
+            Service('s1', 'heat', 'orchestration'),
+            Service('s2', 'nova', 'compute'),
+        ]
+        self.keystone.endpoints.list.return_value = [
+            Endpoint('s1', 'http://heat/v1/%(tenant_id)s'),
+            Endpoint('s1', 'http://heat-other/'),
+            Endpoint('s2', 'http://nova/'),
+        ]
+
+        self.inventory = inventory.Inventory(
+            lambda: self.nova, lambda: self.keystone
+        )
+
+    def tearDown(self):
+        """Destroy patchers"""
+        self.inventory.stop()
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__lookups(self):
+        """Each section is listed once and indexed"""
+        assert self.inventory.flavor('m1.large').id == '2'
+        assert self.inventory.flavor_by_id('1').name == 'm1.small'
+        assert self.inventory.flavor('m1.huge') is None
+        assert self.inventory.hypervisor('host2') == Hypervisor('host2')
+        assert len(self.inventory.hypervisors()) == 2
+        assert self.inventory.endpoint_url('heat') == (
+            'http://heat/v1/%(tenant_id)s'
+        )
+        assert self.inventory.endpoint_url('compute') == 'http://nova/'
+
+        assert self.nova.flavors.list.call_count == 1
+        assert self.nova.hypervisors.list.call_count == 1
+        assert self.keystone.services.list.call_count == 1
+
+    def test__max_age(self):
+        """Stale sections are listed again, and 0 forces a listing"""
+        self.inventory.flavor('m1.small')
+        self.inventory.flavor('m1.small', max_age=3600)
+        assert self.nova.flavors.list.call_count == 1
+
+        self.nova.flavors.list.return_value = [Flavor('3', 'm1.huge')]
+        assert self.inventory.flavor('m1.huge', max_age=0).id == '3'
+        assert self.nova.flavors.list.call_count == 2
+
+    def test__placed(self):
+        """A placed server is charged to its host until the next listing"""
+        self.nova.hypervisors.list.return_value = [HypervisorStats('host1')]
+        self.inventory.placed('host1', mock.Mock(ram=2048, vcpus=2))
+        self.inventory.hypervisors()
+
+        self.inventory.placed('host1', mock.Mock(ram=2048, vcpus=2))
+        self.inventory.placed('host9', mock.Mock(ram=2048, vcpus=2))
+
+        host = self.inventory.hypervisor('host1')
+        assert (host.free_ram_mb, host.vcpus_used, host.running_vms) == (
+            6144, 2, 1
+        )
+
+        self.nova.hypervisors.list.return_value = [HypervisorStats('host1')]
+        assert self.inventory.hypervisor('host1', max_age=0).free_ram_mb == (
+            8192
+        )
+
+    def test__refresh__fails(self):
+        """A failed refresh keeps the last listing"""
+        self.inventory.refresh()
+        self.nova.hypervisors.list.side_effect = Exception('nova is down')
+
+        assert not self.inventory.refresh()
+        assert self.inventory.hypervisor('host1', max_age=0) is not None
+        stats = self.inventory.stats()
+        assert stats['refreshes'] == 5
+        assert stats['failures'] == 2
+        assert stats['age'][inventory.HYPERVISORS] >= 0
+
+    def test__refresh__on_error(self):
+        """A failed refresh passes its error on"""
+        err = Exception('401 Unauthorized')
+        self.nova.flavors.list.side_effect = err
+        self.inventory._on_error = mock.Mock()
+
+        assert not self.inventory.refresh(inventory.FLAVORS)
+        self.inventory._on_error.assert_called_once_with(err)
+
+    def test__stats__never_listed(self):
+        """Sections that were never listed have no age"""
+        assert self.inventory.stats()['age'] == {
+            inventory.FLAVORS: None,
+            inventory.HYPERVISORS: None,
+            inventory.CATALOG: None,
+        }
@@ -0,0 +1,373 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import collections
+import sys
+import unittest
+
+import mock
+
+# we don't need any of these installed to test
+# but we do need their importing to not-break-everything
+NO_IMPORT = mock.Mock()
+sys.modules['heatclient'] = NO_IMPORT
+sys.modules['heatclient.client'] = NO_IMPORT
+sys.modules['keystoneclient'] = NO_IMPORT
+sys.modules['keystoneclient.v2_0'] = NO_IMPORT
+sys.modules['keystoneclient.v2_0.client'] = NO_IMPORT
+sys.modules['novaclient'] = NO_IMPORT
+sys.modules['novaclient.client'] = NO_IMPORT
+
+import adaptationengine_framework.openstack as openstack
+
+
+Tenant = collections.namedtuple('Tenant', ['name'])
+
+
+class Unauthorized(Exception):
+    """A client error for a refused token"""
+    http_status = 401
+
+# unpatched, for the tests of OpenStackClients itself
+OpenStackClients = openstack.OpenStackClients
+
+
+class FakeKeystone:
+    """A keystone client whose token can be made to expire"""
+
+    tokens = 0
+
+    def __init__(self, tenant_name):
+        """Authenticate with a new token"""
+        FakeKeystone.tokens += 1
+        self.tenant_name = tenant_name
+        self.auth_token = 'token{}'.format(FakeKeystone.tokens)
+        self.auth_ref = mock.Mock()
+        self.auth_ref.will_expire_soon.return_value = False
+        self.tenants = mock.Mock()
+
+
+class TestClientRegistry(unittest.TestCase):
+    """Test cases for the openstack client registry"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.openstack.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        patcher_cfg = mock.patch(
+            'adaptationengine_framework.openstack.cfg'
+        )
+        self.patchers.append(patcher_cfg)
+        self.mock_cfg = patcher_cfg.start()
+        self.mock_cfg.openstack__tenant = 'admin'
+
+        patcher_clients = mock.patch(
+            'adaptationengine_framework.openstack.OpenStackClients'
+        )
+        self.patchers.append(patcher_clients)
+        self.mock_clients = patcher_clients.start()
+        self.mock_clients.get_keystone_client.side_effect = (
+            lambda tenant_name: FakeKeystone(tenant_name)
+        )
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: (
+                keystone_client.auth_token, admin_ks_client
+            )
+        )
+
+        self.registry = openstack.ClientRegistry()
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__keystone(self):
+        """Clients are reused per tenant and counted"""
+        admin = self.registry.keystone()
+
+        assert self.registry.keystone('admin') is admin
+        assert self.registry.keystone('tenant1') is not admin
+        assert admin.tenant_name == 'admin'
+        assert self.registry.stats() == {
+            'clients': 2,
+            'created': {'keystone': 2},
+            'refreshed': {},
+            'reused': {'keystone': 1},
+        }
+
+    def test__keystone__expiring(self):
+        """A token about to expire is replaced, along with its heat client"""
+        admin = self.registry.keystone()
+        heat = self.registry.heat()
+        assert heat == (admin.auth_token, None)
+        assert self.registry.heat() is heat
+
+        admin.auth_ref.will_expire_soon.return_value = True
+        refreshed = self.registry.keystone()
+
+        assert refreshed is not admin
+        assert self.registry.heat() == (refreshed.auth_token, None)
+        assert self.registry.stats()['refreshed'] == {
+            'keystone': 1, 'heat': 1
+        }
+
+    def test__heat__tenant(self):
+        """Endpoints for a tenant's heat client come from the admin client"""
+        admin = self.registry.keystone()
+        tenant = self.registry.keystone('tenant1')
+
+        assert self.registry.heat('tenant1') == (tenant.auth_token, admin)
+
+    def test__nova(self):
+        """Nova clients are kept and never refreshed"""
+        nova = self.registry.nova('tenant1')
+
+        assert self.registry.nova('tenant1') is nova
+        self.mock_clients.get_nova_client.assert_called_once_with(
+            tenant='tenant1'
+        )
+
+    def test__endpoint(self):
+        """Endpoints are found once per tenant and service"""
+        self.mock_clients._find_endpoint.return_value = 'http://heat/'
+
+        assert self.registry.endpoint('heat') == 'http://heat/'
+        assert self.registry.endpoint('heat') == 'http://heat/'
+        assert self.registry.endpoint('nova') == 'http://heat/'
+        assert self.mock_clients._find_endpoint.call_count == 2
+
+    def test__find_endpoint__inventory(self):
+        """Endpoints come from the inventory, with the tenant filled in"""
+        keystone_client = FakeKeystone('admin')
+        keystone_client.project_id = 'p1'
+        service_inventory = mock.Mock()
+        service_inventory.endpoint_url.side_effect = [
+            None, 'http://heat/v1/%(tenant_id)s'
+        ]
+
+        endpoint = OpenStackClients._find_endpoint(
+            keystone_client, 'heat', service_inventory=service_inventory
+        )
+
+        assert endpoint == 'http://heat/v1/p1'
+        assert service_inventory.endpoint_url.call_args_list == [
+            mock.call('heat'), mock.call('heat', max_age=0)
+        ]
+
+    def test__heat_for_stack(self):
+        """The owning tenant's heat client is found and kept"""
+        tenants = [Tenant('tenant1'), Tenant('tenant2')]
+        self.registry.keystone().tenants.list.return_value = tenants
+
+        owner = mock.Mock()
+        other = mock.Mock()
+        other.stacks.get.side_effect = Exception('not found')
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: (
+                owner if keystone_client.tenant_name == 'tenant2' else other
+            )
+        )
+
+        assert self.registry.heat_for_stack('stack1') is owner
+        assert self.registry.heat_for_stack('stack1') is owner
+        assert self.mock_clients.get_heat_client.call_count == 2
+        owner.stacks.get.assert_called_with('stack1')
+
+    def test__heat_for_stack__indexed(self):
+        """Indexed stacks go straight to their tenant's heat client"""
+        self.registry.track_stack_tenants({'stack1': 'tenant1'})
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: mock.Mock(
+                tenant_name=keystone_client.tenant_name
+            )
+        )
+
+        heat = self.registry.heat_for_stack('stack1')
+
+        assert heat.tenant_name == 'tenant1'
+        heat.stacks.get.assert_called_once_with('stack1')
+        assert not self.registry.keystone().tenants.list.called
+        assert self.registry.stats()['reused']['stack_tenant'] == 1
+
+    def test__heat_for_stack__stale(self):
+        """A stack no longer in its indexed tenant is searched for again"""
+        on_forgotten = mock.Mock()
+        self.registry.track_stack_tenants(
+            {'stack1': 'tenant1'}, on_forgotten=on_forgotten
+        )
+        self.registry.keystone().tenants.list.return_value = [
+            Tenant('tenant1'), Tenant('tenant2')
+        ]
+        owner = mock.Mock()
+        other = mock.Mock()
+        other.stacks.get.side_effect = Exception('not found')
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: (
+                owner if keystone_client.tenant_name == 'tenant2' else other
+            )
+        )
+
+        assert self.registry.heat_for_stack('stack1') is owner
+        assert self.registry.stack_tenant('stack1') == 'tenant2'
+        on_forgotten.assert_called_once_with('stack1')
+
+    def test__forget_stack_tenant(self):
+        """Forgotten stacks leave the index, and are passed on once"""
+        on_forgotten = mock.Mock()
+        self.registry.track_stack_tenants(
+            {'stack1': 'tenant1'}, on_forgotten=on_forgotten
+        )
+
+        self.registry.forget_stack_tenant('stack1')
+        self.registry.forget_stack_tenant('stack1')
+
+        assert self.registry.stack_tenant('stack1') is None
+        on_forgotten.assert_called_once_with('stack1')
+
+    def test__heat_for_stack__learned(self):
+        """Owners found by searching are indexed and handed on"""
+        on_learned = mock.Mock()
+        self.registry.track_stack_tenants({}, on_learned=on_learned)
+        self.registry.keystone().tenants.list.return_value = [
+            Tenant('tenant1')
+        ]
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: mock.Mock()
+        )
+
+        self.registry.heat_for_stack('stack1')
+
+        assert self.registry.stack_tenant('stack1') == 'tenant1'
+        on_learned.assert_called_once_with({'stack1': 'tenant1'})
+        assert self.registry.stats()['created']['stack_tenant'] == 1
+
+    def test__invalidate(self):
+        """Invalidated tenants get new clients"""
+        admin = self.registry.keystone()
+        tenant = self.registry.keystone('tenant1')
+
+        self.registry.invalidate()
+
+        assert self.registry.keystone() is not admin
+        assert self.registry.keystone('tenant1') is tenant
+
+    def test__is_unauthorized(self):
+        """401s from clients and request responses are spotted"""
+        assert openstack.is_unauthorized(Unauthorized())
+        assert openstack.is_unauthorized(mock.Mock(spec=[], code=401))
+        assert openstack.is_unauthorized(mock.Mock(spec=[], status_code=401))
+        assert openstack.is_unauthorized(
+            mock.Mock(spec=['response'], response=mock.Mock(status_code=401))
+        )
+        assert not openstack.is_unauthorized(Exception('404 Not Found'))
+        assert not openstack.is_unauthorized(
+            mock.Mock(spec=[], status_code=200)
+        )
+
+    def test__unauthorized(self):
+        """Only a refused token drops the tenant's clients"""
+        admin = self.registry.keystone()
+        tenant = self.registry.keystone('tenant1')
+
+        assert not self.registry.unauthorized(Exception('down'), 'tenant1')
+        assert self.registry.keystone('tenant1') is tenant
+
+        assert self.registry.unauthorized(Unauthorized(), 'tenant1')
+        assert self.registry.keystone('tenant1') is not tenant
+        assert self.registry.keystone() is admin
+
+    def test__heat_for_stack__unauthorized(self):
+        """A refused token keeps the index entry but drops the clients"""
+        self.registry.track_stack_tenants({'stack1': 'tenant1'})
+        self.registry.keystone().tenants.list.return_value = []
+        self.mock_clients.get_heat_client.side_effect = (
+            lambda keystone_client, admin_ks_client: mock.Mock(
+                stacks=mock.Mock(get=mock.Mock(side_effect=Unauthorized()))
+            )
+        )
+        tenant = self.registry.keystone('tenant1')
+
+        assert self.registry.heat_for_stack('stack1') is None
+        assert self.registry.stack_tenant('stack1') == 'tenant1'
+        assert self.registry.keystone('tenant1') is not tenant
+
+
+class TestOpenStackInterface(unittest.TestCase):
+    """Test cases for the openstack interface"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.openstack.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        patcher_inventory = mock.patch(
+            'adaptationengine_framework.openstack.INVENTORY'
+        )
+        self.patchers.append(patcher_inventory)
+        self.mock_inventory = patcher_inventory.start()
+
+        self.nova = mock.Mock()
+        self.interface = openstack.OpenStackInterface(self.nova)
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__get_migration_destinations(self):
+        """Destinations come from cached hypervisors, not per-host searches"""
+        server = mock.Mock(flavor={'id': 'large'})
+        server.to_dict.return_value = {
+            'OS-EXT-SRV-ATTR:hypervisor_hostname': 'host1'
+        }
+        self.nova.servers.get.return_value = server
+        self.mock_inventory.flavor_by_id.return_value = mock.Mock(
+            ram=2048, vcpus=2
+        )
+        self.mock_inventory.hypervisors.return_value = [
+            mock.Mock(
+                hypervisor_hostname=name, free_ram_mb=ram,
+                vcpus=8, vcpus_used=used, running_vms=0
+            )
+            for name, ram, used in [
+                ('host1', 8192, 0), ('host2', 1024, 0), ('host3', 4096, 4)
+            ]
+        ]
+
+        assert self.interface.get_migration_destinations(
+            'vm1', count=3
+        ) == ['host3']
+        assert self.interface.get_migration_destination('vm1') == 'host3'
+        self.mock_inventory.placed.assert_called_once_with(
+            'host3', self.mock_inventory.flavor_by_id.return_value
+        )
+        self.mock_inventory.flavor_by_id.assert_called_with('large')
+        assert not self.nova.hypervisors.search.called
@@ -119,11 +119,39 @@ class TestPluginManager(unittest.TestCase):
             return True
 
         mock_jscan.side_effect = jscan
-        pluginmanager.PluginManager()
+        self.mock_cfg.plugin__jvm_startup = 'background'
+        test = pluginmanager.PluginManager()
+        test._jvm_thread.join(5)
         assert mock_pyscan.called
         assert mock_jscan.called
         assert mock_jvm.called
 
+    @mock.patch(
+        'adaptationengine_framework.pluginmanager.PluginManager._start_jvm'
+    )
+    @mock.patch(
+        'adaptationengine_framework.pluginmanager.'
+        'PluginManager._scan_for_java_plugins'
+    )
+    @mock.patch(
+        'adaptationengine_framework.pluginmanager.'
+        'PluginManager._scan_for_python_plugins'
+    )
+    def test__init__jvm_lazy(self, mock_pyscan, mock_jscan, mock_jvm):
+        """Tests the JVM is left until a java plugin is first used"""
+        mock_jscan.return_value = True
+        self.mock_cfg.plugin__jvm_startup = 'lazy'
+        test = pluginmanager.PluginManager()
+        assert test.jvm_needed
+        assert test._jvm_thread is None
+        assert not mock_jvm.called
+
+        java_generator = mock.Mock(needs_jvm=True)
+        test._plugins = {'plugin1': java_generator}
+        test.get(['plugin1'])
+        test.get(['plugin1'])
+        mock_jvm.assert_called_once_with()
+
     @mock.patch('adaptationengine_framework.pluginmanager.jpype')
     def test__start_jvm__needed_not_started(self, mock_jpype):
         """Tests configuring and starting the JVM as needed"""
@@ -197,12 +225,11 @@ class TestPluginManager(unittest.TestCase):
             mock.call('plugin3'),
         ]
 
-    @mock.patch('adaptationengine_framework.pluginmanager.imp')
     @mock.patch('adaptationengine_framework.pluginmanager.os.path.isfile')
     @mock.patch('adaptationengine_framework.pluginmanager.os.path.isdir')
     @mock.patch('adaptationengine_framework.pluginmanager.os.listdir')
     def test__scan_for_python_plugins(
-            self, mock_listdir, mock_isdir, mock_isfile, mock_imp
+            self, mock_listdir, mock_isdir, mock_isfile
     ):
         """
         Tests a successful scan for python plugins
@@ -213,20 +240,19 @@ class TestPluginManager(unittest.TestCase):
         mock_listdir.return_value = ['plugin1', 'plugin2']
         mock_isdir.return_value = True
         mock_isfile.return_value = True
-        mock_imp.find_module.return_value = ('file', 'pathname', 'description')
 
         # mock expected results
         expected_plugins = [
             mock.call(
                 file_path='/tmp/python/plugin1/plugin1.py',
-                info=('file', 'pathname', 'description'),
+                info=None,
                 name='plugin1',
                 uuid='xxx',
                 weight=1
             ),
             mock.call(
                 file_path='/tmp/python/plugin2/plugin2.py',
-                info=('file', 'pathname', 'description'),
+                info=None,
                 name='plugin2',
                 uuid='xxx',
                 weight=1
@@ -467,3 +493,60 @@ class TestPluginManager(unittest.TestCase):
             "/tmp/java/plugin1/plugin1.jar:/tmp/java/plugin2/plugin2.jar:"
             "/tmp/java/plugin2/garbage.jar"
         )
+
+    @mock.patch('adaptationengine_framework.pluginmanager.os.path.isfile')
+    def test__load_routing(self, mock_isfile):
+        """A plugin's routing.yaml is read into its routing declaration"""
+        mock_isfile.return_value = True
+        mock_pm_instance = mock.Mock(pluginmanager.PluginManager)
+        mock_pm_instance._routing_declarations = {}
+
+        mock_open = mock.mock_open(
+            read_data="events: [cpu_high]\nactions: [MigrateAction]\n"
+        )
+        with mock.patch(
+                'adaptationengine_framework.pluginmanager.open',
+                mock_open,
+                create=True
+        ):
+            pluginmanager.PluginManager._load_routing(
+                mock_pm_instance, 'plugin1', '/tmp/python/plugin1'
+            )
+
+        mock_open.assert_called_once_with('/tmp/python/plugin1/routing.yaml')
+        assert mock_pm_instance._routing_declarations == {
+            'plugin1': {'events': ['cpu_high'], 'actions': ['MigrateAction']}
+        }
+
+    @mock.patch('adaptationengine_framework.pluginmanager.os.path.isfile')
+    def test__load_routing__none(self, mock_isfile):
+        """A plugin without a routing.yaml declares nothing"""
+        mock_isfile.return_value = False
+        mock_pm_instance = mock.Mock(pluginmanager.PluginManager)
+        mock_pm_instance._routing_declarations = {}
+
+        pluginmanager.PluginManager._load_routing(
+            mock_pm_instance, 'plugin1', '/tmp/python/plugin1'
+        )
+
+        assert mock_pm_instance._routing_declarations == {}
+
+    def test__route(self):
+        """Rounds are pruned using the allowed actions' types"""
+        mock_pm_instance = mock.Mock(pluginmanager.PluginManager)
+        mock_pm_instance._routing = mock.Mock()
+        mock_pm_instance._routing.prune.return_value = (
+            [['plugin1']], ['plugin2']
+        )
+
+        result = pluginmanager.PluginManager.route(
+            mock_pm_instance,
+            [['plugin1', 'plugin2']],
+            'cpu_high',
+            [mock.Mock(adaptation_type=0), mock.Mock(adaptation_type=5)]
+        )
+
+        assert result == [['plugin1']]
+        mock_pm_instance._routing.prune.assert_called_once_with(
+            [['plugin1', 'plugin2']], 'cpu_high', [0, 5]
+        )
@@ -0,0 +1,94 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.pluginrouting as pluginrouting
+
+
+MIGRATE = adaptationaction.AdaptationType.MigrateAction
+SCALE = adaptationaction.AdaptationType.VerticalScaleAction
+
+
+class TestPluginRoutingIndex(unittest.TestCase):
+    """Test cases for the plugin routing index"""
+
+    def setUp(self):
+        """Create patchers and an index"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.pluginrouting.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+        self.index = pluginrouting.PluginRoutingIndex({
+            'cpu_only': {'events': ['cpu_high']},
+            'migrate_only': {'actions': ['MigrateAction']},
+            'cpu_migrate': {
+                'events': ['cpu_high', 'ram_high'],
+                'actions': ['migrateaction', SCALE],
+            },
+            'empty': {'events': None, 'actions': []},
+        })
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__handles(self):
+        """Plugins only handle what they declare"""
+        assert self.index.handles('cpu_only', 'cpu_high', [SCALE])
+        assert not self.index.handles('cpu_only', 'ram_high', [SCALE])
+
+        assert self.index.handles('migrate_only', 'anything', [MIGRATE])
+        assert not self.index.handles('migrate_only', 'anything', [SCALE])
+
+        assert self.index.handles('cpu_migrate', 'ram_high', [SCALE])
+        assert not self.index.handles('cpu_migrate', 'disk_full', [SCALE])
+
+    def test__handles__undeclared(self):
+        """Plugins without a declaration get everything"""
+        assert self.index.handles('empty', 'anything', [])
+        assert self.index.handles('unknown', 'anything', [])
+
+    def test__handles__bad_action(self):
+        """A bad action name means the actions declaration is ignored"""
+        index = pluginrouting.PluginRoutingIndex({
+            'typo': {'events': ['cpu_high'], 'actions': ['MigrateActoin']},
+        })
+
+        assert self.mock_logger.error.called
+        assert index.handles('typo', 'cpu_high', [SCALE])
+        assert not index.handles('typo', 'ram_high', [SCALE])
+
+    def test__prune(self):
+        """Plugins that don't apply are removed, and so are empty rounds"""
+        (rounds, skipped) = self.index.prune(
+            [['cpu_only', 'unknown'], ['migrate_only'], ['cpu_migrate']],
+            'ram_high',
+            [SCALE]
+        )
+
+        assert rounds == [['unknown'], ['cpu_migrate']]
+        assert skipped == ['cpu_only', 'migrate_only']
@@ -18,6 +18,8 @@ limitations under the License.
 
 import unittest
 import sys
+import threading
+import time
 
 import mock
 
@@ -27,7 +29,9 @@ NO_IMPORT = mock.Mock()
 sys.modules['pymongo'] = NO_IMPORT
 sys.modules['requests'] = NO_IMPORT
 
+import adaptationengine_framework.adaptationaction as adaptationaction
 import adaptationengine_framework.plugins as plugins
+import adaptationengine_framework.wireformat as wireformat
 
 
 def generic_setup(instance):
@@ -54,6 +58,7 @@ def generic_setup(instance):
     )
     instance.patchers.append(patcher_ops)
     instance.mock_ops = patcher_ops.start()
+    instance.mock_ops.REGISTRY.unauthorized.return_value = False
 
 def generic_teardown(self):
     """Destroy patchers"""
@@ -76,10 +81,7 @@ class TestOpenStackAPI(unittest.TestCase):
         """Test initialisation"""
         test = plugins.OpenStackAPI("plugin1")
 
-        (
-            self.mock_ops.OpenStackClients.
-            get_keystone_client.assert_called_once_with()
-        )
+        self.mock_ops.REGISTRY.keystone.assert_called_once_with()
 
         assert test._keystone is not None
         assert test._token is not None
@@ -88,7 +90,7 @@ class TestOpenStackAPI(unittest.TestCase):
 
     def test__init__bad_connection(self):
         """Test initialisation, except with a bad connection"""
-        self.mock_ops.OpenStackClients.get_keystone_client.side_effect = (
+        self.mock_ops.REGISTRY.keystone.side_effect = (
             Exception("You goofed")
         )
 
@@ -108,6 +110,7 @@ class TestOpenStackAPI(unittest.TestCase):
         mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
         mock_osa_instance._headers = "some headers"
         mock_osa_instance._auth = None
+        mock_osa_instance._deadline = None
 
         mock_response = mock.Mock()
         mock_response.text = "hello"
@@ -122,6 +125,27 @@ class TestOpenStackAPI(unittest.TestCase):
         )
         assert result == mock_response.text
 
+    @mock.patch('adaptationengine_framework.plugins.requests')
+    def test__get__unauthorized(self, mock_requests):
+        """A refused token drops the registered clients and gets nothing"""
+        mock_osa_instance = mock.Mock(plugins.OpenStackAPI)
+        mock_osa_instance._plugin_name = "plugin1"
+        mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
+        mock_osa_instance._headers = "some headers"
+        mock_osa_instance._auth = None
+        mock_osa_instance._deadline = None
+
+        mock_response = mock.Mock(status_code=401)
+        mock_requests.get.return_value = mock_response
+        self.mock_ops.REGISTRY.unauthorized.return_value = True
+
+        result = plugins.OpenStackAPI.get(mock_osa_instance, "stacks/")
+
+        self.mock_ops.REGISTRY.unauthorized.assert_called_once_with(
+            mock_response, None
+        )
+        assert result is None
+
     @mock.patch('adaptationengine_framework.plugins.requests')
     def test__get__with_tenant_id(self, mock_requests):
         """Test getting a url with a supplied tenant id"""
@@ -131,6 +155,7 @@ class TestOpenStackAPI(unittest.TestCase):
         mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
         mock_osa_instance._headers = "some headers"
         mock_osa_instance._auth = None
+        mock_osa_instance._deadline = None
         mock_osa_instance._service_name = "test-service"
 
         mock_admin_keystone = mock.Mock()
@@ -139,14 +164,10 @@ class TestOpenStackAPI(unittest.TestCase):
 
         mock_tenant_keystone = mock.Mock()
         mock_tenant_keystone.auth_ref = {'token': {'id': 'spooky_ghost'}}
-        self.mock_ops.OpenStackClients.get_keystone_client.return_value = (
-            mock_tenant_keystone
-        )
+        self.mock_ops.REGISTRY.keystone.return_value = mock_tenant_keystone
 
         mock_other_endpoint = "http://127.0.0.1:80/endpoint/tenant/"
-        self.mock_ops.OpenStackClients._find_endpoint.return_value = (
-            mock_other_endpoint
-        )
+        self.mock_ops.REGISTRY.endpoint.return_value = mock_other_endpoint
 
         mock_tenant_id = "<tenant-id>"
 
@@ -175,6 +196,7 @@ class TestOpenStackAPI(unittest.TestCase):
         mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
         mock_osa_instance._headers = "some headers"
         mock_osa_instance._auth = None
+        mock_osa_instance._deadline = None
         mock_osa_instance._service_name = "test-service"
 
         mock_admin_keystone = mock.Mock()
@@ -187,9 +209,7 @@ class TestOpenStackAPI(unittest.TestCase):
         def no_dice(*args):
             raise Exception("Uh uh uh, you didn't say the magic word")
 
-        self.mock_ops.OpenStackClients.get_keystone_client.side_effect = (
-            no_dice
-        )
+        self.mock_ops.REGISTRY.keystone.side_effect = no_dice
 
         mock_tenant_id = "<tenant-id>"
 
@@ -201,6 +221,35 @@ class TestOpenStackAPI(unittest.TestCase):
         assert not mock_requests.called
         assert result is None
 
+    @mock.patch('adaptationengine_framework.plugins.requests')
+    def test__get__deadline(self, mock_requests):
+        """The request timeout is capped by the plugin's remaining time"""
+        mock_osa_instance = mock.Mock(plugins.OpenStackAPI)
+        mock_osa_instance._plugin_name = "plugin1"
+        mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
+        mock_osa_instance._headers = "some headers"
+        mock_osa_instance._auth = None
+        mock_osa_instance._deadline = plugins.Deadline(time.time() + 10)
+
+        plugins.OpenStackAPI.get(mock_osa_instance, "stacks/")
+
+        timeout = mock_requests.get.call_args[1]['timeout']
+        assert 9 < timeout <= 10
+
+    @mock.patch('adaptationengine_framework.plugins.requests')
+    def test__get__deadline_cancelled(self, mock_requests):
+        """Nothing is requested once the plugin has been given up on"""
+        mock_osa_instance = mock.Mock(plugins.OpenStackAPI)
+        mock_osa_instance._plugin_name = "plugin1"
+        mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
+        mock_osa_instance._deadline = plugins.Deadline(time.time() + 10)
+        mock_osa_instance._deadline.cancel()
+
+        result = plugins.OpenStackAPI.get(mock_osa_instance, "stacks/")
+
+        assert result is None
+        assert not mock_requests.get.called
+
     def test__get__no_endpoint(self):
         """Test getting a url with no endpoint"""
         url = "stacks/"
@@ -208,6 +257,7 @@ class TestOpenStackAPI(unittest.TestCase):
         mock_osa_instance._plugin_name = "plugin1"
         mock_osa_instance._endpoint = None
         mock_osa_instance._headers = None
+        mock_osa_instance._deadline = None
 
         result = plugins.OpenStackAPI.get(mock_osa_instance, url)
 
@@ -221,6 +271,7 @@ class TestOpenStackAPI(unittest.TestCase):
         mock_osa_instance._plugin_name = "plugin1"
         mock_osa_instance._endpoint = "http://127.0.0.1:80/endpoint/"
         mock_osa_instance._headers = "some headers"
+        mock_osa_instance._deadline = None
 
         mock_requests.get.side_effect = Exception()
 
@@ -246,13 +297,10 @@ class TestOpenStackAPIChildren(unittest.TestCase):
         compute = plugins.Compute()
         orchestration = plugins.Orchestration()
 
-        assert (
-            self.mock_ops.OpenStackClients.get_keystone_client.call_count == 3
-        )
-
-        assert (
-            self.mock_ops.OpenStackClients._find_endpoint.call_count == 3
-        )
+        assert self.mock_ops.REGISTRY.keystone.call_count == 3
+        assert [
+            call[0] for call in self.mock_ops.REGISTRY.endpoint.call_args_list
+        ] == [('ceilometer',), ('nova',), ('heat',)]
 
 
 class TestAgreements(unittest.TestCase):
@@ -416,10 +464,332 @@ class TestPythonPlugin(unittest.TestCase):
         result = test.next()
 
         mock_pyplugin.assert_called_once_with(
-            mock_file, mock_info, mock_name, mock_uuid, 1
+            mock_file, mock_info, mock_name, mock_uuid, 1, batcher=mock.ANY
         )
         assert result == mock_pyplugin()
 
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    @mock.patch('adaptationengine_framework.plugins.PythonPlugin')
+    def test__python_generator__lazy_info(self, mock_pyplugin, mock_imp):
+        """Test that python generator finds the module on first use only"""
+        mock_info = ('file', 'pathname', 'description')
+        mock_imp.find_module.return_value = mock_info
+
+        test = plugins.PythonPluginGenerator(
+            file_path="/tmp/plugin1/plugin1.py",
+            info=None,
+            name="plugin1",
+            uuid="a uuid",
+            weight=1
+        )
+        assert not mock_imp.find_module.called
+
+        test.next()
+        test.next()
+
+        mock_imp.find_module.assert_called_once_with(
+            "plugin1", ["/tmp/plugin1"]
+        )
+        mock_pyplugin.assert_called_with(
+            "/tmp/plugin1/plugin1.py", mock_info, "plugin1", "a uuid", 1,
+            batcher=mock.ANY
+        )
+
+    @mock.patch('adaptationengine_framework.plugins.Orchestration')
+    @mock.patch('adaptationengine_framework.plugins.Compute')
+    @mock.patch('adaptationengine_framework.plugins.Metrics')
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    def test__python_plugin__batched(
+            self, mock_imp, mock_met, mock_com, mock_orc
+    ):
+        """Instances of a plugin with run_batch are evaluated together"""
+        batcher = plugins.PluginBatcher("plugin1", 0.5)
+        mock_module = mock_imp.load_module.return_value
+        mock_module.run_batch.return_value = [["actions a"], ["actions b"]]
+        action = mock.Mock(adaptation_type=0)
+
+        instances = []
+        for stack, results in [('a', {}), ('b', {})]:
+            test = plugins.PythonPlugin(
+                file_path="/tmp/plugin/plugin.file",
+                info=('file', 'pathname', 'description'),
+                name="plugin1",
+                uuid="a uuid",
+                weight=1,
+                batcher=batcher
+            )
+            test.setup(
+                event=FakeEvent("event1", stack),
+                initial_actions=[action],
+                results=results
+            )
+            instances.append((test, results))
+        (first, first_results) = instances[0]
+        (second, second_results) = instances[1]
+
+        assert first.batch_key() == second.batch_key()
+        assert first.batch_window == 0.5
+
+        errors = first.run_batch([first, second])
+
+        assert errors == [None, None]
+        assert mock_module.run_batch.call_count == 1
+        assert not mock_module.run.called
+        assert first_results["plugin1"]["results"] == ["actions a"]
+        assert second_results["plugin1"]["results"] == ["actions b"]
+
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    def test__store_results__binary(self, mock_imp):
+        """Results that can't be encoded are handed over as objects"""
+        self.mock_cfg.plugin__wire_format = 'binary'
+        good = [adaptationaction.AdaptationAction(0, target='vm1', score=1)]
+        bad = [adaptationaction.AdaptationAction(0, score=None)]
+
+        sent = []
+        for results in [good, bad]:
+            stored = {}
+            test = plugins.PythonPlugin(
+                file_path="/tmp/plugin/plugin.file",
+                info=('file', 'pathname', 'description'),
+                name="plugin1",
+                uuid="a uuid",
+                weight=1
+            )
+            test.setup(event="an event", initial_actions=[], results=stored)
+
+            test._store_results(results)
+
+            sent.append(stored["plugin1"]["results"])
+
+        assert wireformat.is_binary(sent[0])
+        assert wireformat.decode_actions(sent[0]) == good
+        assert sent[1] is bad
+        assert self.mock_logger.error.called
+
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    def test__python_plugin__not_batched(self, mock_imp):
+        """Without a batcher or run_batch an instance has no batch key"""
+        mock_imp.load_module.return_value = mock.Mock(spec=['run'])
+        for batcher in [None, plugins.PluginBatcher("plugin1", 0)]:
+            test = plugins.PythonPlugin(
+                file_path="/tmp/plugin/plugin.file",
+                info=('file', 'pathname', 'description'),
+                name="plugin1",
+                uuid="a uuid",
+                weight=1,
+                batcher=batcher
+            )
+            test.setup(
+                event=FakeEvent("event1"), initial_actions=[], results={}
+            )
+
+            assert test.batch_key() is None
+
+    @mock.patch('adaptationengine_framework.plugins.Orchestration')
+    @mock.patch('adaptationengine_framework.plugins.Compute')
+    @mock.patch('adaptationengine_framework.plugins.Metrics')
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    def test__python_plugin__batch_candidates(
+            self, mock_imp, mock_met, mock_com, mock_orc
+    ):
+        """run_batch gets each event's own candidates, if it takes them"""
+        received = {}
+
+        def run_batch(events, actions, met, com, orc, sla, log, candidates):
+            received['candidates'] = candidates
+            return [[] for _ in events]
+
+        mock_imp.load_module.return_value = mock.Mock(
+            spec=['run', 'run_batch'], run_batch=run_batch
+        )
+        test = plugins.PythonPlugin(
+            file_path="/tmp/plugin/plugin.file",
+            info=('file', 'pathname', 'description'),
+            name="plugin1",
+            uuid="a uuid",
+            weight=1
+        )
+
+        test._run_batch(
+            ["event1", "event2", "event3"],
+            [[], [], []],
+            [FakeCandidates('a'), None, FakeCandidates('c')]
+        )
+
+        assert received['candidates'] == ['a', None, 'c']
+        mock_com.assert_called_with(
+            "plugin1", candidates=None, deadline=None
+        )
+
+    @mock.patch('adaptationengine_framework.plugins.Orchestration')
+    @mock.patch('adaptationengine_framework.plugins.Compute')
+    @mock.patch('adaptationengine_framework.plugins.Metrics')
+    @mock.patch('adaptationengine_framework.plugins.imp')
+    def test__python_plugin__deadline(
+            self, mock_imp, mock_met, mock_com, mock_orc
+    ):
+        """Only plugins that take a deadline are given one"""
+        received = {}
+
+        def run_with_deadline(
+                event, actions, met, com, orc, sla, log, deadline=None
+        ):
+            received['deadline'] = deadline
+            return actions
+
+        def run_without_deadline(event, actions, met, com, orc, sla, log):
+            return actions
+
+        deadline = plugins.Deadline(time.time() + 10)
+        for run_function in [run_with_deadline, run_without_deadline]:
+            mock_imp.load_module.return_value = mock.Mock(
+                spec=['run'], run=run_function
+            )
+            test = plugins.PythonPlugin(
+                file_path="/tmp/plugin/plugin.file",
+                info=('file', 'pathname', 'description'),
+                name="plugin1",
+                uuid="a uuid",
+                weight=1
+            )
+            test.setup(
+                event="an event",
+                initial_actions=["an action"],
+                results={},
+                deadline=deadline
+            )
+            test.run()
+
+        assert received['deadline'] is deadline
+        mock_com.assert_called_with(
+            "plugin1", candidates=None, deadline=deadline
+        )
+
+
+class TestDeadline(unittest.TestCase):
+    """Test cases for the plugin deadline"""
+
+    def test__remaining(self):
+        """Time counts down until the deadline"""
+        deadline = plugins.Deadline(time.time() + 10)
+
+        assert 9 < deadline.remaining() <= 10
+        assert 9000 < deadline.getRemainingMillis() <= 10000
+        assert not deadline.expired()
+        assert not plugins.Deadline(time.time() - 1).remaining()
+        assert plugins.Deadline(time.time() - 1).isExpired()
+
+    def test__start(self):
+        """A timeout doesn't count down until it's started"""
+        deadline = plugins.Deadline(timeout=10)
+
+        assert not deadline.is_started()
+        assert deadline.remaining() == 10
+        time.sleep(0.05)
+        assert deadline.remaining() == 10
+
+        deadline.start()
+        expires_at = deadline.expires_at
+        deadline.start()
+
+        assert deadline.is_started()
+        assert deadline.expires_at == expires_at
+        assert 9 < deadline.remaining() <= 10
+
+    def test__cancel(self):
+        """A cancelled deadline has no time left"""
+        deadline = plugins.Deadline(time.time() + 10)
+
+        deadline.cancel()
+
+        assert deadline.is_cancelled()
+        assert deadline.isCancelled()
+        assert deadline.expired()
+        assert deadline.remaining() == 0
+
+
+class FakeCandidates(object):
+    """Candidate provider that hands back a label"""
+
+    def __init__(self, label):
+        """Set what get() returns"""
+        self.label = label
+
+    def get(self):
+        """Return the label in place of CandidateFeatures"""
+        return self.label
+
+
+class FakeEvent(object):
+    """Minimal event, so mock's own 'name' attribute doesn't get in the way"""
+
+    def __init__(self, name, stack_id=None):
+        """Set the only fields the batcher looks at"""
+        self.name = name
+        self.stack_id = stack_id
+
+
+class TestPluginBatcher(unittest.TestCase):
+    """Test cases for plugin micro-batching"""
+
+    def setUp(self):
+        """Create patchers"""
+        generic_setup(self)
+
+    def tearDown(self):
+        """Destroy patchers"""
+        generic_teardown(self)
+
+    def test__batch_key(self):
+        """Events are compatible if they share a name and action types"""
+        actions = [mock.Mock(adaptation_type=0), mock.Mock(adaptation_type=1)]
+
+        assert plugins.PluginBatcher.batch_key(
+            FakeEvent("event1"), actions
+        ) == plugins.PluginBatcher.batch_key(
+            FakeEvent("event1"), list(reversed(actions))
+        )
+        assert plugins.PluginBatcher.batch_key(
+            FakeEvent("event1"), actions
+        ) != plugins.PluginBatcher.batch_key(FakeEvent("event2"), actions)
+
+    def test__evaluate(self):
+        """One run_batch call gives each request its own results"""
+        batcher = plugins.PluginBatcher("plugin1", 0)
+        calls = []
+
+        def run_batch(events, actions_per_event, candidates_per_event):
+            """Fake run_batch that echoes the stack ids"""
+            calls.append(candidates_per_event)
+            return [[event.stack_id] for event in events]
+
+        batch = [
+            plugins.BatchRequest(FakeEvent("event1", stack), [], stack)
+            for stack in ['a', 'b', 'c']
+        ]
+
+        batcher.evaluate(batch, run_batch)
+
+        assert calls == [['a', 'b', 'c']]
+        assert [request.results for request in batch] == [
+            ['a'], ['b'], ['c']
+        ]
+        assert not any([request.error for request in batch])
+
+    def test__evaluate__bad_result_length(self):
+        """A run_batch returning the wrong number of lists is an error"""
+        batcher = plugins.PluginBatcher("plugin1", 0)
+        batch = [plugins.BatchRequest(FakeEvent("event1"), [])]
+
+        def run_batch(events, actions_per_event, candidates_per_event):
+            """Fake run_batch that returns nothing useful"""
+            return []
+
+        batcher.evaluate(batch, run_batch)
+
+        assert isinstance(batch[0].error, ValueError)
+        assert batch[0].results is None
+
 
 class TestJavaPlugin(unittest.TestCase):
     """Test cases for the java plugin classes"""
@@ -0,0 +1,315 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import threading
+import time
+import unittest
+
+import mock
+
+import adaptationengine_framework.pluginscheduler as pluginscheduler
+
+
+class FakePlugin:
+    """A plugin that records how many copies of it run at once"""
+
+    def __init__(self, name, tracker, release=None, order=None):
+        """Set the name and where to record things"""
+        self.plugin_name = name
+        self._tracker = tracker
+        self._release = release
+        self._order = order
+
+    def run(self):
+        """Count ourselves in, wait to be released, count ourselves out"""
+        with self._tracker['lock']:
+            self._tracker['running'] += 1
+            self._tracker['peak'] = max(
+                self._tracker['peak'], self._tracker['running']
+            )
+            if self._order is not None:
+                self._order.append(self.plugin_name)
+        if self._release is not None:
+            self._release.wait(5)
+        with self._tracker['lock']:
+            self._tracker['running'] -= 1
+
+
+class FakeBatchPlugin:
+    """A plugin that records how it was run, alone or in batches"""
+
+    def __init__(self, name, runs):
+        """Set the name and where to record runs"""
+        self.plugin_name = name
+        self._runs = runs
+
+    def run(self):
+        """Record a run on its own"""
+        self._runs.append([self])
+
+    def run_batch(self, plugins):
+        """Record a run of a batch, with an error for the last one"""
+        self._runs.append(plugins)
+        return [None] * (len(plugins) - 1) + [Exception("last one")]
+
+
+def make_tracker():
+    """Return somewhere for fake plugins to record themselves"""
+    return {'lock': threading.Lock(), 'running': 0, 'peak': 0}
+
+
+class TestPluginScheduler(unittest.TestCase):
+    """Test cases for the plugin scheduler"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.pluginscheduler.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+        self.scheduler = None
+
+    def tearDown(self):
+        """Destroy patchers and stop the scheduler"""
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__submit(self):
+        """A submitted plugin runs on a worker and reports its timings"""
+        self.scheduler = pluginscheduler.PluginScheduler(2, 1)
+        plugin = mock.Mock(plugin_name='plugin1')
+
+        task = self.scheduler.submit(plugin, 'decision1')
+
+        assert task.wait(5)
+        plugin.run.assert_called_once_with()
+        assert task.queue_wait >= 0
+        assert task.execution_time >= 0
+
+    def test__submit__records_timeouts(self):
+        """Execution times are recorded for adaptive timeouts"""
+        timeouts = mock.Mock()
+        timeouts.get.return_value = 2.5
+        self.scheduler = pluginscheduler.PluginScheduler(
+            1, 1, timeouts=timeouts
+        )
+        task = self.scheduler.submit(
+            mock.Mock(plugin_name='plugin1'), 'decision1'
+        )
+        assert task.wait(5)
+        # recorded just after the task is marked finished
+        self.scheduler.stop()
+        self.scheduler._workers[0].join(5)
+
+        timeouts.record.assert_called_once_with(
+            'plugin1', task.execution_time
+        )
+        assert self.scheduler.get_timeout('plugin1') == 2.5
+
+    def test__get_timeout__not_tracked(self):
+        """No adaptive timeout without a PluginTimeouts"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+
+        assert self.scheduler.get_timeout('plugin1') is None
+
+    def test__submit__plugin_error(self):
+        """A plugin raising still finishes its task"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        plugin = mock.Mock(plugin_name='plugin1')
+        plugin.run.side_effect = Exception("plugin broke")
+
+        task = self.scheduler.submit(plugin, 'decision1')
+
+        assert task.wait(5)
+        assert self.mock_logger.exception.called
+
+    def test__concurrency_limit(self):
+        """No more than the limit of one plugin run at the same time"""
+        self.scheduler = pluginscheduler.PluginScheduler(
+            4, 4, limits=[{'name': 'slow', 'max': 2}]
+        )
+        tracker = make_tracker()
+        release = threading.Event()
+
+        tasks = [
+            self.scheduler.submit(
+                FakePlugin('slow', tracker, release), 'decision{}'.format(i)
+            )
+            for i in xrange(5)
+        ]
+        # let the workers pick up what they can
+        tasks[0].wait(0.2)
+        assert self.scheduler.stats()['running'] == {'slow': 2}
+        assert self.scheduler.stats()['queued'] == 3
+
+        release.set()
+        for task in tasks:
+            assert task.wait(5)
+        assert tracker['peak'] == 2
+
+    def test__fair_queueing(self):
+        """Decisions take turns rather than first-come-first-served"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        tracker = make_tracker()
+        order = []
+        release = threading.Event()
+
+        # block the only worker so everything below queues up
+        blocker = self.scheduler.submit(
+            FakePlugin('blocker', tracker, release), 'decision0'
+        )
+        tasks = []
+        for name in ['a1', 'a2', 'a3']:
+            tasks.append(self.scheduler.submit(
+                FakePlugin(name, tracker, order=order), 'decisionA'
+            ))
+        for name in ['b1', 'b2']:
+            tasks.append(self.scheduler.submit(
+                FakePlugin(name, tracker, order=order), 'decisionB'
+            ))
+
+        release.set()
+        for task in [blocker] + tasks:
+            assert task.wait(5)
+
+        assert order == ['a1', 'b1', 'a2', 'b2', 'a3']
+
+    def test__batch(self):
+        """Queued tasks sharing a batch key run once, in one slot"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        release = threading.Event()
+        blocker = self.scheduler.submit(
+            FakePlugin('blocker', make_tracker(), release), 'decision0'
+        )
+        runs = []
+        batched = [
+            self.scheduler.submit(
+                FakeBatchPlugin('batchy', runs),
+                'decision{}'.format(i),
+                batch_key=('batchy', 'event1')
+            )
+            for i in xrange(1, 5)
+        ]
+        alone = self.scheduler.submit(
+            FakeBatchPlugin('batchy', runs),
+            'decision1',
+            batch_key=('batchy', 'event2')
+        )
+
+        release.set()
+        for task in [blocker, alone] + batched:
+            assert task.wait(5)
+
+        assert sorted([len(plugins) for plugins in runs]) == [1, 4]
+        assert [task.error for task in batched[:3]] == [None] * 3
+        assert batched[3].error is not None
+        assert alone.error is None
+        stats = self.scheduler.stats()
+        assert (stats['batches'], stats['batched']) == (1, 4)
+
+    def test__batch__window(self):
+        """A batch's first task waits out the window on the queue"""
+        self.scheduler = pluginscheduler.PluginScheduler(2, 4)
+        runs = []
+        first = self.scheduler.submit(
+            FakeBatchPlugin('batchy', runs), 'decision1',
+            batch_key=('batchy',), batch_window=0.3
+        )
+
+        time.sleep(0.1)
+        assert self.scheduler.stats()['queued'] == 1
+        second = self.scheduler.submit(
+            FakeBatchPlugin('batchy', runs), 'decision2',
+            batch_key=('batchy',), batch_window=0.3
+        )
+
+        assert first.wait(5)
+        assert second.wait(5)
+        assert [len(plugins) for plugins in runs] == [2]
+
+    def test__deadline(self):
+        """A task's deadline starts when a worker takes it"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        release = threading.Event()
+        blocker = self.scheduler.submit(
+            FakePlugin('blocker', make_tracker(), release), 'decision1'
+        )
+        deadline = mock.Mock()
+        task = self.scheduler.submit(
+            mock.Mock(plugin_name='queued'), 'decision2', deadline=deadline
+        )
+
+        blocker.wait(0.1)
+        assert not deadline.start.called
+
+        release.set()
+        assert task.wait(5)
+        deadline.start.assert_called_once_with()
+
+    def test__cancel(self):
+        """A task that hasn't started can be taken off the queue"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        tracker = make_tracker()
+        release = threading.Event()
+        blocker = self.scheduler.submit(
+            FakePlugin('blocker', tracker, release), 'decision1'
+        )
+        queued = mock.Mock(plugin_name='queued')
+        task = self.scheduler.submit(queued, 'decision1')
+
+        blocker.wait(0.1)
+        assert self.scheduler.cancel(task)
+        assert task.cancelled
+        assert not self.scheduler.cancel(blocker)
+
+        release.set()
+        assert blocker.wait(5)
+        assert not queued.run.called
+        assert self.scheduler.stats()['queued'] == 0
+
+    def test__abandon(self):
+        """An abandoned plugin holds neither its slot nor a worker"""
+        self.scheduler = pluginscheduler.PluginScheduler(1, 1)
+        tracker = make_tracker()
+        hung = threading.Event()
+        stuck = self.scheduler.submit(
+            FakePlugin('plugin1', tracker, hung), 'decision1'
+        )
+        while stuck.started_at is None:
+            time.sleep(0.01)
+
+        assert self.scheduler.abandon(stuck)
+        assert not self.scheduler.abandon(stuck)
+        later = mock.Mock(plugin_name='plugin1')
+        task = self.scheduler.submit(later, 'decision2')
+
+        assert task.wait(5)
+        later.run.assert_called_once_with()
+        assert not stuck.wait(0)
+
+        hung.set()
+        assert stuck.wait(5)
+        stats = self.scheduler.stats()
+        assert stats['running'] == {}
+        assert stats['abandoned'] == 1
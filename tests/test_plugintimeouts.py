@@ -0,0 +1,107 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.plugintimeouts as plugintimeouts
+
+
+class TestPluginTimeouts(unittest.TestCase):
+    """Test cases for adaptive per-plugin timeouts"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.plugintimeouts.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__percentile(self):
+        """Nearest-rank percentiles"""
+        samples = range(1, 101)
+        assert plugintimeouts.PluginTimeouts.percentile(samples, 50) == 50
+        assert plugintimeouts.PluginTimeouts.percentile(samples, 99) == 99
+        assert plugintimeouts.PluginTimeouts.percentile(samples, 100) == 100
+        assert plugintimeouts.PluginTimeouts.percentile([3], 99) == 3
+
+    def test__get__not_enough_samples(self):
+        """The default is used until there are enough samples"""
+        test = plugintimeouts.PluginTimeouts(30, min_samples=5)
+        for _ in xrange(4):
+            test.record('plugin1', 2)
+
+        assert test.get('plugin1') == 30
+        assert test.get('never_run') == 30
+
+    def test__get(self):
+        """Timeout is the percentile plus headroom"""
+        test = plugintimeouts.PluginTimeouts(
+            30, percentile=90, headroom=0.5, min_samples=10
+        )
+        for seconds in xrange(1, 11):
+            test.record('plugin1', seconds)
+
+        assert test.get('plugin1') == 13.5
+
+    def test__get__clamped(self):
+        """Timeout stays between the floor and ceiling"""
+        test = plugintimeouts.PluginTimeouts(
+            30, floor=2, ceiling=10, min_samples=1
+        )
+        test.record('fast', 0.01)
+        test.record('slow', 100)
+
+        assert test.get('fast') == 2
+        assert test.get('slow') == 10
+
+    def test__get__rolling_window(self):
+        """Old samples fall out of the window"""
+        test = plugintimeouts.PluginTimeouts(
+            30, headroom=0, window=5, min_samples=5
+        )
+        for _ in xrange(5):
+            test.record('plugin1', 20)
+        assert test.get('plugin1') == 20
+
+        for _ in xrange(5):
+            test.record('plugin1', 4)
+        assert test.get('plugin1') == 4
+
+    def test__stats(self):
+        """Stats show the timeout chosen for each plugin"""
+        test = plugintimeouts.PluginTimeouts(30, headroom=1, min_samples=1)
+        test.record('plugin1', 3)
+
+        assert test.stats() == {
+            'plugin1': {
+                'timeout': 6,
+                'samples': 1,
+                'latency_percentile': 99,
+                'latency': 3,
+            }
+        }
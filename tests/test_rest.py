@@ -106,6 +106,7 @@ class TestWebbo(unittest.TestCase):
         assert mock_agreement_update_function.called
         assert result == mock_handler()
         assert self.mock_web.ctx.agreements == mock_agreement_map
+        assert self.mock_web.ctx.stats_functions == {}
 
     def test__run(self):
         """Test running the webserver"""
@@ -116,6 +117,7 @@ class TestWebbo(unittest.TestCase):
         self.mock_web.application.assert_called_once_with(
             (
                 '/agreements', 'RESTAgreements',
+                '/stats/?(.*)', 'RESTStats',
                 '/(.*)', 'RESTRoot',
             ),
             mock.ANY,
@@ -138,6 +140,7 @@ class TestWebbo(unittest.TestCase):
         self.mock_web.application.assert_called_once_with(
             (
                 '/agreements', 'RESTAgreements',
+                '/stats/?(.*)', 'RESTStats',
                 '/(.*)', 'RESTRoot',
             ),
             mock.ANY,
@@ -234,3 +237,49 @@ class TestRestAgreements(unittest.TestCase):
         results = test.GET("shrug")
 
         assert results == """{"<agreement-id>": {"stack_id": "<stack-id>", "event": "<event-name>"}}"""
+
+
+class TestRestStats(unittest.TestCase):
+    """Test cases for the runtime statistics resource"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch webpy
+        patcher_web = mock.patch(
+            'adaptationengine_framework.rest.web'
+        )
+        self.patchers.append(patcher_web)
+        self.mock_web = patcher_web.start()
+        self.mock_web.ctx.stats_functions = {
+            'plugin_timeouts': lambda: {'plugin1': {'timeout': 2.5}},
+            'plugin_scheduler': lambda: {'queued': 0},
+        }
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__GET(self):
+        """Test a named set of stats is displayed as JSON"""
+        test = rest.RESTStats()
+        results = test.GET('plugin_timeouts')
+
+        assert results == """{"plugin1": {"timeout": 2.5}}"""
+
+    def test__GET__list(self):
+        """Test the available stats are listed with no name"""
+        test = rest.RESTStats()
+        results = test.GET('')
+
+        assert results == """["plugin_scheduler", "plugin_timeouts"]"""
+
+    def test__GET__not_found(self):
+        """Test an unknown name is a 404"""
+        self.mock_web.notfound.return_value = Exception("not found")
+        test = rest.RESTStats()
+
+        with self.assertRaises(Exception):
+            test.GET('nope')
@@ -0,0 +1,119 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.serverlocations as serverlocations
+
+
+class FakeServer:
+    """A nova server as listed with details"""
+
+    def __init__(self, server_id, hypervisor):
+        """Set where the server is"""
+        self.id = server_id
+        setattr(self, 'OS-EXT-SRV-ATTR:hypervisor_hostname', hypervisor)
+
+
+class TestServerLocations(unittest.TestCase):
+    """Test cases for the server to hypervisor mapping"""
+
+    def setUp(self):
+        """Create patchers and a nova client with two servers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.serverlocations.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.nova = mock.Mock()
+        self.nova.servers.list.return_value = [
+            FakeServer('vm1', 'host1'), FakeServer('vm2', 'host2')
+        ]
+        self.locations = serverlocations.ServerLocations(lambda: self.nova)
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__hypervisor_of(self):
+        """One listing answers every lookup"""
+        assert self.locations.hypervisor_of('vm1') == 'host1'
+        assert self.locations.hypervisor_of('vm2') == 'host2'
+        assert self.locations.mapping() == {'vm1': 'host1', 'vm2': 'host2'}
+
+        self.nova.servers.list.assert_called_once_with(
+            detailed=True, search_opts={'all_tenants': True}
+        )
+        assert not self.nova.servers.get.called
+
+    def test__hypervisor_of__unknown(self):
+        """Unknown servers are looked up on their own and remembered"""
+        self.nova.servers.get.return_value = FakeServer('vm3', 'host3')
+
+        assert self.locations.hypervisor_of('vm3') == 'host3'
+        assert self.locations.hypervisor_of('vm3') == 'host3'
+        self.nova.servers.get.assert_called_once_with('vm3')
+
+        self.nova.servers.get.side_effect = Exception('not found')
+        assert self.locations.hypervisor_of('vm4') is None
+        assert self.locations.stats()['misses'] == 2
+
+    def test__moved(self):
+        """Moves and deletions are applied without listing again"""
+        self.locations.mapping()
+
+        self.locations.moved('vm1', 'host2')
+        self.locations.forget('vm2')
+
+        assert self.locations.mapping() == {'vm1': 'host2'}
+        assert self.nova.servers.list.call_count == 1
+
+    def test__seed__max_age(self):
+        """The mapping is listed again once it's too old"""
+        self.locations.mapping()
+        self.locations.max_age = 0
+        self.nova.servers.list.return_value = [FakeServer('vm1', 'host3')]
+
+        assert self.locations.mapping() == {'vm1': 'host3'}
+        assert self.locations.stats()['seeds'] == 2
+
+    def test__seed__fails(self):
+        """A failed listing leaves lookups to go server by server"""
+        self.nova.servers.list.side_effect = Exception('nova is down')
+        self.nova.servers.get.return_value = FakeServer('vm1', 'host1')
+
+        assert self.locations.hypervisor_of('vm1') == 'host1'
+        assert self.locations.stats()['age'] is None
+
+    def test__seed__on_error(self):
+        """Errors from nova are passed on"""
+        err = Exception('401 Unauthorized')
+        self.nova.servers.list.side_effect = err
+        self.nova.servers.get.side_effect = err
+        self.locations._on_error = mock.Mock()
+
+        assert self.locations.hypervisor_of('vm1') is None
+        assert self.locations._on_error.call_args_list == [
+            mock.call(err), mock.call(err)
+        ]
@@ -0,0 +1,269 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import time
+import unittest
+
+import mock
+
+import adaptationengine_framework.statuspoller as statuspoller
+
+
+class FakeServer:
+    """A nova server as listed with details"""
+
+    def __init__(self, server_id, hypervisor='host1', power_state=1):
+        """Set where the server is and its power state"""
+        self.id = server_id
+        self._details = {
+            'OS-EXT-SRV-ATTR:hypervisor_hostname': hypervisor,
+            'OS-EXT-STS:power_state': power_state,
+        }
+
+    def to_dict(self):
+        """Return the server's details"""
+        return self._details
+
+
+class FakeStack:
+    """A heat stack as listed"""
+
+    def __init__(self, stack_id, status):
+        """Set the stack's status"""
+        self.id = stack_id
+        self.status = status
+
+
+class TestStatusPoller(unittest.TestCase):
+    """Test cases for the shared enactment status poller"""
+
+    def setUp(self):
+        """Create patchers and a poller that only ticks when told to"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch(
+            'adaptationengine_framework.statuspoller.LOGGER'
+        )
+        self.patchers.append(patcher_logger)
+        patcher_logger.start()
+
+        self.nova = mock.Mock()
+        self.heat = mock.Mock()
+        self.poller = statuspoller.StatusPoller(
+            lambda: self.nova,
+            lambda: self.heat,
+            min_interval=3600,
+            max_interval=4 * 3600,
+        )
+
+    def tearDown(self):
+        """Destroy patchers and stop the poller"""
+        self.poller.stop()
+        self.poller._thread.join(5)
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__checks(self):
+        """Checks resolve, fail or keep waiting"""
+        check = statuspoller.on_hypervisor('host2')
+        assert check(FakeServer('vm1', 'host2')) is True
+        assert check(FakeServer('vm1', 'host1')) is None
+        assert check(None) is None
+
+        check = statuspoller.in_power_state([0, 4])
+        assert check(FakeServer('vm1', power_state=4)) is True
+        assert check(FakeServer('vm1', power_state=1)) is None
+        assert check(FakeServer('vm1', power_state=-1)) is False
+        assert check(None) is False
+
+        assert statuspoller.stack_complete(FakeStack('s1', 'COMPLETE'))
+        assert statuspoller.stack_complete(
+            FakeStack('s1', 'IN_PROGRESS')
+        ) is None
+
+    def test__tick__one_listing(self):
+        """Any number of watches cost one listing of each kind per tick"""
+        self.nova.servers.list.return_value = [
+            FakeServer('vm{}'.format(i), 'host2') for i in range(10)
+        ]
+        self.heat.stacks.list.return_value = [
+            FakeStack('s1', 'COMPLETE'), FakeStack('s2', 'IN_PROGRESS')
+        ]
+        servers = [
+            self.poller.watch_server(
+                'vm{}'.format(i), statuspoller.on_hypervisor('host2')
+            )
+            for i in range(10)
+        ]
+        stacks = [
+            self.poller.watch_stack('s1'), self.poller.watch_stack('s2')
+        ]
+
+        self.poller._tick(list(self.poller._watches))
+
+        self.nova.servers.list.assert_called_once_with(
+            detailed=True, search_opts={'all_tenants': True}
+        )
+        self.heat.stacks.list.assert_called_once_with(global_tenant=True)
+        assert all([watch.wait(0) for watch in servers])
+        assert stacks[0].wait(0)
+        assert not stacks[1].done
+        assert self.poller.stats()['in_flight'] == 1
+        assert self.poller.stats()['api_calls'] == 2
+
+    def test__tick__backoff(self):
+        """The interval doubles while nothing changes and resets after"""
+        self.nova.servers.list.return_value = [FakeServer('vm1', 'host1')]
+        watch = self.poller.watch_server(
+            'vm1', statuspoller.on_hypervisor('host2')
+        )
+
+        intervals = []
+        for _ in range(4):
+            self.poller._tick([watch])
+            intervals.append(self.poller.stats()['interval'])
+        assert intervals == [7200, 14400, 14400, 14400]
+
+        self.poller.watch_server('vm2', statuspoller.on_hypervisor('host2'))
+        assert self.poller.stats()['interval'] == 3600
+
+    def test__tick__timeout(self):
+        """Watches fail once they time out, listed or not"""
+        self.nova.servers.list.side_effect = Exception('nova is down')
+        watch = self.poller.watch_server(
+            'vm1', statuspoller.on_hypervisor('host2'), timeout=0
+        )
+
+        self.poller._tick([watch])
+
+        assert watch.done
+        assert not watch.wait(0)
+        assert self.poller.stats()['timed_out'] == 1
+
+    def test__tick__listing_fails(self):
+        """A failed listing leaves watches waiting"""
+        self.nova.servers.list.side_effect = Exception('nova is down')
+        watch = self.poller.watch_server(
+            'vm1', statuspoller.in_power_state([1])
+        )
+
+        self.poller._tick([watch])
+
+        assert not watch.done
+
+    def test__tick__stacks_by_owner(self):
+        """Without the global stack listing each stack is got by owner"""
+        self.heat.stacks.list.side_effect = Exception('403 Forbidden')
+        owner = mock.Mock()
+        owner.stacks.get.side_effect = lambda stack_id: FakeStack(
+            stack_id, 'COMPLETE'
+        )
+        self.poller._get_heat_client_for_stack = mock.Mock(
+            side_effect=lambda stack_id: owner if stack_id == 's1' else None
+        )
+        complete = self.poller.watch_stack('s1')
+        unowned = self.poller.watch_stack('s2')
+
+        self.poller._tick([complete, unowned])
+        self.poller._tick([unowned])
+
+        assert complete.wait(0)
+        assert not unowned.done
+        assert self.heat.stacks.list.call_count == 1
+        owner.stacks.get.assert_called_once_with('s1')
+        assert self.poller.stats()['api_calls'] == 2
+
+    def test__tick__stacks_unauthorized(self):
+        """A refused token doesn't give up on the global stack listing"""
+        err = Exception('401 Unauthorized')
+        self.heat.stacks.list.side_effect = err
+        self.poller._on_error = mock.Mock(return_value=True)
+        self.poller._get_heat_client_for_stack = mock.Mock()
+        watch = self.poller.watch_stack('s1')
+
+        self.poller._tick([watch])
+        self.poller._tick([watch])
+
+        self.poller._on_error.assert_called_with(err)
+        assert self.heat.stacks.list.call_count == 2
+        assert not self.poller._get_heat_client_for_stack.called
+
+    def test__tick__silence(self):
+        """With a silence timeout only nudged watches are polled early"""
+        self.poller.silence = 3600
+        self.nova.servers.list.return_value = [FakeServer('vm1', 'host2')]
+        quiet = self.poller.watch_server(
+            'vm2', statuspoller.on_hypervisor('host2')
+        )
+        nudged = self.poller.watch_server(
+            'vm1', statuspoller.on_hypervisor('host2')
+        )
+
+        self.poller._tick([quiet, nudged])
+        assert not self.nova.servers.list.called
+
+        assert self.poller.nudge(statuspoller.SERVER, 'vm1')
+        assert not self.poller.nudge(statuspoller.SERVER, 'vm3')
+        self.poller._tick([quiet, nudged])
+
+        assert nudged.wait(0)
+        assert not quiet.done
+        assert self.nova.servers.list.call_count == 1
+        assert self.poller.stats()['nudges'] == 1
+
+    def test__nudge__coalesced(self):
+        """Nudges don't bring a tick within min_interval of a listing"""
+        first = self.poller.watch_server(
+            'vm1', statuspoller.on_hypervisor('host2')
+        )
+        second = self.poller.watch_server(
+            'vm2', statuspoller.on_hypervisor('host2')
+        )
+
+        self.poller.nudge(statuspoller.SERVER, 'vm1')
+        assert self.poller._next_tick <= time.time()
+
+        self.poller._tick([first, second])
+        listed_at = self.poller._listed_at
+        self.poller.nudge(statuspoller.SERVER, 'vm1')
+        self.poller.nudge(statuspoller.SERVER, 'vm2')
+
+        assert self.poller._next_tick == listed_at + 3600
+        assert self.poller.stats()['nudges'] == 3
+
+    def test__stop(self):
+        """Stopping fails everything in flight"""
+        watch = self.poller.watch_stack('s1')
+
+        self.poller.stop()
+
+        assert watch.done
+        assert not watch.wait(0)
+
+    def test__run(self):
+        """The polling thread resolves watches on its own"""
+        poller = statuspoller.StatusPoller(
+            lambda: self.nova, lambda: self.heat, min_interval=0.01
+        )
+        self.nova.servers.list.return_value = [FakeServer('vm1', 'host2')]
+
+        watch = poller.watch_server('vm1', statuspoller.on_hypervisor('host2'))
+
+        assert watch.wait(5)
+        poller.stop()
+        poller._thread.join(5)
@@ -0,0 +1,188 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.strategies as strategies
+
+
+def make_action(target, score, adaptation_type='MigrateAction'):
+    """Return an adaptation action with a target and score"""
+    action = adaptationaction.AdaptationAction(adaptation_type)
+    action.target = target
+    action.score = score
+    return action
+
+
+def make_round(ballots):
+    """Return round results from (weight, targets) ballots"""
+    return {
+        'plugin{}'.format(i): {
+            'weight': weight,
+            'results': [make_action(target, 0.5) for target in targets],
+        }
+        for i, (weight, targets) in enumerate(ballots)
+    }
+
+
+class TestStrategies(unittest.TestCase):
+    """Test cases for the consolidation strategies"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        for module in ['strategies', 'stv']:
+            patcher_logger = mock.patch(
+                'adaptationengine_framework.{}.LOGGER'.format(module)
+            )
+            self.patchers.append(patcher_logger)
+            patcher_logger.start()
+
+        patcher_cfg = mock.patch('adaptationengine_framework.strategies.cfg')
+        self.patchers.append(patcher_cfg)
+        self.mock_cfg = patcher_cfg.start()
+        self.mock_cfg.consolidation__strategy = 'stv'
+        self.mock_cfg.consolidation__event_strategies = []
+        self.mock_cfg.consolidation__stv_engine = 'objects'
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__borda(self):
+        """Points go by position on each ballot, times plugin weight"""
+        round_results = make_round([
+            (1, ['vm1', 'vm2', 'vm3']),
+            (2, ['vm3', 'vm2']),
+        ])
+
+        (output, _) = strategies.WeightedBorda.tally(round_results, [])
+
+        assert [action.target for action in output] == ['vm3', 'vm2', 'vm1']
+        assert [action.votes for action in output] == [1666, 1332, 1000]
+
+    def test__score_sum(self):
+        """Weighted scores are summed, duplicates on a ballot count once"""
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [
+                    make_action('vm1', 0.2),
+                    make_action('vm2', 0.6),
+                    make_action('vm1', 0.9),
+                ],
+            },
+            'plugin2': {
+                'weight': 1,
+                'results': [make_action('vm1', 0.8)],
+            },
+        }
+
+        (output, _) = strategies.WeightedScoreSum.tally(round_results, [])
+
+        assert [action.target for action in output] == ['vm1', 'vm2']
+        assert [action.votes for action in output] == [500, 300]
+
+    def test__default_points(self):
+        """A strategy without points of its own sums weighted scores"""
+        class Plain(strategies.ConsolidationStrategy):
+            """A strategy that only has a name"""
+            name = 'plain'
+
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [make_action('vm1', 0.2), make_action('vm2', 0.6)],
+            },
+        }
+
+        (output, _) = Plain.tally(round_results, [])
+
+        assert [action.target for action in output] == ['vm2', 'vm1']
+        assert [action.votes for action in output] == [600, 200]
+
+    def test__schulze(self):
+        """The worked example from Schulze's paper: E > A > C > B > D"""
+        round_results = make_round([
+            (5, 'ACBED'),
+            (5, 'ADECB'),
+            (8, 'BEDAC'),
+            (3, 'CABED'),
+            (7, 'CAEBD'),
+            (2, 'CBADE'),
+            (7, 'DCEBA'),
+            (8, 'EBADC'),
+        ])
+
+        (output, _) = strategies.Schulze.tally(round_results, [])
+
+        assert [action.target for action in output] == list('EACBD')
+        assert [action.votes for action in output] == [4, 3, 2, 1, 0]
+
+    def test__tally__blacklist(self):
+        """Every strategy drops actions scored -1"""
+        for strategy in strategies.STRATEGIES.values():
+            round_results = {
+                'plugin1': {
+                    'weight': 1,
+                    'results': [
+                        make_action('vm1', -1), make_action('vm2', 0.5)
+                    ],
+                },
+                'plugin2': {
+                    'weight': 1,
+                    'results': [make_action('vm1', 0.9)],
+                },
+            }
+
+            (output, blacklist) = strategy.tally(round_results, [])
+
+            assert [action.target for action in output] == ['vm2']
+            assert [action.target for action in blacklist] == ['vm1']
+
+    def test__tally__empty(self):
+        """No results means no actions"""
+        for strategy in strategies.STRATEGIES.values():
+            assert strategy.tally({}, []) == ([], [])
+
+    def test__get_strategy(self):
+        """Events get their own strategy, or the default"""
+        self.mock_cfg.consolidation__strategy = 'score_sum'
+        self.mock_cfg.consolidation__event_strategies = [
+            {'event': 'cpu_high', 'strategy': 'schulze'},
+        ]
+
+        assert strategies.get_strategy('cpu_high') is strategies.Schulze
+        assert (
+            strategies.get_strategy('ram_high') is strategies.WeightedScoreSum
+        )
+
+    def test__get_strategy__unknown(self):
+        """An unknown strategy name falls back to STV"""
+        self.mock_cfg.consolidation__strategy = 'coin_toss'
+
+        assert (
+            strategies.get_strategy('cpu_high') is
+            strategies.SingleTransferrableVoteStrategy
+        )
+        assert strategies.LOGGER.error.called
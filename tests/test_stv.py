@@ -0,0 +1,139 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.stv as stv
+
+
+def make_action(target, score, adaptation_type='MigrateAction'):
+    """Return an adaptation action with a target and score"""
+    action = adaptationaction.AdaptationAction(adaptation_type)
+    action.target = target
+    action.score = score
+    return action
+
+
+class TestSingleTransferrableVote(unittest.TestCase):
+    """Test cases for the STV tally"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        patcher_logger = mock.patch('adaptationengine_framework.stv.LOGGER')
+        self.patchers.append(patcher_logger)
+        self.mock_logger = patcher_logger.start()
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__tally__single_plugin(self):
+        """One plugin's order is kept, with its scores turned into votes"""
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [
+                    make_action('vm1', 0.9),
+                    make_action('vm2', 0.5),
+                    make_action('vm3', 0.2),
+                ],
+            },
+        }
+
+        (output, blacklist) = stv.SingleTransferrableVote.tally(
+            round_results, []
+        )
+
+        assert [action.target for action in output] == ['vm1', 'vm2', 'vm3']
+        assert output[0].votes == 900
+        assert blacklist == []
+
+    def test__tally__preference_order(self):
+        """A plugin's preferences are taken in the order it gave them"""
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [
+                    make_action('vm{}'.format(i), 0)
+                    for i in xrange(20)
+                ] + [make_action('vm0', 0)],
+            },
+        }
+        voter = stv.Voter('plugin1')
+
+        with mock.patch(
+                'adaptationengine_framework.stv.Voter', return_value=voter
+        ):
+            (output, _) = stv.SingleTransferrableVote.tally(round_results, [])
+
+        assert len(output) == 20
+        assert voter.votes == [
+            hash(make_action('vm{}'.format(i), 0)) for i in xrange(20)
+        ]
+
+    def test__tally__same_action_from_two_plugins(self):
+        """Plugins proposing the same action vote for the one candidate"""
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [make_action('vm1', 0.9), make_action('vm2', 0.5)],
+            },
+            'plugin2': {
+                'weight': 1,
+                'results': [make_action('vm1', 0.8), make_action('vm3', 0.4)],
+            },
+        }
+
+        (output, _) = stv.SingleTransferrableVote.tally(round_results, [])
+
+        assert [action.target for action in output] == ['vm1', 'vm2', 'vm3']
+        assert output[0].votes == 850
+
+    def test__tally__blacklist(self):
+        """A score of -1 blacklists an action for every plugin"""
+        round_results = {
+            'plugin1': {
+                'weight': 1,
+                'results': [make_action('vm1', -1), make_action('vm2', 0.5)],
+            },
+            'plugin2': {
+                'weight': 1,
+                'results': [
+                    make_action('vm1', 0.9),
+                    make_action('vm3', 0.4),
+                    make_action('vm4', 0.1),
+                ],
+            },
+        }
+        previous = make_action('vm4', 0.1)
+
+        (output, blacklist) = stv.SingleTransferrableVote.tally(
+            round_results, [previous]
+        )
+
+        assert sorted([action.target for action in output]) == ['vm2', 'vm3']
+        assert [action.target for action in blacklist] == ['vm4', 'vm1']
+        assert [
+            action.target for action in round_results['plugin2']['results']
+        ] == ['vm3']
@@ -0,0 +1,124 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import copy
+import random
+import unittest
+
+import mock
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.stv as stv
+import adaptationengine_framework.stvmatrix as stvmatrix
+
+
+def make_round_results(seed):
+    """Return random round results, with plugins overlapping sometimes"""
+    rnd = random.Random(seed)
+    round_results = {}
+    for plugin_number in xrange(rnd.randint(1, 6)):
+        results = []
+        for _ in xrange(rnd.randint(0, 15)):
+            action = adaptationaction.AdaptationAction(rnd.randint(0, 2))
+            action.target = 'vm{}'.format(rnd.randint(0, 10))
+            action.score = rnd.choice([0, 0.1, 0.5, 0.5, 0.9, 1])
+            if rnd.random() < 0.03:
+                action.score = -1
+            results.append(action)
+        round_results['plugin{}'.format(plugin_number)] = {
+            'weight': rnd.randint(1, 3),
+            'results': results,
+        }
+    return round_results
+
+
+def summarise(actions):
+    """Return what matters about a list of actions for comparing them"""
+    return [
+        (action.adaptation_type, action.target, action.votes)
+        for action in actions
+    ]
+
+
+class TestMatrixSingleTransferrableVote(unittest.TestCase):
+    """Test cases for the numpy STV tally"""
+
+    def setUp(self):
+        """Create patchers"""
+        self.patchers = []
+
+        # patch logging
+        for module in ['stv', 'stvmatrix']:
+            patcher_logger = mock.patch(
+                'adaptationengine_framework.{}.LOGGER'.format(module)
+            )
+            self.patchers.append(patcher_logger)
+            patcher_logger.start()
+
+    def tearDown(self):
+        """Destroy patchers"""
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test__tally__same_as_objects(self):
+        """Both engines give the same order, votes and blacklist"""
+        for seed in xrange(100):
+            round_results = make_round_results(seed)
+
+            (expected, expected_blacklist) = (
+                stv.SingleTransferrableVote.tally(
+                    copy.deepcopy(round_results), []
+                )
+            )
+            (output, blacklist) = (
+                stvmatrix.MatrixSingleTransferrableVote.tally(
+                    copy.deepcopy(round_results), []
+                )
+            )
+
+            assert summarise(output) == summarise(expected), seed
+            assert summarise(blacklist) == summarise(expected_blacklist)
+
+    def test__tally__empty(self):
+        """No plugin results means no output"""
+        round_results = {'plugin1': {'weight': 1, 'results': []}}
+
+        (output, blacklist) = stvmatrix.MatrixSingleTransferrableVote.tally(
+            round_results, []
+        )
+
+        assert output == []
+        assert blacklist == []
+
+    def test__vote_matrix(self):
+        """Preferences, votes and positions line up"""
+        first = adaptationaction.AdaptationAction('MigrateAction')
+        first.score = 1
+        second = adaptationaction.AdaptationAction('NoAction')
+        second.score = 0.5
+
+        matrix = stvmatrix.VoteMatrix({
+            'plugin1': {'weight': 1, 'results': [first, second, first]},
+        })
+
+        assert matrix.actions == [first, second]
+        assert matrix.preferences.tolist() == [[0, 1]]
+        assert matrix.votes.tolist() == [[1000, 500]]
+        assert matrix.position.tolist() == [[0, 1]]
+        assert matrix.rank_votes(1).tolist() == [0, 500]
+        assert matrix.rank_votes(5).tolist() == [0, 0]
+        assert matrix.total_votes().tolist() == [1000, 500]
@@ -0,0 +1,209 @@
+"""
+Copyright 2016 INTEL RESEARCH AND INNOVATION IRELAND LIMITED
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+# pylint: disable=protected-access,no-self-use,invalid-name
+
+import json
+import struct
+import time
+import unittest
+
+import adaptationengine_framework.adaptationaction as adaptationaction
+import adaptationengine_framework.event as event
+import adaptationengine_framework.wireformat as wireformat
+
+
+EVENT_MESSAGE = json.dumps({
+    'id': {
+        'user_id': 'test_user_id',
+        'tenant': 'test_tenant',
+        'stack_id': 'test_stack_id',
+        'source': 'test_source',
+        'instance': 'test_instance',
+        'context': 'test_context',
+        'machines': ['test_machine1', 'test_machine2'],
+        'severity': 'test_severity',
+        'data_center': 'test_data_center',
+    },
+    'event': {'name': 'test_event_name', 'value': 0.9},
+    'data': [{'metric': 'cpu'}],
+})
+
+
+def make_action(target, destination=None, score=0.5):
+    """Return a migrate action"""
+    return adaptationaction.AdaptationAction(
+        adaptationaction.AdaptationType.MigrateAction,
+        target=target,
+        destination=destination,
+        score=score,
+    )
+
+
+class TestWireFormat(unittest.TestCase):
+    """Test cases for the binary wire format"""
+
+    def test__actions(self):
+        """Actions, sub-actions and missing fields survive a round trip"""
+        developer = adaptationaction.AdaptationAction(
+            adaptationaction.AdaptationType.DeveloperAction,
+            actions=[make_action('vm1', 'host2'), make_action('vm2')],
+            target_app=u'st\xe5ck',
+            votes=3,
+        )
+        scale = adaptationaction.AdaptationAction(
+            adaptationaction.AdaptationType.VerticalScaleAction,
+            target='vm1',
+            scale_value=4,
+            candidate='cand-1',
+        )
+        actions = [make_action('vm1', 'host2', score=-1), developer, scale]
+
+        decoded = wireformat.decode_actions(wireformat.encode_actions(actions))
+
+        assert decoded == actions
+        assert [action.score for action in decoded] == [-1, 0, 0]
+        assert decoded[1].votes == 3
+        assert decoded[1].target_app == u'st\xe5ck'
+        assert decoded[1].actions == developer.actions
+        assert decoded[0].actions == []
+        assert decoded[0].scale_value == ''
+        assert decoded[1].actions[1].destination is None
+        assert decoded[2].scale_value == 4
+        assert decoded[2].candidate == 'cand-1'
+
+    def test__actions__not_numbers(self):
+        """Scores and votes that aren't numbers are refused, not mangled"""
+        for fields in [
+                {'score': None}, {'score': '0.5'}, {'votes': 2.5},
+                {'votes': None}, {'votes': 2 ** 64},
+        ]:
+            action = adaptationaction.AdaptationAction(0, **fields)
+            self.assertRaises(
+                ValueError, wireformat.encode_actions, [action]
+            )
+
+        decoded = wireformat.decode_actions(wireformat.encode_actions(
+            [adaptationaction.AdaptationAction(0, score=1, votes=2.0)]
+        ))
+        assert (decoded[0].score, decoded[0].votes) == (1.0, 2)
+
+    def test__actions__string_table(self):
+        """Repeated ids are sent once"""
+        one = wireformat.encode_actions([make_action('vm1', 'host1')])
+        many = wireformat.encode_actions(
+            [make_action('vm1', 'host1') for _ in range(10)]
+        )
+        assert len(many) - len(one) == 9 * wireformat._ACTION.size
+
+    def test__event(self):
+        """Every event field survives a round trip"""
+        cw_event = event.Event(EVENT_MESSAGE)
+
+        decoded = wireformat.decode_event(wireformat.encode_event(cw_event))
+
+        for field in wireformat.EVENT_FIELDS:
+            assert getattr(decoded, field) == getattr(cw_event, field), field
+
+    def test__event__invalid(self):
+        """Events without a stack or name, or too large, are refused"""
+        cw_event = event.Event(EVENT_MESSAGE)
+        cw_event.stack_id = None
+        self.assertRaises(
+            ValueError,
+            wireformat.decode_event,
+            wireformat.encode_event(cw_event)
+        )
+        self.assertRaises(
+            ValueError,
+            wireformat.decode_event,
+            wireformat.MAGIC + ' ' * 8388608
+        )
+
+    def test__adaptation_request(self):
+        """Requests are renamed and redirected like their JSON equivalent"""
+        cw_event = event.Event(EVENT_MESSAGE)
+
+        decoded = wireformat.decode_event(
+            wireformat.encode_adaptation_request(
+                cw_event, name='lowpower', stack_id='other_stack'
+            )
+        )
+
+        assert decoded.name == 'lowpower'
+        assert decoded.stack_id == 'other_stack'
+        assert decoded.context == 'adaptation request'
+        assert decoded.instance_id != cw_event.instance_id
+        assert decoded.machines == cw_event.machines
+        assert cw_event.name == 'test_event_name'
+        assert abs(decoded.timestamp - time.time()) < 60
+        assert cw_event.timestamp is None
+
+    def test__event__version_1(self):
+        """Events from before the timestamp was added still decode"""
+        cw_event = event.Event(EVENT_MESSAGE)
+        table = wireformat.StringTable()
+        body = struct.pack(
+            '!12I',
+            *[
+                table.ref(getattr(cw_event, field))
+                for field in wireformat.EVENT_FIELDS[:12]
+            ]
+        )
+        message = struct.pack(
+            '!4sBB', wireformat.MAGIC, 1, wireformat.KIND_EVENT
+        ) + table.pack() + body
+
+        decoded = wireformat.decode_event(message)
+
+        assert decoded.stack_id == 'test_stack_id'
+        assert decoded.data == [{'metric': 'cpu'}]
+        assert decoded.timestamp is None
+
+    def test__header(self):
+        """Newer versions and the wrong kind of message are refused"""
+        message = wireformat.encode_actions([make_action('vm1')])
+        newer = struct.pack(
+            '!4sBB', wireformat.MAGIC, wireformat.VERSION + 1,
+            wireformat.KIND_ACTIONS
+        ) + message[6:]
+
+        self.assertRaises(ValueError, wireformat.decode_actions, newer)
+        self.assertRaises(ValueError, wireformat.decode_event, message)
+        self.assertRaises(ValueError, wireformat.decode_actions, '[]')
+
+    def test__is_binary(self):
+        """Binary messages are told apart from JSON and objects"""
+        assert wireformat.is_binary(wireformat.encode_actions([]))
+        assert not wireformat.is_binary(EVENT_MESSAGE)
+        assert not wireformat.is_binary([make_action('vm1')])
+        assert not wireformat.is_binary(None)
+
+    def test__decode_results(self):
+        """Only binary plugin results are decoded"""
+        actions = [make_action('vm1', 'host2')]
+        round_results = {
+            'binary': {
+                'weight': 2,
+                'results': wireformat.encode_actions(actions),
+            },
+            'objects': {'weight': 1, 'results': actions},
+        }
+
+        decoded = wireformat.decode_results(round_results)
+
+        assert decoded['binary'] == {'weight': 2, 'results': actions}
+        assert decoded['objects']['results'] is actions
+        assert wireformat.is_binary(round_results['binary']['results'])